@@ -19,9 +19,11 @@ import time
 
 from tempest.api import compute
 from tempest import clients
+from tempest.common import cleanup_executor
 from tempest.common import isolated_creds
 from tempest.common.utils.data_utils import parse_image_id
 from tempest.common.utils.data_utils import rand_name
+from tempest.common import waiters
 from tempest.openstack.common import log as logging
 import tempest.test
 
@@ -86,27 +88,22 @@ class BaseComputeTest(tempest.test.BaseTestCase):
 
     @classmethod
     def clear_servers(cls):
+        executor = cleanup_executor.CleanupExecutor(
+            interval=cls.build_interval, timeout=cls.build_timeout)
+        executor.add_kind('server', cls.servers_client.delete_server,
+                          'compute',
+                          lister=waiters.ServerLister(cls.servers_client))
         for server in cls.servers:
-            try:
-                cls.servers_client.delete_server(server['id'])
-            except Exception:
-                pass
-
-        for server in cls.servers:
-            try:
-                cls.servers_client.wait_for_server_termination(server['id'])
-            except Exception:
-                pass
+            executor.add('server', server['id'])
+        executor.run()
 
     @classmethod
     def clear_images(cls):
+        executor = cleanup_executor.CleanupExecutor()
+        executor.add_kind('image', cls.images_client.delete_image, 'image')
         for image_id in cls.images:
-            try:
-                cls.images_client.delete_image(image_id)
-            except Exception as exc:
-                LOG.info('Exception raised deleting image %s', image_id)
-                LOG.exception(exc)
-                pass
+            executor.add('image', image_id)
+        executor.run()
 
     @classmethod
     def tearDownClass(cls):
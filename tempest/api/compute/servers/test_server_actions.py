@@ -23,6 +23,7 @@ import testtools
 from tempest.api import compute
 from tempest.api.compute import base
 from tempest.common.utils.data_utils import rand_name
+from tempest.common.utils.linux.remote_client import invalidate_facts
 from tempest.common.utils.linux.remote_client import RemoteClient
 import tempest.config
 from tempest import exceptions
@@ -79,6 +80,7 @@ class ServerActionsTestJSON(base.BaseComputeTest):
         resp, body = self.client.reboot(self.server_id, 'HARD')
         self.assertEqual(202, resp.status)
         self.client.wait_for_server_status(self.server_id, 'ACTIVE')
+        invalidate_facts(self.server_id)
 
         if self.run_ssh:
             # Log in and verify the boot time has changed
@@ -99,6 +101,7 @@ class ServerActionsTestJSON(base.BaseComputeTest):
         resp, body = self.client.reboot(self.server_id, 'SOFT')
         self.assertEqual(202, resp.status)
         self.client.wait_for_server_status(self.server_id, 'ACTIVE')
+        invalidate_facts(self.server_id)
 
         if self.run_ssh:
             # Log in and verify the boot time has changed
@@ -129,6 +132,7 @@ class ServerActionsTestJSON(base.BaseComputeTest):
 
         # Verify the server properties after the rebuild completes
         self.client.wait_for_server_status(rebuilt_server['id'], 'ACTIVE')
+        invalidate_facts(self.server_id)
         resp, server = self.client.get_server(rebuilt_server['id'])
         rebuilt_image_id = rebuilt_server['image']['id']
         self.assertTrue(self.image_ref_alt.endswith(rebuilt_image_id))
@@ -162,6 +166,7 @@ class ServerActionsTestJSON(base.BaseComputeTest):
 
         self.client.confirm_resize(self.server_id)
         self.client.wait_for_server_status(self.server_id, 'ACTIVE')
+        invalidate_facts(self.server_id)
 
         resp, server = self.client.get_server(self.server_id)
         self.assertEqual(new_flavor_ref, int(server['flavor']['id']))
@@ -181,6 +186,7 @@ class ServerActionsTestJSON(base.BaseComputeTest):
 
         self.client.revert_resize(self.server_id)
         self.client.wait_for_server_status(self.server_id, 'ACTIVE')
+        invalidate_facts(self.server_id)
 
         # Need to poll for the id change until lp#924371 is fixed
         resp, server = self.client.get_server(self.server_id)
@@ -262,12 +262,103 @@ CREDENTIALS_CLIENT = {
 }
 
 
+class LazyClient(object):
+
+    """
+    Manager attribute building its client on first access
+
+    The client, and so its authentication, is only created when a test
+    actually uses it, then it is cached on the manager.
+    """
+
+    def __init__(self, clients, service=None, auth='v2'):
+        """
+        :param clients: Client class or an interface to client class lookup
+                        table like SERVERS_CLIENTS
+        :param service: Name of the service_available option which has to be
+                        enabled for the client to exist
+        :param auth: 'v2' or 'v3' to build the client with the v2 or v3 auth
+                     arguments of the manager, None to pass only the config
+        """
+        self.clients = clients
+        self.service = service
+        self.auth = auth
+
+    def __get__(self, manager, owner=None):
+        if manager is None:
+            return self
+        try:
+            return manager._clients[self]
+        except KeyError:
+            pass
+        if (self.service is not None and
+                not getattr(manager.config.service_available, self.service)):
+            raise AttributeError("Service %s is not available" % self.service)
+        client = self.build(manager)
+        manager._clients[self] = client
+        return client
+
+    def build(self, manager):
+        client_class = self.clients
+        if isinstance(client_class, dict):
+            client_class = client_class[manager.interface]
+        if self.auth is None:
+            return client_class(manager.config)
+        if self.auth == 'v3':
+            if not manager.client_args_v3_auth:
+                return None
+            return client_class(*manager.client_args_v3_auth)
+        return client_class(*manager.client_args)
+
+
 class Manager(object):
 
     """
     Top level manager for OpenStack Compute clients
     """
 
+    servers_client = LazyClient(SERVERS_CLIENTS)
+    network_client = LazyClient(NETWORKS_CLIENTS)
+    limits_client = LazyClient(LIMITS_CLIENTS)
+    images_client = LazyClient(IMAGES_CLIENTS, service='glance')
+    keypairs_client = LazyClient(KEYPAIRS_CLIENTS)
+    quotas_client = LazyClient(QUOTAS_CLIENTS)
+    flavors_client = LazyClient(FLAVORS_CLIENTS)
+    extensions_client = LazyClient(EXTENSIONS_CLIENTS)
+    volumes_extensions_client = LazyClient(VOLUMES_EXTENSIONS_CLIENTS)
+    floating_ips_client = LazyClient(FLOAT_CLIENTS)
+    snapshots_client = LazyClient(SNAPSHOTS_CLIENTS)
+    volumes_client = LazyClient(VOLUMES_CLIENTS)
+    volume_types_client = LazyClient(VOLUME_TYPES_CLIENTS)
+    identity_client = LazyClient(IDENTITY_CLIENT)
+    identity_v3_client = LazyClient(IDENTITY_V3_CLIENT)
+    token_client = LazyClient(TOKEN_CLIENT, auth=None)
+    security_groups_client = LazyClient(SECURITY_GROUPS_CLIENT)
+    interfaces_client = LazyClient(INTERFACES_CLIENT)
+    endpoints_client = LazyClient(ENDPOINT_CLIENT)
+    fixed_ips_client = LazyClient(FIXED_IPS_CLIENT)
+    availability_zone_client = LazyClient(AVAILABILITY_ZONE_CLIENT)
+    service_client = LazyClient(SERVICE_CLIENT)
+    aggregates_client = LazyClient(AGGREGATES_CLIENT)
+    services_client = LazyClient(SERVICES_CLIENT)
+    tenant_usages_client = LazyClient(TENANT_USAGES_CLIENT)
+    policy_client = LazyClient(POLICY_CLIENT)
+    hypervisor_client = LazyClient(HYPERVISOR_CLIENT)
+    token_v3_client = LazyClient(V3_TOKEN_CLIENT)
+    credentials_client = LazyClient(CREDENTIALS_CLIENT)
+    servers_client_v3_auth = LazyClient(SERVERS_CLIENTS, auth='v3')
+    hosts_client = LazyClient(HostsClientJSON)
+    account_client = LazyClient(AccountClient)
+    image_client = LazyClient(ImageClientJSON, service='glance')
+    image_client_v2 = LazyClient(ImageClientV2JSON, service='glance')
+    container_client = LazyClient(ContainerClient)
+    object_client = LazyClient(ObjectClient)
+    orchestration_client = LazyClient(OrchestrationClient)
+    ec2api_client = LazyClient(botoclients.APIClientEC2)
+    s3_client = LazyClient(botoclients.ObjectClientS3)
+    custom_object_client = LazyClient(ObjectClientCustomizedHeader)
+    custom_account_client = LazyClient(AccountClientCustomizedHeader)
+
     def __init__(self, username=None, password=None, tenant_name=None,
                  interface='json'):
         """
@@ -275,6 +366,8 @@ class Manager(object):
         client classes managed by the Manager object. Left as None, the
         standard username/password/tenant_name is used.
 
+        The clients are only created when first accessed.
+
         :param username: Override of the username
         :param password: Override of the password
         :param tenant_name: Override of the tenant name
@@ -294,82 +387,26 @@ class Manager(object):
                    {'u': username, 'p': password, 't': tenant_name})
             raise exceptions.InvalidConfiguration(msg)
 
+        if interface not in SERVERS_CLIENTS:
+            msg = "Unsupported interface type `%s'" % interface
+            raise exceptions.InvalidConfiguration(msg)
+        self.interface = interface
+
         self.auth_url = self.config.identity.uri
         self.auth_url_v3 = self.config.identity.uri_v3
 
-        client_args = (self.config, self.username, self.password,
-                       self.auth_url, self.tenant_name)
+        self.client_args = (self.config, self.username, self.password,
+                            self.auth_url, self.tenant_name)
 
         if self.auth_url_v3:
             auth_version = 'v3'
-            client_args_v3_auth = (self.config, self.username,
-                                   self.password, self.auth_url_v3,
-                                   self.tenant_name, auth_version)
+            self.client_args_v3_auth = (self.config, self.username,
+                                        self.password, self.auth_url_v3,
+                                        self.tenant_name, auth_version)
         else:
-            client_args_v3_auth = None
+            self.client_args_v3_auth = None
 
-        try:
-            self.servers_client = SERVERS_CLIENTS[interface](*client_args)
-            self.network_client = NETWORKS_CLIENTS[interface](*client_args)
-            self.limits_client = LIMITS_CLIENTS[interface](*client_args)
-            if self.config.service_available.glance:
-                self.images_client = IMAGES_CLIENTS[interface](*client_args)
-            self.keypairs_client = KEYPAIRS_CLIENTS[interface](*client_args)
-            self.quotas_client = QUOTAS_CLIENTS[interface](*client_args)
-            self.flavors_client = FLAVORS_CLIENTS[interface](*client_args)
-            ext_cli = EXTENSIONS_CLIENTS[interface](*client_args)
-            self.extensions_client = ext_cli
-            vol_ext_cli = VOLUMES_EXTENSIONS_CLIENTS[interface](*client_args)
-            self.volumes_extensions_client = vol_ext_cli
-            self.floating_ips_client = FLOAT_CLIENTS[interface](*client_args)
-            self.snapshots_client = SNAPSHOTS_CLIENTS[interface](*client_args)
-            self.volumes_client = VOLUMES_CLIENTS[interface](*client_args)
-            self.volume_types_client = \
-                VOLUME_TYPES_CLIENTS[interface](*client_args)
-            self.identity_client = IDENTITY_CLIENT[interface](*client_args)
-            self.identity_v3_client = \
-                IDENTITY_V3_CLIENT[interface](*client_args)
-            self.token_client = TOKEN_CLIENT[interface](self.config)
-            self.security_groups_client = \
-                SECURITY_GROUPS_CLIENT[interface](*client_args)
-            self.interfaces_client = INTERFACES_CLIENT[interface](*client_args)
-            self.endpoints_client = ENDPOINT_CLIENT[interface](*client_args)
-            self.fixed_ips_client = FIXED_IPS_CLIENT[interface](*client_args)
-            self.availability_zone_client = \
-                AVAILABILITY_ZONE_CLIENT[interface](*client_args)
-            self.service_client = SERVICE_CLIENT[interface](*client_args)
-            self.aggregates_client = AGGREGATES_CLIENT[interface](*client_args)
-            self.services_client = SERVICES_CLIENT[interface](*client_args)
-            self.tenant_usages_client = \
-                TENANT_USAGES_CLIENT[interface](*client_args)
-            self.policy_client = POLICY_CLIENT[interface](*client_args)
-            self.hypervisor_client = HYPERVISOR_CLIENT[interface](*client_args)
-            self.token_v3_client = V3_TOKEN_CLIENT[interface](*client_args)
-            self.credentials_client = \
-                CREDENTIALS_CLIENT[interface](*client_args)
-
-            if client_args_v3_auth:
-                self.servers_client_v3_auth = SERVERS_CLIENTS[interface](
-                    *client_args_v3_auth)
-            else:
-                self.servers_client_v3_auth = None
-
-        except KeyError:
-            msg = "Unsupported interface type `%s'" % interface
-            raise exceptions.InvalidConfiguration(msg)
-        self.hosts_client = HostsClientJSON(*client_args)
-        self.account_client = AccountClient(*client_args)
-        if self.config.service_available.glance:
-            self.image_client = ImageClientJSON(*client_args)
-            self.image_client_v2 = ImageClientV2JSON(*client_args)
-        self.container_client = ContainerClient(*client_args)
-        self.object_client = ObjectClient(*client_args)
-        self.orchestration_client = OrchestrationClient(*client_args)
-        self.ec2api_client = botoclients.APIClientEC2(*client_args)
-        self.s3_client = botoclients.ObjectClientS3(*client_args)
-        self.custom_object_client = ObjectClientCustomizedHeader(*client_args)
-        self.custom_account_client = \
-            AccountClientCustomizedHeader(*client_args)
+        self._clients = {}
 
 
 class AltManager(Manager):
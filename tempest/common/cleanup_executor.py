@@ -0,0 +1,158 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+from tempest.common.utils.misc import parallel_map
+from tempest.common import waiters
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Resource kinds which have to be gone before a kind can be deleted
+DEPENDENCIES = {
+    'server': (),
+    'image': (),
+    'keypair': (),
+    'snapshot': (),
+    'floating_ip': ('server',),
+    'security_group': ('server',),
+    'volume': ('snapshot', 'server'),
+    'user': ('server', 'floating_ip', 'keypair', 'security_group',
+             'snapshot', 'volume', 'image'),
+    'tenant': ('server', 'floating_ip', 'keypair', 'security_group',
+               'snapshot', 'volume', 'image', 'user'),
+}
+
+
+class ResourceKind(object):
+
+    def __init__(self, name, delete_func, service, lister=None,
+                 ready_status=None, depends_on=None):
+        self.name = name
+        self.delete_func = delete_func
+        self.service = service
+        self.lister = lister
+        self.ready_status = ready_status
+        if depends_on is None:
+            depends_on = DEPENDENCIES.get(name, ())
+        self.depends_on = depends_on
+        self.resource_ids = []
+        self.deleted_ids = []
+        self.deleted = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+
+class CleanupExecutor(object):
+    """
+    Deletes resources in parallel, in the order of their dependencies.
+
+    Every resource kind is registered with its delete call, the service it
+    belongs to and optionally a waiters.ResourceLister. Kinds without
+    pending dependencies are cleared at the same time, while at most
+    ``concurrency`` delete calls run against a single service. With a
+    lister, the resources first wait for ``ready_status`` if given, and
+    the deletions are awaited with one list call per poll. Delete errors
+    are logged and counted, never raised.
+    """
+
+    def __init__(self, concurrency=4, interval=None, timeout=None):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.timeout = timeout
+        self.kinds = {}
+        self._order = []
+        self._semaphores = {}
+
+    def add_kind(self, name, delete_func, service, lister=None,
+                 ready_status=None, depends_on=None):
+        self.kinds[name] = ResourceKind(name, delete_func, service, lister,
+                                        ready_status, depends_on)
+        self._order.append(name)
+        self._semaphores.setdefault(
+            service, threading.BoundedSemaphore(self.concurrency))
+
+    def add(self, kind, resource_id):
+        self.kinds[kind].resource_ids.append(resource_id)
+
+    def _stages(self):
+        """Groups the kinds in stages which only depend on earlier ones."""
+        remaining = dict(self.kinds)
+        stages = []
+        while remaining:
+            stage = [kind for kind in remaining.values()
+                     if not any(dep in remaining for dep in kind.depends_on)]
+            if not stage:
+                # NOTE: dependency cycle, clear the rest together
+                stage = remaining.values()
+            for kind in stage:
+                del remaining[kind.name]
+            stages.append(stage)
+        return stages
+
+    def _wait(self, kind, resource_ids, status):
+        waiter = waiters.BatchWaiter(self.interval, self.timeout)
+        futures = [waiter.add(kind.lister, resource_id, status)
+                   for resource_id in resource_ids]
+        waiter.wait()
+        return futures
+
+    def _delete(self, kind, resource_id):
+        with self._semaphores[kind.service]:
+            try:
+                kind.delete_func(resource_id)
+                return True
+            except Exception as exc:
+                LOG.warning("Cleanup::failed to delete %s %s: %s",
+                            kind.name, resource_id, exc)
+                return False
+
+    def _clear(self, kind):
+        start = time.time()
+        if kind.lister is not None and kind.ready_status is not None:
+            self._wait(kind, kind.resource_ids, kind.ready_status)
+        deleted = parallel_map(lambda r: self._delete(kind, r),
+                               kind.resource_ids, self.concurrency)
+        deleted_ids = [r for r, ok in zip(kind.resource_ids, deleted) if ok]
+        if kind.lister is not None:
+            futures = self._wait(kind, deleted_ids, waiters.DELETED)
+            for future in futures:
+                if future.exception() is not None:
+                    LOG.warning("Cleanup::%s %s was not deleted: %s",
+                                kind.name, future.resource_id,
+                                future.exception())
+            deleted_ids = [f.resource_id for f in futures
+                           if f.exception() is None]
+        kind.deleted_ids = deleted_ids
+        kind.deleted = len(deleted_ids)
+        kind.failed = len(kind.resource_ids) - kind.deleted
+        kind.elapsed = time.time() - start
+
+    def run(self):
+        """
+        Clears every registered resource and returns a mapping of the kind
+        names to their (deleted, failed, elapsed seconds) statistics.
+        """
+        for stage in self._stages():
+            parallel_map(self._clear, stage, len(stage))
+        stats = {}
+        for kind in (self.kinds[name] for name in self._order):
+            if not kind.resource_ids:
+                continue
+            stats[kind.name] = (kind.deleted, kind.failed, kind.elapsed)
+            LOG.info("Cleanup::removed %d %s(s) (%d failed) in %.1f s",
+                     kind.deleted, kind.name, kind.failed, kind.elapsed)
+        return stats
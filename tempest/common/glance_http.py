@@ -16,7 +16,6 @@
 # Originally copied from python-glanceclient
 
 import copy
-import hashlib
 import httplib
 import json
 import posixpath
@@ -160,13 +159,9 @@ class HTTPClient(object):
         LOG.info("Response Status: " + status)
         if resp.getheaders():
             LOG.info('Response Headers: ' + str(resp.getheaders()))
-        if body:
-            str_body = str(body)
-            length = len(body)
-            LOG.info('Response Body: ' + str_body[:2048])
-            if length >= 2048:
-                self.LOG.debug("Large body (%d) md5 summary: %s", length,
-                               hashlib.md5(str_body).hexdigest())
+        if isinstance(body, ResponseBodyIterator):
+            LOG.info('Response Body: <streamed, %s bytes>',
+                     resp.getheader('content-length', 'unknown'))
 
     def json_request(self, method, url, **kwargs):
         kwargs.setdefault('headers', {})
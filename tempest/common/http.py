@@ -16,8 +16,187 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import httplib
+import os
+import select
+import socket
+import threading
+import time
+import urlparse
+
 import httplib2
 
+CHUNK_SIZE = 64 * 1024
+
+# methods replayed after a failure on a reused connection: the request may
+# have reached the server, so only the ones which don't create anything
+REPLAYED_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT')
+
+
+def is_replayable(body):
+    """Tells whether body can be sent again, i.e. it is not a stream."""
+    return body is None or isinstance(body, basestring)
+
+
+def is_retryable(method, body, exc):
+    """
+    Tells whether a request which failed on a reused connection can be
+    sent again. A timed out request may still be processed by the server.
+    """
+    return (method.upper() in REPLAYED_METHODS and is_replayable(body) and
+            not isinstance(exc, socket.timeout))
+
+
+def body_length(body):
+    """Returns the length of a request body, or None if it is unknown."""
+    if body is None:
+        return 0
+    if isinstance(body, basestring):
+        return len(body)
+    if hasattr(body, 'fileno') and hasattr(body, 'tell'):
+        try:
+            return os.fstat(body.fileno()).st_size - body.tell()
+        except (AttributeError, IOError, OSError):
+            pass
+    if hasattr(body, '__len__'):
+        return len(body)
+    return None
+
+
+def iter_body(body, chunk_size=CHUNK_SIZE):
+    """Yields a string, file-like or iterable request body in chunks."""
+    if body is None:
+        return
+    if isinstance(body, basestring):
+        for offset in xrange(0, len(body), chunk_size):
+            yield body[offset:offset + chunk_size]
+    elif hasattr(body, 'read'):
+        chunk = body.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = body.read(chunk_size)
+    else:
+        for chunk in body:
+            if chunk:
+                yield chunk
+
+
+def _get_connection(http_obj, uri):
+    """Returns the connection of http_obj serving uri, like httplib2 does.
+
+    The connection is stored in http_obj.connections, so the httplib2
+    requests made later through http_obj reuse it as well.
+    """
+    scheme, authority = urlparse.urlsplit(uri)[:2]
+    conn_key = '%s:%s' % (scheme, authority)
+    conn = http_obj.connections.get(conn_key)
+    if conn is None:
+        if scheme == 'https':
+            dscv = http_obj.disable_ssl_certificate_validation
+            conn = httplib2.HTTPSConnectionWithTimeout(
+                authority, timeout=http_obj.timeout,
+                ca_certs=http_obj.ca_certs,
+                disable_ssl_certificate_validation=dscv)
+        else:
+            conn = httplib2.HTTPConnectionWithTimeout(
+                authority, timeout=http_obj.timeout)
+        http_obj.connections[conn_key] = conn
+    return conn
+
+
+def _send(conn, uri, method, body, headers):
+    """Sends a request without buffering its body and returns the response.
+
+    A body of unknown length is sent with chunked transfer encoding.
+    """
+    path, query = urlparse.urlsplit(uri)[2:4]
+    request_uri = (path or '/') + ('?' + query if query else '')
+    headers = headers or {}
+    conn.putrequest(method, request_uri, skip_accept_encoding=True)
+    for header, value in headers.items():
+        conn.putheader(header, value)
+    chunked = False
+    if 'content-length' not in [h.lower() for h in headers]:
+        length = body_length(body)
+        if length is not None:
+            if length or method.upper() in ('POST', 'PUT', 'PATCH'):
+                conn.putheader('Content-Length', str(length))
+        else:
+            conn.putheader('Transfer-Encoding', 'chunked')
+            chunked = True
+    conn.endheaders()
+    for chunk in iter_body(body):
+        if chunked:
+            conn.send('%x\r\n%s\r\n' % (len(chunk), chunk))
+        else:
+            conn.send(chunk)
+    if chunked:
+        conn.send('0\r\n\r\n')
+    return conn.getresponse()
+
+
+class StreamingBody(object):
+    """File-like, iterable body of a streamed response.
+
+    The body is read from the socket on demand, so it is never held in
+    memory as a whole. The connection is given back for reuse once the
+    body is exhausted, and closed if the body is closed before that.
+    """
+
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+        length = response.getheader('content-length')
+        self.length = int(length) if length is not None else None
+
+    def _finish(self, reusable):
+        if self._response is not None:
+            self._response = None
+            self._release(reusable)
+
+    def read(self, amt=None):
+        if self._response is None:
+            return ''
+        try:
+            data = self._response.read(amt)
+        except Exception:
+            self._finish(False)
+            raise
+        if amt is None or not data or self._response.isclosed():
+            self._finish(True)
+        return data
+
+    def __iter__(self):
+        chunk = self.read(CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = self.read(CHUNK_SIZE)
+
+    def close(self):
+        self._finish(False)
+
+    def __repr__(self):
+        return '<StreamingBody length=%s>' % self.length
+
+
+def _stream(http_obj, uri, method, body, headers, release):
+    conn = _get_connection(http_obj, uri)
+    response = _send(conn, uri, method, body, headers)
+
+    def _release(reusable):
+        if response.will_close:
+            reusable = False
+        if not reusable:
+            conn.close()
+        release(reusable)
+
+    resp = httplib2.Response(response)
+    body = StreamingBody(response, _release)
+    if method.upper() == 'HEAD' or response.length == 0:
+        body.read()
+    return resp, body
+
 
 class ClosingHttp(httplib2.Http):
     def request(self, *args, **kwargs):
@@ -25,3 +204,175 @@ class ClosingHttp(httplib2.Http):
         new_headers = dict(original_headers, connection='close')
         new_kwargs = dict(kwargs, headers=new_headers)
         return super(ClosingHttp, self).request(*args, **new_kwargs)
+
+    def stream_request(self, uri, method='GET', body=None, headers=None):
+        """Sends body unbuffered and returns a (resp, StreamingBody) pair."""
+        headers = dict(headers or {}, connection='close')
+        return _stream(self, uri, method, body, headers,
+                       lambda reusable: None)
+
+
+class ConnectionPool(object):
+    """Idle keep-alive connections to a single endpoint.
+
+    Every pooled item is a plain httplib2.Http object, which keeps its own
+    persistent connection, so a borrowed item is never shared between two
+    threads. Items idle for longer than ``idle_timeout`` are closed instead
+    of being reused, and at most ``size`` idle items are retained.
+    """
+
+    def __init__(self, size, idle_timeout, **http_kwargs):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.http_kwargs = http_kwargs
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _close(http_obj):
+        for conn in http_obj.connections.values():
+            conn.close()
+        http_obj.connections.clear()
+
+    @staticmethod
+    def _is_stale(http_obj):
+        """Tells whether the server closed a connection of http_obj."""
+        for conn in http_obj.connections.values():
+            sock = getattr(conn, 'sock', None)
+            if sock is None:
+                continue
+            # NOTE: an idle connection is only readable once closed
+            try:
+                if select.select([sock], [], [], 0)[0]:
+                    return True
+            except (select.error, socket.error, ValueError):
+                return True
+        return False
+
+    def _check_pid(self):
+        # NOTE: sockets inherited through fork() are shared with the parent,
+        # so a forked worker (like the stress processes) starts empty.
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._pid = os.getpid()
+
+    def get(self):
+        """Returns a (http_obj, reused) pair."""
+        now = time.time()
+        with self._lock:
+            self._check_pid()
+            while self._idle and now - self._idle[0][0] > self.idle_timeout:
+                self._close(self._idle.popleft()[1])
+            while self._idle:
+                http_obj = self._idle.pop()[1]
+                if not self._is_stale(http_obj):
+                    return http_obj, True
+                self._close(http_obj)
+        return httplib2.Http(**self.http_kwargs), False
+
+    def put(self, http_obj):
+        with self._lock:
+            self._check_pid()
+            if len(self._idle) < self.size:
+                self._idle.append((time.time(), http_obj))
+                return
+        self._close(http_obj)
+
+    def discard(self, http_obj):
+        self._close(http_obj)
+
+    def clear(self):
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop()[1])
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(uri, size, idle_timeout, **http_kwargs):
+    """Returns the process wide connection pool serving the uri's endpoint."""
+    scheme, netloc = urlparse.urlsplit(uri)[:2]
+    key = (scheme, netloc.lower(), tuple(sorted(http_kwargs.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(size, idle_timeout, **http_kwargs)
+            _pools[key] = pool
+    return pool
+
+
+def clear_pools():
+    """Closes every idle pooled connection."""
+    with _pools_lock:
+        pools = _pools.values()
+    for pool in pools:
+        pool.clear()
+
+
+class PooledHttp(object):
+    """httplib2.Http compatible client reusing keep-alive connections.
+
+    Connections are pooled per endpoint and shared by every PooledHttp of
+    the process, so all the clients talking to the same host reuse them.
+    An idle connection closed by the server is not reused. A request
+    failing on a reused connection anyway is retried once on a fresh
+    connection, if it can't create anything twice, see is_retryable().
+    """
+
+    def __init__(self, pool_size=10, idle_timeout=60, **http_kwargs):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.http_kwargs = http_kwargs
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        pool = get_pool(uri, self.pool_size, self.idle_timeout,
+                        **self.http_kwargs)
+        http_obj, reused = pool.get()
+        try:
+            resp, content = http_obj.request(uri, method, body=body,
+                                             headers=headers, **kwargs)
+        except (socket.error, httplib.HTTPException) as exc:
+            pool.discard(http_obj)
+            if not reused or not is_retryable(method, body, exc):
+                raise
+            http_obj = httplib2.Http(**self.http_kwargs)
+            resp, content = http_obj.request(uri, method, body=body,
+                                             headers=headers, **kwargs)
+        except Exception:
+            pool.discard(http_obj)
+            raise
+        if resp.get('connection', '').lower() == 'close':
+            pool.discard(http_obj)
+        else:
+            pool.put(http_obj)
+        return resp, content
+
+    def stream_request(self, uri, method='GET', body=None, headers=None):
+        """Sends body unbuffered and returns a (resp, StreamingBody) pair.
+
+        The pooled connection is borrowed until the body is consumed.
+        """
+        pool = get_pool(uri, self.pool_size, self.idle_timeout,
+                        **self.http_kwargs)
+        http_obj, reused = pool.get()
+
+        def _release(reusable):
+            if reusable:
+                pool.put(http_obj)
+            else:
+                pool.discard(http_obj)
+
+        try:
+            return _stream(http_obj, uri, method, body, headers, _release)
+        except (socket.error, httplib.HTTPException) as exc:
+            pool.discard(http_obj)
+            if not reused or not is_retryable(method, body, exc):
+                raise
+            http_obj = httplib2.Http(**self.http_kwargs)
+            return _stream(http_obj, uri, method, body, headers, _release)
+        except Exception:
+            pool.discard(http_obj)
+            raise
@@ -14,16 +14,134 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import json
+import os
+import socket
+
 import keystoneclient.v2_0.client
 
 from tempest import clients
 from tempest.common.utils.data_utils import rand_name
 from tempest import config
 from tempest import exceptions
+from tempest.openstack.common import lockutils
 from tempest.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+_admin_manager = None
+
+
+def _get_admin_manager():
+    """Returns the admin manager of the leak checks, shared by the process."""
+    global _admin_manager
+    if _admin_manager is None:
+        _admin_manager = clients.AdminManager()
+    return _admin_manager
+
+
+class PooledResource(dict):
+    """User or tenant of a pooled credential, usable as dict or object."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class CredentialPool(object):
+    """
+    File backed pool of pre-provisioned tenant/user pairs
+
+    The pool file holds a JSON list of entries with the username,
+    tenant_name, password, user_id, tenant_id and admin keys. Test classes
+    lease entries under an inter-process lock and release them when done.
+    A lease held by a dead process of this host is taken over, and an entry
+    released with leaked resources is quarantined instead of being leased
+    again.
+    """
+
+    def __init__(self, pool_file):
+        self.pool_file = pool_file
+
+    def _lock(self):
+        lock_path = os.path.dirname(os.path.abspath(self.pool_file))
+        return lockutils.lock('isolated-creds-pool', 'tempest-',
+                              external=True, lock_path=lock_path)
+
+    def _load(self):
+        try:
+            with open(self.pool_file) as pool_file:
+                return json.load(pool_file)
+        except IOError:
+            return []
+
+    def _save(self, entries):
+        tmp_file = '%s.%d' % (self.pool_file, os.getpid())
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as pool_file:
+            json.dump(entries, pool_file, indent=2)
+        os.rename(tmp_file, self.pool_file)
+
+    @staticmethod
+    def _is_leased(entry):
+        lease = entry.get('leased_by')
+        if not lease:
+            return False
+        if lease.get('host', socket.gethostname()) != socket.gethostname():
+            # NOTE: the holder runs on another host, it can't be checked
+            return True
+        try:
+            os.kill(lease['pid'], 0)
+        except OSError as exc:
+            if exc.errno == errno.EPERM:
+                # NOTE: alive, but run by another user
+                return True
+            LOG.warning("Taking over the lease of %s held by dead process "
+                        "%s" % (entry['username'], lease['pid']))
+            return False
+        return True
+
+    def lease(self, owner, admin=False):
+        """Returns a free entry leased to owner, or None if there is none."""
+        with self._lock():
+            entries = self._load()
+            for entry in entries:
+                if (entry.get('admin', False) != admin or
+                        entry.get('quarantined') or self._is_leased(entry)):
+                    continue
+                entry['leased_by'] = {'pid': os.getpid(),
+                                      'host': socket.gethostname(),
+                                      'owner': owner}
+                self._save(entries)
+                return entry
+        return None
+
+    def release(self, entry, leaks=None):
+        with self._lock():
+            entries = self._load()
+            for pooled in entries:
+                if pooled['user_id'] == entry['user_id']:
+                    pooled['leased_by'] = None
+                    if leaks:
+                        pooled['quarantined'] = leaks
+            self._save(entries)
+
+    def add(self, new_entries):
+        with self._lock():
+            entries = self._load()
+            entries.extend(new_entries)
+            self._save(entries)
+
+    def remove_all(self):
+        """Empties the pool and returns the removed entries."""
+        with self._lock():
+            entries = self._load()
+            self._save([])
+        return entries
+
 
 class IsolatedCreds(object):
 
@@ -36,6 +154,9 @@ class IsolatedCreds(object):
         self.interface = interface
         self.password = password
         self.admin_client = self._get_identity_admin_client()
+        pool_file = self.config.compute.isolated_creds_pool_file
+        self.pool = CredentialPool(pool_file) if pool_file else None
+        self.leased_creds = {}
 
     def _get_keystone_client(self):
         username = self.config.identity.admin_username
@@ -182,46 +303,135 @@ class IsolatedCreds(object):
     def get_admin_user(self):
         return self.isolated_creds.get('admin')[0]
 
+    def _lease_creds(self, cred_type, admin=False):
+        """Returns a (user, tenant) pair leased from the pool, or None."""
+        if self.pool is None:
+            return None
+        entry = self.pool.lease(self.name, admin=admin)
+        if entry is None:
+            LOG.warning("Isolated credential pool exhausted, creating %s "
+                        "creds" % cred_type)
+            return None
+        self.leased_creds[cred_type] = entry
+        user = PooledResource(id=entry['user_id'], name=entry['username'],
+                              tenantId=entry['tenant_id'])
+        tenant = PooledResource(id=entry['tenant_id'],
+                                name=entry['tenant_name'])
+        return user, tenant
+
+    def _get_password(self, cred_type):
+        if cred_type in self.leased_creds:
+            return self.leased_creds[cred_type]['password']
+        return self.password
+
     def get_primary_creds(self):
         if self.isolated_creds.get('primary'):
             user, tenant = self.isolated_creds['primary']
             username, tenant_name = self._get_cred_names(user, tenant)
         else:
-            user, tenant = self._create_creds()
+            user, tenant = (self._lease_creds('primary') or
+                            self._create_creds())
             username, tenant_name = self._get_cred_names(user, tenant)
             self.isolated_creds['primary'] = (user, tenant)
             LOG.info("Aquired isolated creds:\n user: %s, tenant: %s"
                      % (username, tenant_name))
-        return username, tenant_name, self.password
+        return username, tenant_name, self._get_password('primary')
 
     def get_admin_creds(self):
         if self.isolated_creds.get('admin'):
             user, tenant = self.isolated_creds['admin']
             username, tenant_name = self._get_cred_names(user, tenant)
         else:
-            user, tenant = self._create_creds(admin=True)
+            user, tenant = (self._lease_creds('admin', admin=True) or
+                            self._create_creds(admin=True))
             username, tenant_name = self._get_cred_names(user, tenant)
             self.isolated_creds['admin'] = (user, tenant)
             LOG.info("Aquired admin isolated creds:\n user: %s, tenant: %s"
                      % (username, tenant_name))
-            return username, tenant_name, self.password
+        return username, tenant_name, self._get_password('admin')
 
     def get_alt_creds(self):
         if self.isolated_creds.get('alt'):
             user, tenant = self.isolated_creds['alt']
             username, tenant_name = self._get_cred_names(user, tenant)
         else:
-            user, tenant = self._create_creds()
+            user, tenant = (self._lease_creds('alt') or
+                            self._create_creds())
             username, tenant_name = self._get_cred_names(user, tenant)
             self.isolated_creds['alt'] = (user, tenant)
             LOG.info("Aquired alt isolated creds:\n user: %s, tenant: %s"
                      % (username, tenant_name))
-        return username, tenant_name, self.password
+        return username, tenant_name, self._get_password('alt')
+
+    def _find_leaks(self, tenant_id):
+        """Returns a description of the resources left in a tenant."""
+        leaks = []
+        admin_manager = _get_admin_manager()
+        _, body = admin_manager.servers_client.list_servers(
+            {'all_tenants': True, 'tenant_id': tenant_id})
+        if body['servers']:
+            leaks.append('%d server(s)' % len(body['servers']))
+        if self.config.service_available.cinder:
+            _, volumes = admin_manager.volumes_client.list_volumes_with_detail(
+                {'all_tenants': True, 'project_id': tenant_id})
+            # NOTE: in case the filter is ignored by the API
+            volumes = [v for v in volumes
+                       if v.get('os-vol-tenant-attr:tenant_id') == tenant_id]
+            if volumes:
+                leaks.append('%d volume(s)' % len(volumes))
+        return ', '.join(leaks)
+
+    def _release_creds(self, cred_type):
+        entry = self.leased_creds.pop(cred_type)
+        try:
+            leaks = self._find_leaks(entry['tenant_id'])
+        except Exception:
+            LOG.exception("Leak check of tenant %s failed" %
+                          entry['tenant_name'])
+            leaks = None
+        if leaks:
+            LOG.warning("%s leaked %s in pooled tenant %s, quarantining it"
+                        % (self.name, leaks, entry['tenant_name']))
+        self.pool.release(entry, leaks)
+
+    def provision_pool(self, count, admin_count=0):
+        """Creates tenant/user pairs and adds them to the pool."""
+        entries = []
+        for index in xrange(count + admin_count):
+            admin = index >= count
+            user, tenant = self._create_creds(suffix='-pool', admin=admin)
+            username, tenant_name = self._get_cred_names(user, tenant)
+            if self.tempest_client:
+                user_id, tenant_id = user['id'], tenant['id']
+            else:
+                user_id, tenant_id = user.id, tenant.id
+            entries.append({'username': username,
+                            'tenant_name': tenant_name,
+                            'password': self.password,
+                            'user_id': user_id,
+                            'tenant_id': tenant_id,
+                            'admin': admin})
+        self.pool.add(entries)
+        return entries
+
+    def purge_pool(self):
+        """Deletes every pooled user and tenant and empties the pool."""
+        for entry in self.pool.remove_all():
+            for delete, resource_id in ((self._delete_user, entry['user_id']),
+                                        (self._delete_tenant,
+                                         entry['tenant_id'])):
+                try:
+                    delete(resource_id)
+                except exceptions.NotFound:
+                    pass
 
     def clear_isolated_creds(self):
         if not self.isolated_creds:
             return
         for cred in self.isolated_creds:
+            if cred in self.leased_creds:
+                self._release_creds(cred)
+                continue
             user, tenant = self.isolated_creds.get(cred)
             try:
                 if self.tempest_client:
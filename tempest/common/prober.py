@@ -0,0 +1,286 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import os
+import select
+import socket
+import struct
+import subprocess
+import time
+
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# the "port" of the targets probed with an ICMP echo request
+ICMP = 'icmp'
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += '\0'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _echo_request(ident, seq):
+    payload = 'tempest-probe'
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, ident,
+                       seq) + payload
+
+
+class _Target(object):
+
+    def __init__(self, key, family, sockaddr, start, interval):
+        self.key = key
+        self.family = family
+        self.sockaddr = sockaddr
+        self.next_attempt = start
+        self.interval = interval
+        self.attempt_end = None
+        self.sock = None
+        self.proc = None
+
+    @property
+    def icmp(self):
+        return self.key[1] == ICMP
+
+
+class Prober(object):
+    """
+    Concurrent reachability checks of many network targets
+
+    A target is an (address, port) pair, where the port is ICMP for an
+    ICMP echo. All targets are probed at once from a single thread: TCP
+    probes are non-blocking connects, and ICMP probes are echo requests
+    sent on one ICMP socket, an unprivileged datagram socket where the
+    kernel allows it, a raw socket otherwise. Without either, e.g. for
+    IPv6 or as a regular user on an older kernel, they fall back to one
+    ping process per attempt, which run concurrently as well.
+
+    An attempt which fails or gets no answer within ``attempt_timeout`` is
+    retried after ``interval`` seconds, growing by ``backoff`` up to
+    ``max_interval``, until the target answers or ``timeout`` is over.
+    """
+
+    def __init__(self, timeout, interval=1.0, max_interval=5.0, backoff=1.5,
+                 attempt_timeout=1.0):
+        self.timeout = timeout
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.attempt_timeout = attempt_timeout
+        self._ident = os.getpid() & 0xffff
+        self._seq = 0
+        self._echoes = {}
+
+    def _icmp_socket(self):
+        """Returns the ICMP socket and whether it's a raw one, or None."""
+        for sock_type, raw in ((socket.SOCK_DGRAM, False),
+                               (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type,
+                                     socket.IPPROTO_ICMP)
+            except socket.error:
+                continue
+            sock.setblocking(0)
+            return sock, raw
+        LOG.debug("No ICMP socket allowed, probing with ping")
+        return None, False
+
+    def _start_attempt(self, target, now, poll, fds, icmp_sock):
+        target.attempt_end = now + self.attempt_timeout
+        if target.icmp:
+            if icmp_sock is not None and target.family == socket.AF_INET:
+                self._seq = (self._seq + 1) & 0xffff
+                self._echoes[self._seq] = target
+                try:
+                    icmp_sock.sendto(_echo_request(self._ident, self._seq),
+                                     (target.sockaddr[0], 0))
+                except socket.error as exc:
+                    LOG.debug("Echo request to %s failed: %s" %
+                              (target.key[0], exc))
+                    target.attempt_end = now
+                return False
+            ping = 'ping6' if target.family == socket.AF_INET6 else 'ping'
+            try:
+                target.proc = subprocess.Popen(
+                    [ping, '-c1', '-w%d' % max(int(self.attempt_timeout), 1),
+                     target.sockaddr[0]],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            except OSError as exc:
+                LOG.warning("Cannot run %s: %s" % (ping, exc))
+                target.attempt_end = now
+                return False
+            # NOTE: ping has its own deadline
+            target.attempt_end = None
+            return False
+        sock = socket.socket(target.family, socket.SOCK_STREAM)
+        sock.setblocking(0)
+        error = sock.connect_ex(target.sockaddr)
+        if error == 0:
+            sock.close()
+            return True
+        if error not in IN_PROGRESS:
+            sock.close()
+            target.attempt_end = now
+            return False
+        target.sock = sock
+        fds[sock.fileno()] = target
+        poll.register(sock, select.POLLOUT)
+        return False
+
+    def _end_attempt(self, target, now, poll, fds):
+        if target.sock is not None:
+            del fds[target.sock.fileno()]
+            poll.unregister(target.sock)
+            target.sock.close()
+            target.sock = None
+        if target.proc is not None:
+            if target.proc.poll() is None:
+                target.proc.kill()
+            target.proc.wait()
+            target.proc = None
+        target.attempt_end = None
+        target.next_attempt = now + target.interval
+        target.interval = min(target.interval * self.backoff,
+                              self.max_interval)
+
+    def _read_echo_replies(self, icmp_sock, raw):
+        """Returns the targets which answered an echo request."""
+        answered = []
+        while True:
+            try:
+                data, addr = icmp_sock.recvfrom(2048)
+            except socket.error as exc:
+                if exc.errno in IN_PROGRESS:
+                    return answered
+                raise
+            if raw:
+                data = data[(ord(data[0]) & 0x0f) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            # NOTE: the kernel sets the ident of the datagram sockets
+            if icmp_type != ICMP_ECHO_REPLY or (raw and ident != self._ident):
+                continue
+            target = self._echoes.get(seq)
+            if target is not None and target.sockaddr[0] == addr[0]:
+                answered.append(target)
+
+    def probe(self, targets):
+        """
+        Probes the (address, port) targets and returns a dict of the
+        seconds each target took to answer, None for the targets which
+        didn't answer within the timeout.
+        """
+        start = time.time()
+        deadline = start + self.timeout
+        results = dict((key, None) for key in targets)
+        pending = []
+        for address, port in results:
+            family, _, _, _, sockaddr = socket.getaddrinfo(
+                address, None if port == ICMP else port, 0,
+                socket.SOCK_STREAM)[0]
+            pending.append(_Target((address, port), family, sockaddr, start,
+                                   self.interval))
+        icmp_sock = raw = None
+        if any(target.icmp and target.family == socket.AF_INET
+               for target in pending):
+            icmp_sock, raw = self._icmp_socket()
+        poll = select.poll()
+        fds = {}
+        if icmp_sock is not None:
+            poll.register(icmp_sock, select.POLLIN)
+
+        def reached(target, now):
+            results[target.key] = now - start
+            LOG.debug("%s:%s reachable after %.2f s" %
+                      (target.key[0], target.key[1], now - start))
+            self._end_attempt(target, now, poll, fds)
+            pending.remove(target)
+
+        try:
+            while pending:
+                now = time.time()
+                if now >= deadline:
+                    break
+                for target in list(pending):
+                    if target.proc is not None and \
+                            target.proc.poll() is not None:
+                        if target.proc.returncode == 0:
+                            reached(target, now)
+                            continue
+                        self._end_attempt(target, now, poll, fds)
+                    if target.attempt_end is not None and \
+                            now >= target.attempt_end:
+                        self._end_attempt(target, now, poll, fds)
+                    if target.attempt_end is None and target.proc is None \
+                            and now >= target.next_attempt:
+                        if self._start_attempt(target, now, poll, fds,
+                                               icmp_sock):
+                            reached(target, now)
+                if not pending:
+                    break
+                wake = [deadline]
+                for target in pending:
+                    if target.proc is not None:
+                        # NOTE: the ping processes are polled
+                        wake.append(now + 0.05)
+                    elif target.attempt_end is not None:
+                        wake.append(target.attempt_end)
+                    else:
+                        wake.append(target.next_attempt)
+                wait = max(min(wake) - time.time(), 0)
+                for fd, _ in poll.poll(wait * 1000):
+                    now = time.time()
+                    if icmp_sock is not None and fd == icmp_sock.fileno():
+                        for target in self._read_echo_replies(icmp_sock,
+                                                              raw):
+                            if target in pending:
+                                reached(target, now)
+                        continue
+                    target = fds.get(fd)
+                    if target is None:
+                        continue
+                    error = target.sock.getsockopt(socket.SOL_SOCKET,
+                                                   socket.SO_ERROR)
+                    if error == 0:
+                        reached(target, now)
+                    else:
+                        # NOTE: e.g. refused while the server boots
+                        self._end_attempt(target, now, poll, fds)
+        finally:
+            now = time.time()
+            for target in pending:
+                self._end_attempt(target, now, poll, fds)
+            if icmp_sock is not None:
+                icmp_sock.close()
+            self._echoes.clear()
+        return results
+
+
+def probe(targets, timeout, **kwargs):
+    """Probes (address, port) targets at once, see Prober."""
+    return Prober(timeout, **kwargs).probe(targets)
@@ -0,0 +1,184 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import re
+import threading
+import time
+
+from tempest.common import rest_client
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# (path of the create call, resource kind, key of the created resource,
+# attribute holding its id)
+ROUTES = (
+    (re.compile(r'^servers$'), 'server', 'server', 'id'),
+    (re.compile(r'^os-keypairs$'), 'keypair', 'keypair', 'name'),
+    (re.compile(r'^os-floating-ips$'), 'floating_ip', 'floating_ip', 'id'),
+    (re.compile(r'^os-security-groups$'), 'security_group',
+     'security_group', 'id'),
+    (re.compile(r'^(os-)?volumes$'), 'volume', 'volume', 'id'),
+    (re.compile(r'^(os-)?snapshots$'), 'snapshot', 'snapshot', 'id'),
+    (re.compile(r'^users$'), 'user', 'user', 'id'),
+    (re.compile(r'^tenants$'), 'tenant', 'tenant', 'id'),
+)
+
+# kinds which only their owner can delete, journaled with its credentials
+OWNER_KINDS = ('keypair', 'floating_ip', 'security_group')
+
+_context = threading.local()
+
+
+def set_test(name):
+    """Tags the resources created by the calling thread with a test name."""
+    _context.test = name
+
+
+def _route(method, url):
+    path = url.split('?', 1)[0].strip('/')
+    if method == 'POST':
+        for pattern, kind, key, attr in ROUTES:
+            if pattern.match(path):
+                return kind, key, attr, None
+    elif method == 'DELETE' and '/' in path:
+        collection, resource_id = path.rsplit('/', 1)
+        for pattern, kind, key, attr in ROUTES:
+            if pattern.match(collection):
+                return kind, key, attr, resource_id
+    return None
+
+
+class ResourceJournal(object):
+    """
+    Append-only on-disk journal of the resources created through RestClient
+
+    Every successful create call of a known resource kind is appended to
+    the journal as one JSON line, tagged with the worker process, the test
+    of the calling thread (see set_test()) and the tenant, and every delete
+    call of such a resource as well. The file is opened in append mode by
+    every process, so the records of concurrent workers never interleave
+    and are on disk as soon as the call returns, and the resources left by
+    a crashed run are still known to the next cleanup. A journal file
+    compacted or removed meanwhile is opened again before writing. The
+    file may hold credentials and is only readable by its owner.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def _is_stale(self):
+        """Tells whether the file was replaced or removed since opened."""
+        try:
+            path_stat = os.stat(self.path)
+        except OSError:
+            return True
+        fd_stat = os.fstat(self._fd)
+        return (fd_stat.st_nlink == 0 or
+                (fd_stat.st_dev, fd_stat.st_ino) !=
+                (path_stat.st_dev, path_stat.st_ino))
+
+    def _write(self, record):
+        if self._fd is not None and self._is_stale():
+            self.close()
+        if self._fd is None:
+            self._fd = os.open(self.path,
+                               os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size:
+                os.lseek(self._fd, -1, os.SEEK_END)
+                if os.read(self._fd, 1) != '\n':
+                    # NOTE: end the partial record of a crashed process
+                    os.write(self._fd, '\n')
+        # NOTE: a single write per record, appends are atomic
+        os.write(self._fd, json.dumps(record) + '\n')
+
+    def observe_response(self, client, method, url, resp, resp_body):
+        if resp.status >= 400:
+            return
+        route = _route(method, url)
+        if route is None:
+            return
+        kind, key, attr, resource_id = route
+        if resource_id is not None:
+            self.deleted(kind, resource_id)
+            return
+        try:
+            body = client._parse_resp(resp_body)
+            resource = body.get(key, body)
+            resource_id = resource[attr]
+        except Exception:
+            LOG.warning("Could not journal the %s created by %s" %
+                        (kind, url))
+            return
+        record = {'op': 'create', 'kind': kind, 'id': resource_id,
+                  'worker': os.getpid(),
+                  'test': getattr(_context, 'test', None),
+                  'user': client.user, 'tenant': client.tenant_name,
+                  'time': time.time()}
+        if kind in OWNER_KINDS:
+            record['password'] = client.password
+        self._write(record)
+
+    def deleted(self, kind, resource_id):
+        self._write({'op': 'delete', 'kind': kind, 'id': resource_id,
+                     'worker': os.getpid(), 'time': time.time()})
+
+    def install(self):
+        """Journals the resources of every RestClient of the process."""
+        rest_client.RESPONSE_OBSERVERS.append(self.observe_response)
+
+    def pending(self):
+        """
+        Returns the create records of the resources which are not deleted,
+        in creation order.
+        """
+        created = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # NOTE: the last record of a crashed process
+                    continue
+                resource = (record['kind'], record['id'])
+                if record['op'] == 'create':
+                    created[resource] = record
+                else:
+                    created.pop(resource, None)
+        return sorted(created.values(), key=lambda record: record['time'])
+
+    def compact(self):
+        """Rewrites the journal with the pending resources only."""
+        pending = self.pending()
+        self.close()
+        if not pending:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as journal:
+            for record in pending:
+                journal.write(json.dumps(record) + '\n')
+        os.rename(tmp_path, self.path)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
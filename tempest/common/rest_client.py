@@ -19,17 +19,26 @@
 import collections
 import hashlib
 import json
+import logging as std_logging
 from lxml import etree
 import re
 import time
 
 from tempest.common import http
+from tempest.common import token_cache
 from tempest import exceptions
 from tempest.openstack.common import log as logging
 from tempest.services.compute.xml.common import xml_to_json
 
 # redrive rate limited calls at most twice
 MAX_RECURSION_DEPTH = 2
+
+# callables invoked as observer(service, method, url, status, seconds)
+# after every request, used e.g. to record the latencies of stress tests
+REQUEST_OBSERVERS = []
+# callables invoked as observer(client, method, url, resp, resp_body) after
+# every request without a streamed response, e.g. to journal the resources
+RESPONSE_OBSERVERS = []
 TOKEN_CHARS_RE = re.compile('^[-A-Za-z0-9+/=]*$')
 
 
@@ -49,6 +58,7 @@ class RestClient(object):
         self.service = None
         self.token = None
         self.base_url = None
+        self._token_revoked = False
         self.region = {'compute': self.config.identity.region}
         self.endpoint_url = 'publicURL'
         self.headers = {'Content-Type': 'application/%s' % self.TYPE,
@@ -64,8 +74,14 @@ class RestClient(object):
                                        'retry-after', 'server',
                                        'vary', 'www-authenticate'))
         dscv = self.config.identity.disable_ssl_certificate_validation
-        self.http_obj = http.ClosingHttp(
-            disable_ssl_certificate_validation=dscv)
+        if self.config.http.keep_alive:
+            self.http_obj = http.PooledHttp(
+                pool_size=self.config.http.pool_size,
+                idle_timeout=self.config.http.pool_idle_timeout,
+                disable_ssl_certificate_validation=dscv)
+        else:
+            self.http_obj = http.ClosingHttp(
+                disable_ssl_certificate_validation=dscv)
 
     def _set_auth(self):
         """
@@ -87,8 +103,10 @@ class RestClient(object):
         will fetch a new token and base_url.
         """
 
+        self._invalidate_token()
         self.token = None
         self.base_url = None
+        self._token_revoked = False
 
     def get_auth(self):
         """Returns the token of the current request or sets the token if
@@ -115,11 +133,76 @@ class RestClient(object):
         except Exception:
             raise
 
+    def _get_auth_data(self, auth_func, auth_version, user, password,
+                       auth_url, tenant_name):
+        """
+        Returns the token, its expiry and the service catalog, shared with
+        every client using the same credentials if the token cache is enabled.
+        """
+        args = (user, password, auth_url, tenant_name)
+        if not self.config.identity.token_cache:
+            return auth_func(*args)
+        key = token_cache.cache_key(auth_version, *args)
+        return token_cache.TokenCache().get(key, auth_func, *args)
+
+    def _refresh_token(self):
+        """
+        Picks up the token refreshed or invalidated by other clients using
+        the same credentials.
+        """
+        if self.auth_version == 'v3':
+            auth_func = self._identity_v3_auth_data
+        else:
+            auth_func = self._keystone_auth_data
+        auth_data = self._get_auth_data(auth_func, self.auth_version,
+                                        self.user, self.password,
+                                        self.auth_url, self.tenant_name)
+        self.token = auth_data['token']
+
+    def _invalidate_token(self, token=None):
+        token = token or self.token
+        if token and self.config.identity.token_cache:
+            key = token_cache.cache_key(self.auth_version, self.user,
+                                        self.password, self.auth_url,
+                                        self.tenant_name)
+            token_cache.TokenCache().invalidate(key, token)
+
+    def token_revoked(self, token):
+        """
+        Drops a token revoked by this client from the token cache. If it is
+        the token of this client, the client keeps sending it until
+        clear_auth(), so its requests fail as the negative tests expect,
+        instead of being retried with a new token.
+        """
+        self._invalidate_token(token)
+        if token == self.token:
+            self._token_revoked = True
+
     def keystone_auth(self, user, password, auth_url, service, tenant_name):
         """
         Provides authentication via Keystone using v2 identity API.
         """
 
+        auth_data = self._get_auth_data(self._keystone_auth_data, 'v2',
+                                        user, password, auth_url, tenant_name)
+
+        mgmt_url = None
+        for ep in auth_data['catalog']:
+            if ep["type"] == service:
+                for _ep in ep['endpoints']:
+                    if service in self.region and \
+                            _ep['region'] == self.region[service]:
+                        mgmt_url = _ep[self.endpoint_url]
+                if not mgmt_url:
+                    mgmt_url = ep['endpoints'][0][self.endpoint_url]
+                break
+
+        if mgmt_url is None:
+            raise exceptions.EndpointNotFound(service)
+
+        return auth_data['token'], mgmt_url
+
+    def _keystone_auth_data(self, user, password, auth_url, tenant_name):
         # Normalize URI to ensure /tokens is in it.
         if 'tokens' not in auth_url:
             auth_url = auth_url.rstrip('/') + '/tokens'
@@ -149,21 +232,10 @@ class RestClient(object):
                 print("Failed to obtain token for user: %s" % e)
                 raise
 
-            mgmt_url = None
-            for ep in auth_data['serviceCatalog']:
-                if ep["type"] == service:
-                    for _ep in ep['endpoints']:
-                        if service in self.region and \
-                                _ep['region'] == self.region[service]:
-                            mgmt_url = _ep[self.endpoint_url]
-                    if not mgmt_url:
-                        mgmt_url = ep['endpoints'][0][self.endpoint_url]
-                    break
-
-            if mgmt_url is None:
-                raise exceptions.EndpointNotFound(service)
-
-            return token, mgmt_url
+            expires = token_cache.parse_expiry(
+                auth_data['token'].get('expires'))
+            return {'token': token, 'expires': expires,
+                    'catalog': auth_data['serviceCatalog']}
 
         elif resp.status == 401:
             raise exceptions.AuthenticationFailure(user=user,
@@ -176,6 +248,44 @@ class RestClient(object):
                          project_name, domain_id='default'):
         """Provides authentication using Identity API v3."""
 
+        auth_data = self._get_auth_data(self._identity_v3_auth_data, 'v3',
+                                        user, password, auth_url,
+                                        project_name)
+
+        mgmt_url = None
+        for service_info in auth_data['catalog']:
+            if service_info['type'] != service:
+                continue  # this isn't the entry for us.
+
+            endpoints = service_info['endpoints']
+
+            # Look for an endpoint in the region if configured.
+            if service in self.region:
+                region = self.region[service]
+
+                for ep in endpoints:
+                    if ep['region'] != region:
+                        continue
+
+                    mgmt_url = ep['url']
+                    # FIXME(blk-u): this isn't handling endpoint type
+                    # (public, internal, admin).
+                    break
+
+            if not mgmt_url:
+                # Didn't find endpoint for region, use the first.
+
+                ep = endpoints[0]
+                mgmt_url = ep['url']
+                # FIXME(blk-u): this isn't handling endpoint type
+                # (public, internal, admin).
+
+            break
+
+        return auth_data['token'], mgmt_url
+
+    def _identity_v3_auth_data(self, user, password, auth_url, project_name,
+                               domain_id='default'):
         req_url = auth_url.rstrip('/') + '/auth/tokens'
 
         creds = {
@@ -212,39 +322,10 @@ class RestClient(object):
                                    req_url)
                 raise
 
-            catalog = json.loads(body)['token']['catalog']
-
-            mgmt_url = None
-            for service_info in catalog:
-                if service_info['type'] != service:
-                    continue  # this isn't the entry for us.
-
-                endpoints = service_info['endpoints']
-
-                # Look for an endpoint in the region if configured.
-                if service in self.region:
-                    region = self.region[service]
-
-                    for ep in endpoints:
-                        if ep['region'] != region:
-                            continue
-
-                        mgmt_url = ep['url']
-                        # FIXME(blk-u): this isn't handling endpoint type
-                        # (public, internal, admin).
-                        break
-
-                if not mgmt_url:
-                    # Didn't find endpoint for region, use the first.
-
-                    ep = endpoints[0]
-                    mgmt_url = ep['url']
-                    # FIXME(blk-u): this isn't handling endpoint type
-                    # (public, internal, admin).
-
-                break
-
-            return token, mgmt_url
+            token_data = json.loads(body)['token']
+            expires = token_cache.parse_expiry(token_data.get('expires_at'))
+            return {'token': token, 'expires': expires,
+                    'catalog': token_data['catalog']}
 
         elif resp.status == 401:
             raise exceptions.AuthenticationFailure(user=user,
@@ -284,6 +365,23 @@ class RestClient(object):
         versions = map(lambda x: x['id'], body)
         return resp, versions
 
+    def _log_body(self, kind, body):
+        if isinstance(body, basestring):
+            self.LOG.debug('%s Body: %s', kind, body[:2048])
+            if (len(body) >= 2048 and
+                    self.LOG.logger.isEnabledFor(std_logging.DEBUG)):
+                self.LOG.debug("Large body (%d) md5 summary: %s", len(body),
+                               hashlib.md5(body).hexdigest())
+        elif isinstance(body, http.StreamingBody):
+            self.LOG.debug('%s Body: <streamed, %s bytes>', kind,
+                           body.length if body.length is not None else
+                           'unknown')
+        elif not hasattr(body, 'read') and not hasattr(body, 'next'):
+            self._log_body(kind, str(body))
+        else:
+            self.LOG.debug('%s Body: <streamed %s, %s bytes>', kind,
+                           type(body).__name__, http.body_length(body))
+
     def _log_request(self, method, req_url, headers, body):
         self.LOG.info('Request: ' + method + ' ' + req_url)
         if headers:
@@ -295,12 +393,7 @@ class RestClient(object):
                     print_headers['X-Auth-Token'] = "<Token omitted>"
             self.LOG.debug('Request Headers: ' + str(print_headers))
         if body:
-            str_body = str(body)
-            length = len(str_body)
-            self.LOG.debug('Request Body: ' + str_body[:2048])
-            if length >= 2048:
-                self.LOG.debug("Large body (%d) md5 summary: %s", length,
-                               hashlib.md5(str_body).hexdigest())
+            self._log_body('Request', body)
 
     def _log_response(self, resp, resp_body):
         status = resp['status']
@@ -316,12 +409,7 @@ class RestClient(object):
         if len(headers):
             self.LOG.debug('Response Headers: ' + str(headers))
         if resp_body:
-            str_body = str(resp_body)
-            length = len(str_body)
-            self.LOG.debug('Response Body: ' + str_body[:2048])
-            if length >= 2048:
-                self.LOG.debug("Large body (%d) md5 summary: %s", length,
-                               hashlib.md5(str_body).hexdigest())
+            self._log_body('Response', resp_body)
 
     def _parse_resp(self, body):
         return json.loads(body)
@@ -355,33 +443,59 @@ class RestClient(object):
             self.LOG.warning("status >= 400 response with empty body")
 
     def _request(self, method, url,
-                 headers=None, body=None):
-        """A simple HTTP request interface."""
+                 headers=None, body=None, stream=False):
+        """A simple HTTP request interface.
+
+        File-like and iterable bodies are sent without being buffered. With
+        stream=True the response body of a successful request is returned
+        as a file-like, iterable http.StreamingBody, which should be read
+        to the end or closed.
+        """
 
         req_url = "%s/%s" % (self.base_url, url)
         self._log_request(method, req_url, headers, body)
-        resp, resp_body = self.http_obj.request(req_url, method,
-                                                headers=headers, body=body)
+        start = time.time()
+        if stream or not http.is_replayable(body):
+            resp, resp_body = self.http_obj.stream_request(
+                req_url, method, headers=headers, body=body)
+            if not stream or resp.status >= 400:
+                resp_body = resp_body.read()
+        else:
+            resp, resp_body = self.http_obj.request(req_url, method,
+                                                    headers=headers,
+                                                    body=body)
+        for observer in REQUEST_OBSERVERS:
+            observer(self.service, method, url, resp.status,
+                     time.time() - start)
         self._log_response(resp, resp_body)
         self.response_checker(method, url, headers, body, resp, resp_body)
+        if not stream:
+            for observer in RESPONSE_OBSERVERS:
+                observer(self, method, url, resp, resp_body)
 
         return resp, resp_body
 
     def request(self, method, url,
-                headers=None, body=None):
+                headers=None, body=None, stream=False):
         retry = 0
+        shared_token = (self.config.identity.token_cache and
+                        not self._token_revoked)
         if (self.token is None) or (self.base_url is None):
             self._set_auth()
+        elif shared_token:
+            self._refresh_token()
 
         if headers is None:
             headers = {}
         headers['X-Auth-Token'] = self.token
 
         resp, resp_body = self._request(method, url,
-                                        headers=headers, body=body)
+                                        headers=headers, body=body,
+                                        stream=stream)
 
         while (resp.status == 413 and
                'retry-after' in resp and
+               http.is_replayable(body) and
                 not self.is_absolute_limit(
                     resp, self._parse_resp(resp_body)) and
                 retry < MAX_RECURSION_DEPTH):
@@ -389,7 +503,18 @@ class RestClient(object):
             delay = int(resp['retry-after'])
             time.sleep(delay)
             resp, resp_body = self._request(method, url,
-                                            headers=headers, body=body)
+                                            headers=headers, body=body,
+                                            stream=stream)
+        if resp.status == 401 and shared_token and \
+                http.is_replayable(body):
+            # NOTE: the shared token was revoked, e.g. by another client
+            # using the same credentials, retry once with a new one
+            self._invalidate_token()
+            self._refresh_token()
+            headers['X-Auth-Token'] = self.token
+            resp, resp_body = self._request(method, url,
+                                            headers=headers, body=body,
+                                            stream=stream)
         self._error_checker(method, url, headers, body,
                             resp, resp_body)
         return resp, resp_body
@@ -17,11 +17,16 @@
 
 
 import cStringIO
+import hashlib
+import os
+import re
 import select
 import socket
+import threading
 import time
 import warnings
 
+from tempest.common.utils import misc
 from tempest import exceptions
 
 
@@ -29,8 +34,98 @@ with warnings.catch_warnings():
     warnings.simplefilter("ignore")
     import paramiko
 
+# seconds between the keepalives of the kept connections, so a dead peer
+# is noticed without waiting for a command to time out
+KEEPALIVE_INTERVAL = 30
+
+# maximum number of hosts a fan_out() runs a command on at the same time
+FAN_OUT_WORKERS = 32
+
+# bounds of the size of the reads of the command output, which doubles
+# while the reads fill it and halves when they use less than a quarter
+MIN_BUF_SIZE = 4096
+MAX_BUF_SIZE = 1048576
+
+# end of the standard error output kept for the error of a streamed
+# command
+STDERR_TAIL = 65536
+
+# authenticated connections shared by the clients of the process, by
+# (host, user, credentials), see Client.connection()
+_connections = {}
+_connect_locks = {}
+_lock = threading.Lock()
+
+
+def _next_buf_size(size, read):
+    if read >= size:
+        return min(size * 2, MAX_BUF_SIZE)
+    if read < size // 4:
+        return max(size // 2, MIN_BUF_SIZE)
+    return size
+
+
+def close_all():
+    """Closes the connections kept by all the clients of the process."""
+    with _lock:
+        connections = _connections.values()
+        _connections.clear()
+    for pid, ssh in connections:
+        if pid == os.getpid():
+            ssh.close()
+
+
+class CommandResult(object):
+    """
+    Outcome of a command run by Client.run() on a host. ``exit_status`` is
+    None and ``error`` tells why when the command couldn't be run to its
+    end, e.g. the connection or the command timed out.
+    """
+
+    def __init__(self, host, exit_status=None, stdout='', stderr='',
+                 duration=0.0, error=None):
+        self.host = host
+        self.exit_status = exit_status
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.exit_status == 0
+
+    def __repr__(self):
+        return '<CommandResult %s: exit status %s, %.2f s%s>' % (
+            self.host, self.exit_status, self.duration,
+            ', %s' % self.error if self.error else '')
+
+
+def fan_out(clients, command, timeout=None, workers=FAN_OUT_WORKERS):
+    """
+    Runs a command with every client, on at most ``workers`` hosts at the
+    same time, and returns their CommandResults in the order of the
+    clients. ``timeout`` bounds the connection and the command on every
+    host, so an unreachable host, or one which stopped answering on its
+    kept connection, only holds up its own worker.
+    """
+    if not clients:
+        return []
+    return misc.parallel_map(lambda client: client.run(command, timeout),
+                             clients, workers)
+
 
 class Client(object):
+    """
+    SSH client running commands on a host
+
+    The authenticated connection to the host is kept open and every command
+    runs in a new channel of it, so only the first command pays for the
+    connection, the key exchange and the authentication. The connection is
+    shared with the other clients of the same host, user and credentials in
+    the process, and is opened again when it is found closed. close(), or
+    leaving the client used as a context manager, closes it.
+    """
 
     def __init__(self, host, username, password=None, timeout=300, pkey=None,
                  channel_timeout=10, look_for_keys=False, key_filename=None):
@@ -45,10 +140,20 @@ class Client(object):
         self.key_filename = key_filename
         self.timeout = int(timeout)
         self.channel_timeout = float(channel_timeout)
-        self.buf_size = 1024
+        self.buf_size = MIN_BUF_SIZE
+        self._key = (host, username, key_filename,
+                     pkey and pkey.get_fingerprint(),
+                     password and hashlib.sha1(password).hexdigest())
+
+    def __enter__(self):
+        return self
 
-    def _get_ssh_connection(self, sleep=1.5, backoff=1.01):
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_ssh_connection(self, sleep=1.5, backoff=1.01, timeout=None):
         """Returns an ssh connection to the specified host."""
+        timeout = self.timeout if timeout is None else timeout
         _timeout = True
         bsleep = sleep
         ssh = paramiko.SSHClient()
@@ -56,13 +161,13 @@ class Client(object):
             paramiko.AutoAddPolicy())
         _start_time = time.time()
 
-        while not self._is_timed_out(_start_time):
+        while time.time() - _start_time < timeout:
             try:
                 ssh.connect(self.host, username=self.username,
                             password=self.password,
                             look_for_keys=self.look_for_keys,
                             key_filename=self.key_filename,
-                            timeout=self.timeout, pkey=self.pkey)
+                            timeout=timeout, pkey=self.pkey)
                 _timeout = False
                 break
             except (socket.error,
@@ -76,6 +181,88 @@ class Client(object):
                                         password=self.password)
         return ssh
 
+    def _cached_connection(self):
+        with _lock:
+            entry = _connections.get(self._key)
+        if entry is None:
+            return None
+        pid, ssh = entry
+        transport = ssh.get_transport()
+        # NOTE: the connections of the parent don't work after a fork
+        if pid == os.getpid() and transport is not None and \
+                transport.is_active():
+            return ssh
+        with _lock:
+            if _connections.get(self._key) is entry:
+                del _connections[self._key]
+        return None
+
+    def _keep(self, ssh):
+        ssh.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+        with _lock:
+            previous = _connections.get(self._key)
+            _connections[self._key] = (os.getpid(), ssh)
+        if previous is not None and previous[0] == os.getpid() and \
+                previous[1] is not ssh:
+            previous[1].close()
+
+    def connection(self, timeout=None):
+        """Returns the kept connection to the host, opening it if needed."""
+        ssh = self._cached_connection()
+        if ssh is not None:
+            return ssh
+        with _lock:
+            connect_lock = _connect_locks.setdefault(self._key,
+                                                     threading.Lock())
+        with connect_lock:
+            # NOTE: another thread may have connected meanwhile
+            ssh = self._cached_connection()
+            if ssh is None:
+                ssh = self._get_ssh_connection(timeout=timeout)
+                self._keep(ssh)
+        return ssh
+
+    def open_session(self, timeout=None):
+        """
+        Returns a new channel on the kept connection, reconnecting once if
+        the connection turns out to be broken, e.g. its host stopped
+        answering. ``timeout`` bounds the connection and the opening of the
+        channel together, the client timeout by default.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+
+        def remaining():
+            return max(deadline - time.time(), 0)
+
+        ssh = self.connection(timeout)
+        try:
+            return ssh.get_transport().open_session(timeout=remaining())
+        except (paramiko.SSHException, socket.error, EOFError):
+            self._discard(ssh)
+            if not remaining():
+                raise
+        ssh = self.connection(remaining())
+        try:
+            return ssh.get_transport().open_session(timeout=remaining())
+        except (paramiko.SSHException, socket.error, EOFError):
+            self._discard(ssh)
+            raise
+
+    def _discard(self, ssh):
+        with _lock:
+            entry = _connections.get(self._key)
+            if entry is not None and entry[1] is ssh:
+                del _connections[self._key]
+        ssh.close()
+
+    def close(self):
+        """Closes the kept connection to the host."""
+        with _lock:
+            entry = _connections.pop(self._key, None)
+        if entry is not None and entry[0] == os.getpid():
+            entry[1].close()
+
     def _is_timed_out(self, start_time):
         return (time.time() - self.timeout) > start_time
 
@@ -98,56 +285,168 @@ class Client(object):
         Execute the specified command on the server.
 
         Note that this method is reading whole command outputs to memory, thus
-        shouldn't be used for large outputs.
+        shouldn't be used for large outputs, see iter_command().
 
         :returns: data read from standard output of the command.
         :raises: SSHExecCommandFailed if command returns nonzero
                  status. The exception contains command status stderr content.
         """
-        ssh = self._get_ssh_connection()
-        transport = ssh.get_transport()
-        channel = transport.open_session()
+        channel = self.open_session()
+        exit_status, out, err = self._run_channel(channel, cmd, time.time(),
+                                                  self.timeout)
+        if 0 != exit_status:
+            raise exceptions.SSHExecCommandFailed(
+                command=cmd, exit_status=exit_status, strerror=err)
+        return out
+
+    def run(self, cmd, timeout=None):
+        """
+        Runs a command on the server and returns its CommandResult, without
+        raising if it fails. ``timeout`` bounds the connection and the
+        command together, the client timeout by default.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start_time = time.time()
+        try:
+            channel = self.open_session(timeout)
+            exit_status, out, err = self._run_channel(channel, cmd,
+                                                      start_time, timeout)
+        except Exception as exc:
+            return CommandResult(self.host, duration=time.time() - start_time,
+                                 error=str(exc) or exc.__class__.__name__)
+        return CommandResult(self.host, exit_status, out, err,
+                             time.time() - start_time)
+
+    def _iter_channel(self, channel, cmd, start_time, timeout, idle=False):
+        """
+        Runs a command in the channel and yields (stderr, chunk) pairs of
+        its output as it comes. The reads grow while they fill the buffer.
+        With ``idle`` the timeout bounds the time without any output
+        instead of the whole command. The channel is closed if the
+        iteration fails or is stopped.
+        """
         channel.fileno()  # Register event pipe
         channel.exec_command(cmd)
         channel.shutdown_write()
-        out_data = []
-        err_data = []
         poll = select.poll()
         poll.register(channel, select.POLLIN)
-        start_time = time.time()
-
-        while True:
-            ready = poll.poll(self.channel_timeout)
-            if not any(ready):
-                if not self._is_timed_out(start_time):
+        sizes = [self.buf_size, self.buf_size]
+        try:
+            while True:
+                ready = poll.poll(self.channel_timeout)
+                if not any(ready):
+                    if time.time() - start_time < timeout:
+                        continue
+                    raise exceptions.TimeoutException(
+                        "Command: '{0}' executed on host '{1}'.".format(
+                            cmd, self.host))
+                if not ready[0]:        # If there is nothing to read.
                     continue
-                raise exceptions.TimeoutException(
-                    "Command: '{0}' executed on host '{1}'.".format(
-                        cmd, self.host))
-            if not ready[0]:        # If there is nothing to read.
-                continue
-            out_chunk = err_chunk = None
-            if channel.recv_ready():
-                out_chunk = channel.recv(self.buf_size)
-                out_data += out_chunk,
-            if channel.recv_stderr_ready():
-                err_chunk = channel.recv_stderr(self.buf_size)
-                err_data += err_chunk,
-            if channel.closed and not err_chunk and not out_chunk:
-                break
+                out_chunk = err_chunk = None
+                if channel.recv_ready():
+                    out_chunk = channel.recv(sizes[0])
+                    sizes[0] = _next_buf_size(sizes[0], len(out_chunk))
+                    yield False, out_chunk
+                if channel.recv_stderr_ready():
+                    err_chunk = channel.recv_stderr(sizes[1])
+                    sizes[1] = _next_buf_size(sizes[1], len(err_chunk))
+                    yield True, err_chunk
+                if channel.closed and not err_chunk and not out_chunk:
+                    break
+                if idle:
+                    start_time = time.time()
+        except BaseException:
+            # NOTE: includes GeneratorExit, when the caller stops early
+            channel.close()
+            raise
+
+    def _run_channel(self, channel, cmd, start_time, timeout):
+        out_data = []
+        err_data = []
+        for stderr, chunk in self._iter_channel(channel, cmd, start_time,
+                                                timeout):
+            (err_data if stderr else out_data).append(chunk)
         exit_status = channel.recv_exit_status()
+        channel.close()
+        return exit_status, ''.join(out_data), ''.join(err_data)
+
+    def iter_command(self, cmd, timeout=None, until=None, lines=True,
+                     stderr_sink=None):
+        """
+        Runs a command on the server and yields its standard output as it
+        comes, so commands with large outputs never have to fit in memory.
+
+        :param timeout: the longest time without any output, the client
+                        timeout by default.
+        :param until: a regular expression; the command is stopped after
+                      the first output line matching it, which is yielded.
+        :param lines: yields the output lines without their line end if
+                      true, the output chunks as read otherwise, in which
+                      case ``until`` is ignored.
+        :param stderr_sink: a callable or a file-like object given the
+                            standard error output as it comes.
+        :raises: SSHExecCommandFailed if command returns nonzero status,
+                 with the end of its standard error output.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if isinstance(until, basestring):
+            until = re.compile(until)
+        write_err = getattr(stderr_sink, 'write', stderr_sink)
+        err_tail = ''
+        pending = ''
+        channel = self.open_session()
+        chunks = self._iter_channel(channel, cmd, time.time(), timeout,
+                                    idle=True)
+        try:
+            for stderr, chunk in chunks:
+                if stderr:
+                    if write_err is not None:
+                        write_err(chunk)
+                    err_tail = (err_tail + chunk)[-STDERR_TAIL:]
+                elif not lines:
+                    yield chunk
+                else:
+                    output = (pending + chunk).split('\n')
+                    pending = output.pop()
+                    for line in output:
+                        yield line
+                        if until is not None and until.search(line):
+                            return
+            if pending:
+                yield pending
+        finally:
+            chunks.close()
+        exit_status = channel.recv_exit_status()
+        channel.close()
         if 0 != exit_status:
             raise exceptions.SSHExecCommandFailed(
-                command=cmd, exit_status=exit_status,
-                strerror=''.join(err_data))
-        return ''.join(out_data)
+                command=cmd, exit_status=exit_status, strerror=err_tail)
+
+    def stream_command(self, cmd, sink, timeout=None, until=None):
+        """
+        Runs a command on the server and passes its standard output to a
+        callable or a file-like object as it comes, see iter_command().
+        With ``until`` the output is passed line by line. Returns the size
+        of the output passed.
+        """
+        write = getattr(sink, 'write', sink)
+        size = 0
+        for data in self.iter_command(cmd, timeout, until,
+                                      lines=until is not None):
+            if until is not None:
+                data += '\n'
+            write(data)
+            size += len(data)
+        return size
 
     def test_connection_auth(self):
-        """Returns true if ssh can connect to server."""
+        """
+        Returns true if ssh can connect to server. The new connection is
+        kept for the next commands.
+        """
         try:
             connection = self._get_ssh_connection()
-            connection.close()
         except paramiko.AuthenticationException:
             return False
-
+        self._keep(connection)
         return True
@@ -0,0 +1,161 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import calendar
+import hashlib
+import json
+import os
+import threading
+import time
+
+from tempest.common.utils.misc import singleton
+from tempest import config
+from tempest.openstack.common import lockutils
+from tempest.openstack.common import log as logging
+from tempest.openstack.common import timeutils
+
+LOG = logging.getLogger(__name__)
+
+# refresh the cached tokens this many seconds before they expire
+REFRESH_MARGIN = 300
+
+
+def cache_key(auth_version, user, password, auth_url, tenant_name):
+    """Returns the cache key of a credential set.
+
+    The password is part of the key, so a wrong password never hits a token
+    obtained with the right one, and the key reveals none of the parts.
+    """
+    parts = (auth_version, user, password, auth_url, tenant_name)
+    return hashlib.sha1('\0'.join(str(p) for p in parts)).hexdigest()
+
+
+def parse_expiry(timestr):
+    """Converts an ISO 8601 token expiry to seconds since the epoch."""
+    if not timestr:
+        return None
+    expires = timeutils.normalize_time(timeutils.parse_isotime(timestr))
+    return calendar.timegm(expires.utctimetuple())
+
+
+@singleton
+class TokenCache(object):
+    """Process wide cache of tokens and service catalogs.
+
+    Entries are dicts with the 'token', 'expires' (seconds since the epoch
+    or None) and 'catalog' keys. When identity.token_cache_file is set the
+    entries are also stored in that file under an inter-process lock, so
+    parallel test workers share them as well.
+    """
+
+    def __init__(self):
+        self.cache_file = config.TempestConfig().identity.token_cache_file
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._file_stat = None
+
+    @staticmethod
+    def _is_valid(entry):
+        if not entry:
+            return False
+        expires = entry.get('expires')
+        return expires is None or expires - REFRESH_MARGIN > time.time()
+
+    def _key_lock(self, key):
+        # NOTE: the global lock only guards the lock table, the clients of
+        # different credentials authenticate in parallel
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _file_lock(self):
+        lock_path = os.path.dirname(os.path.abspath(self.cache_file))
+        return lockutils.lock('token-cache', 'tempest-', external=True,
+                              lock_path=lock_path)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.cache_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as cache_file:
+                return json.load(cache_file)
+        except (IOError, ValueError):
+            return {}
+
+    def _reload(self):
+        """Reads the cache file in the memory entries if it changed."""
+        stat = self._stat()
+        if stat is None or stat != self._file_stat:
+            with self._file_lock():
+                self._file_stat = self._stat()
+                self._entries = self._load()
+
+    def _save(self, entries):
+        tmp_file = '%s.%d' % (self.cache_file, os.getpid())
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump(entries, cache_file)
+        os.rename(tmp_file, self.cache_file)
+
+    def _store(self, key, entry):
+        with self._file_lock():
+            entries = self._load()
+            entries[key] = entry
+            self._save(entries)
+            self._file_stat = self._stat()
+            self._entries = entries
+
+    def get(self, key, auth_func, *args):
+        """Returns the entry of key, calling auth_func(*args) if needed."""
+        with self._key_lock(key):
+            if self.cache_file:
+                # NOTE: another process may have replaced or dropped it
+                self._reload()
+            entry = self._entries.get(key)
+            if self._is_valid(entry):
+                return entry
+            entry = auth_func(*args)
+            if self.cache_file:
+                self._store(key, entry)
+            else:
+                self._entries[key] = entry
+            return entry
+
+    def invalidate(self, key, token=None):
+        """Drops the entry of key.
+
+        If token is given the entry is only dropped while it still holds
+        that token, so a token refreshed meanwhile is kept.
+        """
+        def _matches(entry):
+            return entry and (token is None or entry['token'] == token)
+
+        with self._key_lock(key):
+            if not self.cache_file:
+                if _matches(self._entries.get(key)):
+                    del self._entries[key]
+                return
+            with self._file_lock():
+                entries = self._load()
+                if _matches(entries.get(key)):
+                    LOG.debug("Dropping cached token of %s" % key)
+                    del entries[key]
+                    self._save(entries)
+                self._file_stat = self._stat()
+                self._entries = entries
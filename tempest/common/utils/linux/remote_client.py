@@ -19,8 +19,82 @@ from tempest.common.ssh import Client
 from tempest.common import utils
 from tempest.config import TempestConfig
 from tempest.exceptions import ServerUnreachable
+from tempest.exceptions import SSHExecCommandFailed
 from tempest.exceptions import SSHTimeout
 
+BOOT_TIME_CMD = ('date -d "`cut -f1 -d. /proc/uptime` seconds ago" '
+                 '"+%Y-%m-%d %H:%M:%S"')
+
+
+def _parse_ram_size(output):
+    if output:
+        return int(output.split()[1])
+
+
+def _parse_partitions(output):
+    # NOTE: the lines after the "major minor  #blocks  name" header
+    return [line.split()[3] for line in output.splitlines()[1:]
+            if len(line.split()) == 4]
+
+
+def _parse_boot_time(output):
+    return time.strptime(output.replace('\n', ''),
+                         utils.LAST_REBOOT_TIME_FORMAT)
+
+
+# name of the fact: (command printing it, parser of its output)
+FACTS = {
+    'hostname': ('hostname', lambda output: output.rstrip()),
+    'ram_mb': ('free -m | grep Mem', _parse_ram_size),
+    'vcpus': ('cat /proc/cpuinfo | grep processor | wc -l', int),
+    'partitions': ('cat /proc/partitions', _parse_partitions),
+    'uptime': ("cut -f1 -d' ' /proc/uptime", float),
+    'boot_time': (BOOT_TIME_CMD, _parse_boot_time),
+}
+
+FACT_MARKER = '==> tempest-guest-fact'
+
+# facts of the guests by server id, or address when the server is unknown
+_facts = {}
+
+
+def invalidate_facts(server, names=None):
+    """
+    Forgets the cached facts of a server, given as a dict or by id, or of
+    an address, e.g. after it was rebooted, rebuilt or resized. Forgets all
+    of them if no names are given.
+    """
+    key = server if isinstance(server, basestring) else server['id']
+    facts = _facts.get(key)
+    if facts is None:
+        return
+    if names is None:
+        del _facts[key]
+        return
+    for name in names:
+        facts.raw.pop(name, None)
+        setattr(facts, name, None)
+
+
+class GuestFacts(object):
+    """
+    Facts of a guest gathered by RemoteClient.get_facts(): ``hostname``,
+    ``ram_mb``, ``vcpus``, ``partitions`` (the partition names),
+    ``uptime`` (in seconds) and ``boot_time`` (a time.struct_time). The
+    facts never gathered are None, ``raw`` holds the command output of
+    the gathered ones.
+    """
+
+    def __init__(self):
+        self.raw = {}
+        for name in FACTS:
+            setattr(self, name, None)
+
+    def __repr__(self):
+        return '<GuestFacts %s>' % ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in sorted(FACTS)
+            if name in self.raw)
+
 
 class RemoteClient():
 
@@ -40,6 +114,8 @@ class RemoteClient():
                     break
             else:
                 raise ServerUnreachable()
+        self.facts_key = ip_address if isinstance(server, basestring) else \
+            server['id']
 
         self.ssh_client = Client(ip_address, username, password, ssh_timeout,
                                  pkey=pkey,
@@ -47,13 +123,69 @@ class RemoteClient():
         if not self.ssh_client.test_connection_auth():
             raise SSHTimeout()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.ssh_client.close()
+
     def can_authenticate(self):
         # Re-authenticate
         return self.ssh_client.test_connection_auth()
 
+    def _gather_facts(self, names):
+        """Runs the commands of the facts in a single remote script."""
+        # NOTE: the end marker goes on its own line, whatever the output
+        script = ''.join("echo '%s %s'; %s; status=$?; echo; "
+                         "echo \"%s $status\"\n" %
+                         (FACT_MARKER, name, FACTS[name][0], FACT_MARKER)
+                         for name in names)
+        outputs = {}
+        name = None
+        for line in self.ssh_client.exec_command(script).splitlines(True):
+            if not line.startswith(FACT_MARKER + ' '):
+                if name is not None:
+                    outputs[name].append(line)
+                continue
+            value = line[len(FACT_MARKER) + 1:].strip()
+            if name is None:
+                name = value
+                outputs[name] = []
+                continue
+            if value != '0':
+                raise SSHExecCommandFailed(command=FACTS[name][0],
+                                           exit_status=int(value),
+                                           strerror='')
+            outputs[name] = ''.join(outputs[name])[:-1]
+            name = None
+        return outputs
+
+    def get_facts(self, names=None, refresh=False):
+        """
+        Returns the GuestFacts of the server with the named facts, all of
+        them by default. The facts are cached per server and only the
+        facts not cached yet, or all of them with ``refresh``, are
+        gathered, in one ssh command. See invalidate_facts().
+        """
+        names = sorted(FACTS) if names is None else names
+        facts = _facts.setdefault(self.facts_key, GuestFacts())
+        missing = [name for name in names
+                   if refresh or name not in facts.raw]
+        if missing:
+            for name, output in self._gather_facts(missing).iteritems():
+                facts.raw[name] = output
+                setattr(facts, name, FACTS[name][1](output))
+        return facts
+
+    def invalidate_facts(self, names=None):
+        invalidate_facts(self.facts_key, names)
+
     def hostname_equals_servername(self, expected_hostname):
         # Get host name using command "hostname"
-        actual_hostname = self.ssh_client.exec_command("hostname").rstrip()
+        actual_hostname = self.get_facts(['hostname'], refresh=True).hostname
         return expected_hostname == actual_hostname
 
     def get_files(self, path):
@@ -61,28 +193,23 @@ class RemoteClient():
         command = "ls -m " + path
         return self.ssh_client.exec_command(command).rstrip('\n').split(', ')
 
+    # NOTE: the getters below always gather their fact again, since the
+    # tests poll them while the guest changes
+
     def get_ram_size_in_mb(self):
-        output = self.ssh_client.exec_command('free -m | grep Mem')
-        if output:
-            return output.split()[1]
+        ram_mb = self.get_facts(['ram_mb'], refresh=True).ram_mb
+        if ram_mb is not None:
+            return str(ram_mb)
 
     def get_number_of_vcpus(self):
-        command = 'cat /proc/cpuinfo | grep processor | wc -l'
-        output = self.ssh_client.exec_command(command)
-        return int(output)
+        return self.get_facts(['vcpus'], refresh=True).vcpus
 
     def get_partitions(self):
         # Return the contents of /proc/partitions
-        command = 'cat /proc/partitions'
-        output = self.ssh_client.exec_command(command)
-        return output
+        return self.get_facts(['partitions'], refresh=True).raw['partitions']
 
     def get_boot_time(self):
-        cmd = 'date -d "`cut -f1 -d. /proc/uptime` seconds ago" \
-            "+%Y-%m-%d %H:%M:%S"'
-        boot_time_string = self.ssh_client.exec_command(cmd)
-        boot_time_string = boot_time_string.replace('\n', '')
-        return time.strptime(boot_time_string, utils.LAST_REBOOT_TIME_FORMAT)
+        return self.get_facts(['boot_time'], refresh=True).boot_time
 
     def write_to_console(self, message):
         message = re.sub("([$\\`])", "\\\\\\\\\\1", message)
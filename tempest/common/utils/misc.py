@@ -15,6 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import Queue
+import sys
+import threading
+
 
 def singleton(cls):
     """Simple wrapper for classes that should only have a single instance."""
@@ -25,3 +29,49 @@ def singleton(cls):
             instances[cls] = cls()
         return instances[cls]
     return getinstance
+
+
+def parallel_map(func, items, workers, backlog=None):
+    """
+    Calls func on every item from at most ``workers`` threads and returns
+    the results in the order of the items. The first exception raised by
+    func is re-raised once every item is processed. With ``backlog`` the
+    items are pulled from the iterable lazily and at most that many of
+    them wait in the queue, so a generator of large items is never held
+    in memory as a whole.
+    """
+    if backlog is None:
+        items = list(items)
+        workers = min(workers, len(items))
+    results = {}
+    errors = []
+    queue = Queue.Queue(backlog or 0)
+
+    def worker():
+        while True:
+            entry = queue.get()
+            if entry is None:
+                return
+            index, item = entry
+            try:
+                results[index] = func(item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=worker) for _ in xrange(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    count = 0
+    try:
+        for item in items:
+            queue.put((count, item))
+            count += 1
+    finally:
+        for thread in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    return [results[index] for index in xrange(count)]
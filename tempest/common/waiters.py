@@ -13,6 +13,8 @@
 #    under the License.
 
 
+import random
+import threading
 import time
 
 from tempest import config
@@ -80,3 +82,264 @@ def wait_for_server_status(client, server_id, status, ready_wait=True):
             raise exceptions.TimeoutException(message)
         old_status = server_status
         old_task_state = task_state
+
+
+# NOTE: target status of the resources which have to disappear
+DELETED = 'DELETED'
+
+
+class WaitFuture(object):
+    """The pending result of a resource registered to a BatchWaiter."""
+
+    def __init__(self, lister, resource_id, status, deadline):
+        self.lister = lister
+        self.resource_id = resource_id
+        self.status = status
+        self.deadline = deadline
+        self.start_time = time.time()
+        self.elapsed = None
+        self._event = threading.Event()
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def set_result(self, result):
+        self._result = result
+        self.elapsed = time.time() - self.start_time
+        self._event.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self.elapsed = time.time() - self.start_time
+        self._event.set()
+
+    def exception(self, timeout=None):
+        self._event.wait(timeout)
+        if not self._event.is_set():
+            raise exceptions.TimeoutException(
+                "%s %s is still pending" % (self.lister.kind,
+                                            self.resource_id))
+        return self._exception
+
+    def result(self, timeout=None):
+        """
+        Returns the last seen body of the resource (None once deleted) or
+        raises the error which ended the wait.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
+
+
+class ResourceLister(object):
+    """
+    The detailed list call of a service, polled by BatchWaiter.
+
+    Subclasses implement list_resources and get_resource for a client. The
+    get_resource call is only used to confirm that a resource missing from
+    a full list page is really gone.
+    """
+
+    kind = 'resource'
+    error_statuses = ()
+    page_limit = 1000
+
+    def __init__(self, client, params=None):
+        self.client = client
+        self.params = params
+
+    def list_resources(self):
+        raise NotImplementedError()
+
+    def get_resource(self, resource_id):
+        raise NotImplementedError()
+
+    def error(self, resource_id, status):
+        return exceptions.TempestException(
+            "%s %s went to %s status" % (self.kind, resource_id, status))
+
+    def is_ready(self, resource):
+        return True
+
+    def list(self):
+        return dict((r['id'], r) for r in self.list_resources())
+
+    def is_gone(self, resource_id, listed):
+        if len(listed) < self.page_limit:
+            return True
+        try:
+            self.get_resource(resource_id)
+        except exceptions.NotFound:
+            return True
+        return False
+
+
+class ServerLister(ResourceLister):
+
+    kind = 'server'
+    error_statuses = ('ERROR',)
+
+    def list_resources(self):
+        resp, body = self.client.list_servers_with_detail(self.params)
+        return body['servers']
+
+    def get_resource(self, server_id):
+        return self.client.get_server(server_id)
+
+    def error(self, server_id, status):
+        return exceptions.BuildErrorException(server_id=server_id)
+
+    def is_ready(self, server):
+        # NOTE(afazekas): Converted to string bacuse of the XML responses
+        return str(server.get('OS-EXT-STS:task_state', None)) == "None"
+
+
+class VolumeLister(ResourceLister):
+
+    kind = 'volume'
+    error_statuses = ('error',)
+
+    def list_resources(self):
+        resp, volumes = self.client.list_volumes_with_detail(self.params)
+        return volumes
+
+    def get_resource(self, volume_id):
+        return self.client.get_volume(volume_id)
+
+    def error(self, volume_id, status):
+        return exceptions.VolumeBuildErrorException(volume_id=volume_id)
+
+
+class SnapshotLister(ResourceLister):
+
+    kind = 'snapshot'
+    error_statuses = ('error',)
+
+    def list_resources(self):
+        resp, snapshots = self.client.list_snapshots_with_detail(
+            self.params)
+        return snapshots
+
+    def get_resource(self, snapshot_id):
+        return self.client.get_snapshot(snapshot_id)
+
+    def error(self, snapshot_id, status):
+        return exceptions.SnapshotBuildErrorException(snapshot_id=snapshot_id)
+
+
+class ImageLister(ResourceLister):
+    """Lister of the compute images API."""
+
+    kind = 'image'
+    error_statuses = ('ERROR',)
+
+    def list_resources(self):
+        resp, images = self.client.list_images_with_detail(self.params)
+        return images
+
+    def get_resource(self, image_id):
+        return self.client.get_image(image_id)
+
+    def error(self, image_id, status):
+        return exceptions.ImageErrorException(image_id=image_id,
+                                              status=status)
+
+
+class BatchWaiter(object):
+    """
+    Waits for many resources to reach their status at once.
+
+    Every poll makes a single list call per registered lister for all of
+    its pending resources, instead of one show call per resource. The poll
+    interval starts at ``interval`` and grows by ``backoff`` up to
+    ``max_interval`` with a random ``jitter`` ratio, so parallel waiters
+    do not poll in lockstep. A resource still pending ``timeout`` seconds
+    after it was added fails with TimeoutException.
+    """
+
+    def __init__(self, interval=None, timeout=None, max_interval=None,
+                 backoff=1.5, jitter=0.2):
+        self.interval = interval or CONFIG.compute.build_interval
+        self.timeout = timeout or CONFIG.compute.build_timeout
+        self.max_interval = max_interval or self.interval * 10
+        self.backoff = backoff
+        self.jitter = jitter
+        self.futures = []
+        self._lock = threading.Lock()
+
+    def add(self, lister, resource_id, status):
+        """Registers a resource and returns its WaitFuture."""
+        future = WaitFuture(lister, resource_id, status,
+                            time.time() + self.timeout)
+        with self._lock:
+            self.futures.append(future)
+        return future
+
+    def pending(self):
+        with self._lock:
+            return [f for f in self.futures if not f.done()]
+
+    def _check(self, future, listed):
+        lister = future.lister
+        resource = listed.get(future.resource_id)
+        if resource is None and not lister.is_gone(future.resource_id,
+                                                   listed):
+            return
+        if resource is None or resource.get('status') == DELETED:
+            if future.status == DELETED:
+                future.set_result(None)
+            else:
+                future.set_exception(exceptions.NotFound(
+                    "%s %s is gone" % (lister.kind, future.resource_id)))
+            return
+        status = resource.get('status')
+        if status == future.status and lister.is_ready(resource):
+            future.set_result(resource)
+        elif status in lister.error_statuses:
+            future.set_exception(lister.error(future.resource_id, status))
+
+    def poll(self):
+        """Makes one list call per lister and resolves the futures."""
+        by_lister = {}
+        for future in self.pending():
+            by_lister.setdefault(future.lister, []).append(future)
+        now = time.time()
+        for lister, futures in by_lister.iteritems():
+            try:
+                listed = lister.list()
+            except Exception as exc:
+                LOG.warning("Listing %ss failed: %s", lister.kind, exc)
+                listed = None
+            for future in futures:
+                if listed is not None:
+                    self._check(future, listed)
+                if not future.done() and now >= future.deadline:
+                    future.set_exception(exceptions.TimeoutException(
+                        '%s %s failed to reach %s status within the '
+                        'required time (%s s).' %
+                        (lister.kind, future.resource_id, future.status,
+                         self.timeout)))
+        return self.pending()
+
+    def wait(self):
+        """
+        Polls until every registered resource is resolved and returns the
+        futures. Errors are only raised by the futures themselves.
+        """
+        interval = self.interval
+        while self.poll():
+            delay = interval * random.uniform(1 - self.jitter,
+                                              1 + self.jitter)
+            time.sleep(delay)
+            interval = min(interval * self.backoff, self.max_interval)
+        return self.futures
+
+    def start(self):
+        """Runs wait() in a background thread."""
+        thread = threading.Thread(target=self.wait)
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -45,6 +45,16 @@ IdentityGroup = [
     cfg.StrOpt('region',
                default='RegionOne',
                help="The identity region name to use."),
+    cfg.BoolOpt('token_cache',
+                default=True,
+                help="Share the tokens and service catalogs between all the "
+                     "REST clients authenticating with the same "
+                     "credentials."),
+    cfg.StrOpt('token_cache_file',
+               default=None,
+               help="File used to share the cached tokens between parallel "
+                    "test processes. The tokens are only cached in memory "
+                    "if not set."),
     cfg.StrOpt('username',
                default='demo',
                help="Username to use for Nova API requests."),
@@ -91,6 +101,32 @@ def register_identity_opts(conf):
         conf.register_opt(opt, group='identity')
 
 
+http_group = cfg.OptGroup(name='http',
+                          title="HTTP Client Options")
+
+HttpGroup = [
+    cfg.BoolOpt('keep_alive',
+                default=True,
+                help="Reuse persistent connections for the REST clients "
+                     "instead of closing the connection after each "
+                     "request."),
+    cfg.IntOpt('pool_size',
+               default=10,
+               help="Maximum number of idle connections kept per "
+                    "endpoint."),
+    cfg.IntOpt('pool_idle_timeout',
+               default=60,
+               help="Time in seconds after which an idle pooled connection "
+                    "is closed instead of being reused."),
+]
+
+
+def register_http_opts(conf):
+    conf.register_group(http_group)
+    for opt in HttpGroup:
+        conf.register_opt(opt, group='http')
+
+
 compute_group = cfg.OptGroup(name='compute',
                              title='Compute Service Options')
 
@@ -109,6 +145,13 @@ ComputeGroup = [
                      "instead of failing because of the conflict. Note that "
                      "this would result in the tenant being deleted at the "
                      "end of a subsequent successful run."),
+    cfg.StrOpt('isolated_creds_pool_file',
+               default=None,
+               help="If allow_tenant_isolation is True, lease the isolated "
+                    "tenants and users from the pool of pre-provisioned "
+                    "credentials stored in this file instead of creating "
+                    "and deleting them for every test class. See "
+                    "tools/isolated_creds_pool.py."),
     cfg.StrOpt('image_ref',
                default="{$IMAGE_ID}",
                help="Valid secondary image reference to be used in tests."),
@@ -513,7 +556,38 @@ StressGroup = [
                help='time (in seconds) between log file error checks.'),
     cfg.StrOpt('default_thread_number_per_action',
                default=4,
-               help='The number of threads created while stress test.')
+               help='The number of threads created while stress test.'),
+    cfg.IntOpt('metrics_interval',
+               default=10,
+               help='Time (in seconds) between the latency and throughput '
+                    'reports of the stress test workers.'),
+    cfg.StrOpt('agent_authkey',
+               default=None,
+               secret=True,
+               help='Shared secret authenticating the coordinator and the '
+                    'agents of distributed stress runs.'),
+    cfg.StrOpt('resource_journal',
+               default=None,
+               help='File journaling the resources created by the stress '
+                    'tests, so that the cleanup only deletes those, even '
+                    'after a crashed run. Without it the cleanup deletes '
+                    'the servers, volumes, keypairs etc. of all tenants.'),
+    cfg.StrOpt('results_store',
+               default=None,
+               help='SQLite database storing the metrics of every stress '
+                    'run, to compare runs with "run_stress.py compare".'),
+    cfg.IntOpt('node_sample_interval',
+               default=10,
+               help='Time (in seconds) between the resource samplings of '
+                    'the controller and compute nodes, 0 to disable them. '
+                    'Needs the target_* options.'),
+    cfg.ListOpt('sampled_services',
+                default=['nova-api', 'nova-compute', 'nova-conductor',
+                         'nova-scheduler', 'neutron-server', 'cinder-api',
+                         'cinder-volume', 'glance-api', 'keystone',
+                         'mysqld', 'rabbitmq', 'qemu'],
+                help='Services whose processes resident memory is sampled '
+                     'on the nodes, matched in their command lines.')
 ]
 
 
@@ -630,6 +704,7 @@ class TempestConfig:
 
         register_compute_opts(cfg.CONF)
         register_identity_opts(cfg.CONF)
+        register_http_opts(cfg.CONF)
         register_image_opts(cfg.CONF)
         register_network_opts(cfg.CONF)
         register_volume_opts(cfg.CONF)
@@ -643,6 +718,7 @@ class TempestConfig:
         register_service_available_opts(cfg.CONF)
         self.compute = cfg.CONF.compute
         self.identity = cfg.CONF.identity
+        self.http = cfg.CONF.http
         self.images = cfg.CONF.image
         self.network = cfg.CONF.network
         self.volume = cfg.CONF.volume
@@ -81,6 +81,10 @@ class AddImageException(TempestException):
     message = "Image %(image_id)s failed to become ACTIVE in the allotted time"
 
 
+class ImageErrorException(TempestException):
+    message = "Image %(image_id)s went to %(status)s status"
+
+
 class EC2RegisterImageException(TempestException):
     message = ("Image %(image_id)s failed to become 'available' "
                "in the allotted time")
@@ -133,6 +137,10 @@ class ImageFault(TempestException):
     message = "Got image fault"
 
 
+class ObjectChecksumMismatch(TempestException):
+    message = "Checksum mismatch of object %(name)s"
+
+
 class IdentityError(TempestException):
     message = "Got identity error"
 
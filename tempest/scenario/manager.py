@@ -18,7 +18,6 @@
 
 import logging
 import os
-import subprocess
 
 # Default client libs
 import cinderclient.client
@@ -33,6 +32,7 @@ from novaclient import exceptions as nova_exceptions
 
 from tempest.api.network import common as net_common
 from tempest.common import isolated_creds
+from tempest.common import prober
 from tempest.common import ssh
 from tempest.common.utils.data_utils import rand_name
 from tempest.common.utils.linux.remote_client import RemoteClient
@@ -589,18 +589,16 @@ class NetworkScenarioTest(OfficialClientTest):
         return floating_ip
 
     def _ping_ip_address(self, ip_address):
-        cmd = ['ping', '-c1', '-w1', ip_address]
+        target = (ip_address, prober.ICMP)
+        reached = prober.probe([target], self.config.compute.ping_timeout)
+        return reached[target] is not None
 
-        def ping():
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE)
-            proc.wait()
-            if proc.returncode == 0:
-                return True
-
-        return tempest.test.call_until_true(
-            ping, self.config.compute.ping_timeout, 1)
+    def _unreachable(self, ip_addresses, port, timeout):
+        """Returns the addresses which didn't answer on port in time."""
+        reached = prober.probe([(ip_address, port)
+                                for ip_address in ip_addresses], timeout)
+        return [ip_address for ip_address in ip_addresses
+                if reached[(ip_address, port)] is None]
 
     def _is_reachable_via_ssh(self, ip_address, username, private_key,
                               timeout):
@@ -610,16 +608,29 @@ class NetworkScenarioTest(OfficialClientTest):
         return ssh_client.test_connection_auth()
 
     def _check_vm_connectivity(self, ip_address, username, private_key):
-        self.assertTrue(self._ping_ip_address(ip_address),
-                        "Timed out waiting for %s to become "
-                        "reachable" % ip_address)
-        self.assertTrue(self._is_reachable_via_ssh(
-            ip_address,
-            username,
-            private_key,
-            timeout=self.config.compute.ssh_timeout),
-            'Auth failure in connecting to %s@%s via ssh' %
-            (username, ip_address))
+        self._check_vms_connectivity([ip_address], username, private_key)
+
+    def _check_vms_connectivity(self, ip_addresses, username, private_key):
+        """
+        Checks that the addresses answer pings and ssh logins. The pings
+        and the ssh ports of all the addresses are probed at once.
+        """
+        unreachable = self._unreachable(ip_addresses, prober.ICMP,
+                                        self.config.compute.ping_timeout)
+        self.assertFalse(unreachable, "Timed out waiting for %s to become "
+                         "reachable" % ', '.join(unreachable))
+        unreachable = self._unreachable(ip_addresses, 22,
+                                        self.config.compute.ssh_timeout)
+        self.assertFalse(unreachable, "Timed out waiting for the ssh port "
+                         "of %s" % ', '.join(unreachable))
+        for ip_address in ip_addresses:
+            self.assertTrue(self._is_reachable_via_ssh(
+                ip_address,
+                username,
+                private_key,
+                timeout=self.config.compute.ssh_timeout),
+                'Auth failure in connecting to %s@%s via ssh' %
+                (username, ip_address))
 
 
 class OrchestrationScenarioTest(OfficialClientTest):
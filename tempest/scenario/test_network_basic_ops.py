@@ -228,11 +228,10 @@ class TestNetworkBasicOps(manager.NetworkScenarioTest):
         # key-based authentication by cloud-init.
         ssh_login = self.config.compute.image_ssh_user
         private_key = self.keypairs[self.tenant_id].private_key
-        for server in self.servers:
-            for net_name, ip_addresses in server.networks.iteritems():
-                for ip_address in ip_addresses:
-                    self._check_vm_connectivity(ip_address, ssh_login,
-                                                private_key)
+        ip_addresses = [ip_address for server in self.servers
+                        for ip_addresses in server.networks.itervalues()
+                        for ip_address in ip_addresses]
+        self._check_vms_connectivity(ip_addresses, ssh_login, private_key)
 
     def _assign_floating_ips(self):
         public_network_id = self.config.network.public_network_id
@@ -246,10 +245,10 @@ class TestNetworkBasicOps(manager.NetworkScenarioTest):
         # key-based authentication by cloud-init.
         ssh_login = self.config.compute.image_ssh_user
         private_key = self.keypairs[self.tenant_id].private_key
-        for server, floating_ips in self.floating_ips.iteritems():
-            for floating_ip in floating_ips:
-                ip_address = floating_ip.floating_ip_address
-                self._check_vm_connectivity(ip_address, ssh_login, private_key)
+        ip_addresses = [floating_ip.floating_ip_address
+                        for floating_ips in self.floating_ips.itervalues()
+                        for floating_ip in floating_ips]
+        self._check_vms_connectivity(ip_addresses, ssh_login, private_key)
 
     @attr(type='smoke')
     @services('compute', 'network')
@@ -183,6 +183,7 @@ class IdentityClientJSON(RestClient):
     def delete_token(self, token_id):
         """Delete a token."""
         resp, body = self.delete("tokens/%s" % token_id)
+        self.token_revoked(token_id)
         return resp, body
 
     def list_users_for_tenant(self, tenant_id):
@@ -232,6 +232,7 @@ class IdentityV3ClientJSON(RestClient):
         """Deletes token."""
         headers = {'X-Subject-Token': resp_token}
         resp, body = self.delete("auth/tokens", headers=headers)
+        self.token_revoked(resp_token)
         return resp, body
 
     def create_group(self, name, **kwargs):
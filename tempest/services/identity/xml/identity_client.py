@@ -200,6 +200,7 @@ class IdentityClientXML(RestClientXML):
     def delete_token(self, token_id):
         """Delete a token."""
         resp, body = self.delete("tokens/%s" % token_id, self.headers)
+        self.token_revoked(token_id)
         return resp, body
 
     def list_users_for_tenant(self, tenant_id):
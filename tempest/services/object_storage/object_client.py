@@ -17,10 +17,14 @@
 
 import hashlib
 import hmac
+import json
+import threading
+import urllib
 import urlparse
 
 from tempest.common import http
 from tempest.common.rest_client import RestClient
+from tempest.common.utils.misc import parallel_map
 from tempest import exceptions
 
 
@@ -70,11 +74,15 @@ class ObjectClient(RestClient):
         resp, body = self.head(url)
         return resp, body
 
-    def get_object(self, container, object_name):
-        """Retrieve object's data."""
+    def get_object(self, container, object_name, stream=False):
+        """Retrieve object's data.
+
+        With stream=True the data is returned as a file-like, iterable
+        body instead of a string.
+        """
 
         url = "{0}/{1}".format(container, object_name)
-        resp, body = self.get(url)
+        resp, body = self.request('GET', url, stream=stream)
         return resp, body
 
     def copy_object_in_same_container(self, container, src_object_name,
@@ -148,6 +156,159 @@ class ObjectClient(RestClient):
         resp, body = self.put(url, data, self.headers)
         return resp, body
 
+    @staticmethod
+    def _iter_segments(data, segment_size):
+        if isinstance(data, basestring):
+            for offset in xrange(0, len(data), segment_size):
+                yield data[offset:offset + segment_size]
+            return
+        buf, length = [], 0
+        for chunk in http.iter_body(data, segment_size):
+            buf.append(chunk)
+            length += len(chunk)
+            while length >= segment_size:
+                joined = ''.join(buf)
+                yield joined[:segment_size]
+                buf, length = [joined[segment_size:]], length - segment_size
+        if length:
+            yield ''.join(buf)
+
+    def create_large_object(self, container, object_name, data, segment_size,
+                            segment_container=None, concurrency=4,
+                            static=False):
+        """Uploads data as segments and writes a large object manifest.
+
+        data is a string, a file-like object or an iterable of strings. It
+        is cut into segment_size byte segments, which are uploaded with
+        their md5 as ETag by ``concurrency`` threads, so only a few segments
+        are held in memory at once. The segments are stored in
+        segment_container (container by default) as <object_name>/<index>.
+        A dynamic large object manifest is written, or a static one if
+        static is True. Returns the manifest PUT response and the list of
+        the segments as {'path', 'etag', 'size_bytes'} dicts.
+        """
+        segment_container = segment_container or container
+
+        def _upload(item):
+            index, segment = item
+            etag = hashlib.md5(segment).hexdigest()
+            name = '%s/%08d' % (object_name, index)
+            headers = dict(self.headers, Etag=etag)
+            self.put('%s/%s' % (segment_container, name), segment, headers)
+            return {'path': '/%s/%s' % (segment_container, name),
+                    'etag': etag, 'size_bytes': len(segment)}
+
+        segments = parallel_map(
+            _upload, enumerate(self._iter_segments(data, segment_size)),
+            concurrency, backlog=concurrency)
+        url = '%s/%s' % (container, object_name)
+        if static:
+            resp, _ = self.put(url + '?multipart-manifest=put',
+                               json.dumps(segments), self.headers)
+        else:
+            headers = {'X-Object-Manifest': '%s/%s/' % (segment_container,
+                                                        object_name),
+                       'content-length': '0'}
+            resp, _ = self.put(url, None, headers)
+        return resp, segments
+
+    def _list_segments(self, container, object_name, resp):
+        """Returns the segment listing of a manifest object, or None."""
+        manifest = resp.get('x-object-manifest')
+        if manifest:
+            segment_container, prefix = manifest.split('/', 1)
+            segments, marker = [], ''
+            while True:
+                url = '%s?format=json&prefix=%s&marker=%s' % (
+                    segment_container, urllib.quote(prefix),
+                    urllib.quote(marker))
+                _, body = self.get(url)
+                page = json.loads(body) if body else []
+                if not page:
+                    return segments
+                segments.extend(page)
+                marker = page[-1]['name'].encode('utf-8')
+        if resp.get('x-static-large-object', '').lower() == 'true':
+            _, body = self.get('%s/%s?multipart-manifest=get' %
+                               (container, object_name))
+            return json.loads(body)
+        return None
+
+    def get_large_object(self, container, object_name, fileobj,
+                         range_size, concurrency=4):
+        """Downloads an object with parallel ranged GETs into fileobj.
+
+        Large objects are fetched segment by segment, and every segment is
+        checked against the md5 in the segment listing. Other objects are
+        fetched in range_size byte ranges and checked against their ETag.
+        The data is written to fileobj in order. Raises
+        ObjectChecksumMismatch on a mismatch and returns the number of
+        bytes written.
+        """
+        url = '%s/%s' % (container, object_name)
+        resp, _ = self.head(url)
+        etag = resp.get('etag', '').strip('"')
+        segments = self._list_segments(container, object_name, resp)
+        ranges = []
+        offset = 0
+        if segments is not None:
+            hashes = [segment['hash'] for segment in segments]
+            if hashlib.md5(''.join(hashes)).hexdigest() != etag:
+                raise exceptions.ObjectChecksumMismatch(
+                    "segment listing does not match ETag %s" % etag,
+                    name=url)
+            for segment in segments:
+                ranges.append((offset, segment['bytes'], segment['hash']))
+                offset += segment['bytes']
+            checksum = None
+        else:
+            length = int(resp['content-length'])
+            for offset in xrange(0, length, range_size):
+                ranges.append((offset, min(range_size, length - offset),
+                               None))
+            checksum = hashlib.md5()
+        cond = threading.Condition()
+        state = {'next': 0, 'failed': False}
+
+        def _fetch(item):
+            index, (offset, length, md5) = item
+            try:
+                if length:
+                    headers = {'Range': 'bytes=%d-%d' %
+                               (offset, offset + length - 1)}
+                    _, data = self.get(url, headers)
+                else:
+                    data = ''
+                if len(data) != length or (
+                        md5 and hashlib.md5(data).hexdigest() != md5):
+                    raise exceptions.ObjectChecksumMismatch(
+                        "bytes %d-%d" % (offset, offset + length - 1),
+                        name=url)
+            except Exception:
+                with cond:
+                    state['failed'] = True
+                    cond.notify_all()
+                raise
+            with cond:
+                # NOTE: ranges are dispatched in order, so the lower ones
+                # are already being fetched by other threads
+                while state['next'] != index and not state['failed']:
+                    cond.wait()
+                if state['failed']:
+                    return
+                fileobj.write(data)
+                if checksum is not None:
+                    checksum.update(data)
+                state['next'] += 1
+                cond.notify_all()
+
+        parallel_map(_fetch, enumerate(ranges), concurrency)
+        if checksum is not None and checksum.hexdigest() != etag:
+            raise exceptions.ObjectChecksumMismatch(
+                "expected ETag %s, got %s" % (etag, checksum.hexdigest()),
+                name=url)
+        return sum(length for _, length, _ in ranges)
+
 
 class ObjectClientCustomizedHeader(RestClient):
 
@@ -44,7 +44,7 @@ class SnapshotsClientJSON(RestClient):
         body = json.loads(body)
         return resp, body['snapshots']
 
-    def list_snapshot_with_detail(self, params=None):
+    def list_snapshots_with_detail(self, params=None):
         """List the details of all snapshots."""
         url = 'snapshots/detail'
         if params:
@@ -54,6 +54,9 @@ class SnapshotsClientJSON(RestClient):
         body = json.loads(body)
         return resp, body['snapshots']
 
+    # NOTE: the former name, which the XML client never had
+    list_snapshot_with_detail = list_snapshots_with_detail
+
     def get_snapshot(self, snapshot_id):
         """Returns the details of a single snapshot."""
         url = "snapshots/%s" % str(snapshot_id)
@@ -12,55 +12,50 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-import socket
-import subprocess
+import json
+import threading
 
+from tempest.common import prober
 from tempest.common.utils.data_utils import rand_name
+from tempest.stress import server_pool
 import tempest.stress.stressaction as stressaction
 import tempest.test
 
+# server pools shared by the users of a process, see FloatingStress
+_pools = {}
+_pools_lock = threading.Lock()
+
 
 class FloatingStress(stressaction.StressAction):
+    """
+    Associates a floating IP to a server, checks that the server answers
+    on it and disassociates it again on every run.
 
-    # from the scenario manager
-    def ping_ip_address(self, ip_address):
-        cmd = ['ping', '-c1', '-w1', ip_address]
-
-        proc = subprocess.Popen(cmd,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-        proc.wait()
-        success = proc.returncode == 0
-        self.logger.info("%s(%s): %s", self.server_id, self.floating['ip'],
-                         "pong!" if success else "no pong :(")
-        return success
-
-    def tcp_connect_scan(self, addr, port):
-        # like tcp
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            s.connect((addr, port))
-        except socket.error as exc:
-            self.logger.info("%s(%s): %s", self.server_id, self.floating['ip'],
-                             str(exc))
-            return False
-        self.logger.info("%s(%s): Connected :)", self.server_id,
-                         self.floating['ip'])
-        s.close()
-        return True
+    With ``"server_pool": {"size": 4, "max_uses": 20}`` in ``kwargs`` the
+    servers are leased from a pool of pre-booted servers instead, see
+    tempest.stress.server_pool, which rebuilds a server after ``max_uses``
+    runs and replaces the servers of failed runs. So the runs stress the
+    floating IP association rather than the boot of the servers. The users
+    of a worker process with the same manager and arguments share one pool
+    and its security group, which the last of them deletes.
+    """
+
+    def _probe(self, port):
+        target = (self.floating['ip'], port)
+        reached = prober.probe([target], self.check_timeout,
+                               interval=self.check_interval)[target]
+        if reached is not None:
+            self.logger.info("%s(%s): %s answered after %.2f s",
+                             self.server_id, self.floating['ip'], port,
+                             reached)
+        return reached is not None
 
     def check_port_ssh(self):
-        def func():
-            return self.tcp_connect_scan(self.floating['ip'], 22)
-        if not tempest.test.call_until_true(func, self.check_timeout,
-                                            self.check_interval):
+        if not self._probe(22):
             raise RuntimeError("Cannot connect to the ssh port.")
 
     def check_icmp_echo(self):
-        def func():
-            return self.ping_ip_address(self.floating['ip'])
-        if not tempest.test.call_until_true(func, self.check_timeout,
-                                            self.check_interval):
+        if not self._probe(prober.ICMP):
             raise RuntimeError("Cannot ping the machine.")
 
     def _create_vm(self):
@@ -127,10 +122,21 @@ class FloatingStress(stressaction.StressAction):
         self.check_interval = kwargs.get('check_interval', 1)
         self.wait_for_disassociate = kwargs.get('wait_for_disassociate',
                                                 True)
+        self.server_pool = None
+        self.pool_args = kwargs.get('server_pool')
+        if self.pool_args is not None:
+            if self.new_vm or self.new_sec_grp:
+                self.logger.warning("new_vm and new_sec_group are ignored "
+                                    "with a server pool")
+            self.new_vm = self.new_sec_grp = False
 
         # allocate floating
         if not self.new_floating:
             self._create_floating_ip()
+        # NOTE: the pool and its security group are set up by the first
+        # run of the process, see _acquire_pool
+        if self.pool_args is not None:
+            return
         # add security group
         if not self.new_sec_grp:
             self._create_sec_group()
@@ -138,6 +144,41 @@ class FloatingStress(stressaction.StressAction):
         if not self.new_vm:
             self._create_vm()
 
+    def _pool_key(self):
+        return (id(self.manager), json.dumps(
+            [self.image, self.flavor, self.pool_args, self.vm_extra_args],
+            sort_keys=True))
+
+    def _acquire_pool(self):
+        """Returns the server pool of the process, creating it if needed."""
+        with _pools_lock:
+            shared = _pools.get(self._pool_key())
+            if shared is None:
+                self._create_sec_group()
+                vm_args = self.vm_extra_args.copy()
+                vm_args['security_groups'] = [{'name': self.sec_grp}]
+                pool = server_pool.ServerPool(
+                    self.manager, self.image, self.flavor,
+                    size=self.pool_args.get('size', 2),
+                    max_uses=self.pool_args.get('max_uses'),
+                    create_kwargs=vm_args)
+                shared = {'pool': pool, 'sec_grp': self.sec_grp, 'users': 0}
+                _pools[self._pool_key()] = shared
+            shared['users'] += 1
+            self.sec_grp = shared['sec_grp']
+            return shared['pool']
+
+    def _release_pool(self):
+        """Closes the pool and its security group after its last user."""
+        with _pools_lock:
+            shared = _pools[self._pool_key()]
+            shared['users'] -= 1
+            if shared['users']:
+                return
+            del _pools[self._pool_key()]
+        shared['pool'].close()
+        self._destroy_sec_grp()
+
     def wait_disassociate(self):
         cli = self.manager.floating_ips_client
 
@@ -161,7 +202,28 @@ class FloatingStress(stressaction.StressAction):
         if self.wait_for_disassociate:
             self.wait_disassociate()
 
+    def run_pooled(self):
+        if self.server_pool is None:
+            self.server_pool = self._acquire_pool()
+        server = self.server_pool.lease()
+        self.server_id = server['id']
+        healthy = False
+        try:
+            if self.reboot:
+                self.manager.servers_client.reboot(self.server_id, 'HARD')
+            self.run_core()
+            if self.reboot:
+                # NOTE: the next lease expects an ACTIVE server
+                self.manager.servers_client.wait_for_server_status(
+                    self.server_id, 'ACTIVE')
+            healthy = True
+        finally:
+            self.server_pool.release(server, healthy)
+
     def run(self):
+        if self.pool_args is not None:
+            self.run_pooled()
+            return
         if self.new_sec_grp:
             self._create_sec_group()
         if self.new_floating:
@@ -181,6 +243,13 @@ class FloatingStress(stressaction.StressAction):
             self._destroy_sec_grp()
 
     def tearDown(self):
+        if self.pool_args is not None:
+            if self.server_pool is not None:
+                self._release_pool()
+                self.server_pool = None
+            if not self.new_floating:
+                self._destroy_floating_ip()
+            return
         if not self.new_vm:
             self._destroy_vm()
         if not self.new_floating:
@@ -12,10 +12,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
 from tempest.openstack.common import importutils
 from tempest.openstack.common import log as logging
 import tempest.stress.stressaction as stressaction
 
+# classes set up by the fast re-run path of the process, see UnitTest
+_warm_classes = set()
+_warm_lock = threading.Lock()
+
 
 class SetUpClassRunTime(object):
 
@@ -41,6 +47,12 @@ class UnitTest(stressaction.StressAction):
            ``process``: once in the worker process lifetime
            ``action``: on each action
        Not all combination working in every case.
+
+       With ``"fast_rerun": true`` in ``kwargs`` the class is set up once
+       per worker process, whatever ``class_setup_per`` is, and shared by
+       all its threads, so its clients and tokens stay warm. Every run
+       then only calls setUp, the test method and tearDown of a new test
+       case and runs its cleanups, without building a TestResult.
     """
 
     def setUp(self, **kwargs):
@@ -52,8 +64,13 @@ class UnitTest(stressaction.StressAction):
         self.class_setup_per = kwargs.get('class_setup_per',
                                           SetUpClassRunTime.process)
         SetUpClassRunTime.validate(self.class_setup_per)
+        self.fast_rerun = kwargs.get('fast_rerun', False)
 
-        if self.class_setup_per == SetUpClassRunTime.application:
+        if self.fast_rerun:
+            if self.class_setup_per == SetUpClassRunTime.action:
+                self.logger.warning("fast_rerun sets the class up once per "
+                                    "process, not on each action")
+        elif self.class_setup_per == SetUpClassRunTime.application:
             self.klass.setUpClass()
         self.setupclass_called = False
 
@@ -65,11 +82,43 @@ class UnitTest(stressaction.StressAction):
 
     def run_core(self):
         res = self.klass(self.test_method).run()
-        if res.errors:
-            raise RuntimeError(res.errors)
+        if res.errors or res.failures:
+            raise RuntimeError(res.errors + res.failures)
+
+    def _warm_up(self):
+        with _warm_lock:
+            if self.klass not in _warm_classes:
+                self.klass.setUpClass()
+                _warm_classes.add(self.klass)
+
+    def run_fast(self):
+        """Runs the test method on a new test case of the warm class."""
+        self._warm_up()
+        test = self.klass(self.test_method)
+        try:
+            test.setUp()
+            try:
+                getattr(test, self.test_method)()
+            finally:
+                test.tearDown()
+        except test.skipException as exc:
+            self.logger.debug("Skipped: %s" % exc)
+        finally:
+            # NOTE: the fixtures of the test are among its cleanups
+            errors = []
+            while test._cleanups:
+                function, args, kwargs = test._cleanups.pop()
+                try:
+                    function(*args, **kwargs)
+                except Exception as exc:
+                    errors.append(exc)
+            if errors:
+                raise errors[0]
 
     def run(self):
-        if self.class_setup_per != SetUpClassRunTime.application:
+        if self.fast_rerun:
+            self.run_fast()
+        elif self.class_setup_per != SetUpClassRunTime.application:
             if (self.class_setup_per == SetUpClassRunTime.action
                 or self.setupclass_called is False):
                 self.klass.setUpClass()
@@ -83,5 +132,10 @@ class UnitTest(stressaction.StressAction):
             self.run_core()
 
     def tearDown(self):
-        if self.class_setup_per != SetUpClassRunTime.action:
+        if self.fast_rerun:
+            with _warm_lock:
+                if self.klass in _warm_classes:
+                    _warm_classes.remove(self.klass)
+                    self.klass.tearDownClass()
+        elif self.class_setup_per != SetUpClassRunTime.action:
             self.klass.tearDownClass()
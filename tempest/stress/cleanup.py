@@ -17,88 +17,171 @@
 #    limitations under the License.
 
 from tempest import clients
+from tempest.common import cleanup_executor
+from tempest.common import resource_journal
+from tempest.common import waiters
+from tempest import exceptions
 from tempest.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# clients and delete calls of the resource kinds deleted by the admin
+ADMIN_KINDS = (
+    ('server', 'servers_client', 'delete_server', 'compute'),
+    ('snapshot', 'snapshots_client', 'delete_snapshot', 'volume'),
+    ('volume', 'volumes_client', 'delete_volume', 'volume'),
+    ('user', 'identity_client', 'delete_user', 'identity'),
+    ('tenant', 'identity_client', 'delete_tenant', 'identity'),
+)
+
+# clients and delete calls of the resource kinds deleted by their owner
+OWNER_KINDS = (
+    ('keypair', 'keypairs_client', 'delete_keypair'),
+    ('floating_ip', 'floating_ips_client', 'delete_floating_ip'),
+    ('security_group', 'security_groups_client', 'delete_security_group'),
+)
+
+
+def _ignore_missing(delete_func):
+    def delete(resource_id):
+        try:
+            delete_func(resource_id)
+        except exceptions.NotFound:
+            pass
+    return delete
+
+
+def cleanup_journal(path, admin_manager=None):
+    """
+    Deletes the resources recorded in a resource journal and not deleted
+    yet, e.g. by a crashed run, and removes them from the journal.
+    """
+    if admin_manager is None:
+        admin_manager = clients.AdminManager()
+    journal = resource_journal.ResourceJournal(path)
+    pending = journal.pending()
+    LOG.info("Cleanup::remove %d journaled resources" % len(pending))
+    executor = cleanup_executor.CleanupExecutor()
+    all_tenants = {"all_tenants": True}
+    listers = {
+        'server': waiters.ServerLister(admin_manager.servers_client,
+                                       all_tenants),
+        'snapshot': waiters.SnapshotLister(admin_manager.snapshots_client,
+                                           all_tenants),
+        'volume': waiters.VolumeLister(admin_manager.volumes_client,
+                                       all_tenants)}
+    for kind, client, method, service in ADMIN_KINDS:
+        executor.add_kind(
+            kind, _ignore_missing(getattr(getattr(admin_manager, client),
+                                          method)),
+            service, lister=listers.get(kind),
+            ready_status='available' if kind in ('snapshot', 'volume')
+            else None)
+
+    owners = {}
+
+    def _owner_delete(client, method):
+        def delete(resource):
+            owner, resource_id = resource
+            manager = owners[owner]
+            _ignore_missing(getattr(getattr(manager, client),
+                                    method))(resource_id)
+        return delete
+
+    for kind, client, method in OWNER_KINDS:
+        executor.add_kind(kind, _owner_delete(client, method), 'compute')
+
+    for record in pending:
+        if record['kind'] not in executor.kinds:
+            continue
+        if record['kind'] in resource_journal.OWNER_KINDS:
+            owner = (record['user'], record['tenant'])
+            if owner not in owners:
+                owners[owner] = clients.Manager(
+                    username=record['user'], password=record['password'],
+                    tenant_name=record['tenant'])
+            executor.add(record['kind'], (owner, record['id']))
+        else:
+            executor.add(record['kind'], record['id'])
+
+    stats = executor.run()
+    for kind in executor.kinds.values():
+        for resource_id in kind.deleted_ids:
+            if kind.name in resource_journal.OWNER_KINDS:
+                resource_id = resource_id[1]
+            journal.deleted(kind.name, resource_id)
+    journal.compact()
+    return stats
+
 
 def cleanup():
     admin_manager = clients.AdminManager()
-
-    _, body = admin_manager.servers_client.list_servers({"all_tenants": True})
+    journal_path = admin_manager.config.stress.resource_journal
+    if journal_path:
+        return cleanup_journal(journal_path, admin_manager)
+    executor = cleanup_executor.CleanupExecutor()
+    all_tenants = {"all_tenants": True}
+
+    servers_client = admin_manager.servers_client
+    executor.add_kind('server', servers_client.delete_server, 'compute',
+                      lister=waiters.ServerLister(servers_client,
+                                                  all_tenants))
+    _, body = servers_client.list_servers(all_tenants)
     LOG.info("Cleanup::remove %s servers" % len(body['servers']))
     for s in body['servers']:
-        try:
-            admin_manager.servers_client.delete_server(s['id'])
-        except Exception:
-            pass
-
-    for s in body['servers']:
-        try:
-            admin_manager.servers_client.wait_for_server_termination(s['id'])
-        except Exception:
-            pass
+        executor.add('server', s['id'])
 
+    executor.add_kind('keypair', admin_manager.keypairs_client.delete_keypair,
+                      'compute')
     _, keypairs = admin_manager.keypairs_client.list_keypairs()
     LOG.info("Cleanup::remove %s keypairs" % len(keypairs))
     for k in keypairs:
-        try:
-            admin_manager.keypairs_client.delete_keypair(k['name'])
-        except Exception:
-            pass
+        executor.add('keypair', k['keypair']['name'])
 
+    executor.add_kind('floating_ip',
+                      admin_manager.floating_ips_client.delete_floating_ip,
+                      'compute')
     _, floating_ips = admin_manager.floating_ips_client.list_floating_ips()
     LOG.info("Cleanup::remove %s floating ips" % len(floating_ips))
     for f in floating_ips:
-        try:
-            admin_manager.floating_ips_client.delete_floating_ip(f['id'])
-        except Exception:
-            pass
+        executor.add('floating_ip', f['id'])
 
+    executor.add_kind('user', admin_manager.identity_client.delete_user,
+                      'identity')
     _, users = admin_manager.identity_client.get_users()
     LOG.info("Cleanup::remove %s users" % len(users))
     for user in users:
         if user['name'].startswith("stress_user"):
-            admin_manager.identity_client.delete_user(user['id'])
+            executor.add('user', user['id'])
 
+    executor.add_kind('tenant', admin_manager.identity_client.delete_tenant,
+                      'identity')
     _, tenants = admin_manager.identity_client.list_tenants()
     LOG.info("Cleanup::remove %s tenants" % len(tenants))
     for tenant in tenants:
         if tenant['name'].startswith("stress_tenant"):
-            admin_manager.identity_client.delete_tenant(tenant['id'])
+            executor.add('tenant', tenant['id'])
 
     # We have to delete snapshots first or
     # volume deletion may block
-
-    _, snaps = admin_manager.snapshots_client.\
-        list_snapshots({"all_tenants": True})
+    snapshots_client = admin_manager.snapshots_client
+    executor.add_kind('snapshot', snapshots_client.delete_snapshot, 'volume',
+                      lister=waiters.SnapshotLister(snapshots_client,
+                                                    all_tenants),
+                      ready_status='available')
+    _, snaps = snapshots_client.list_snapshots(all_tenants)
     LOG.info("Cleanup::remove %s snapshots" % len(snaps))
     for v in snaps:
-        try:
-            admin_manager.snapshots_client.\
-                wait_for_snapshot_status(v['id'], 'available')
-            admin_manager.snapshots_client.delete_snapshot(v['id'])
-        except Exception:
-            pass
-
-    for v in snaps:
-        try:
-            admin_manager.snapshots_client.wait_for_resource_deletion(v['id'])
-        except Exception:
-            pass
-
-    _, vols = admin_manager.volumes_client.list_volumes({"all_tenants": True})
+        executor.add('snapshot', v['id'])
+
+    volumes_client = admin_manager.volumes_client
+    executor.add_kind('volume', volumes_client.delete_volume, 'volume',
+                      lister=waiters.VolumeLister(volumes_client,
+                                                  all_tenants),
+                      ready_status='available')
+    _, vols = volumes_client.list_volumes(all_tenants)
     LOG.info("Cleanup::remove %s volumes" % len(vols))
     for v in vols:
-        try:
-            admin_manager.volumes_client.\
-                wait_for_volume_status(v['id'], 'available')
-            admin_manager.volumes_client.delete_volume(v['id'])
-        except Exception:
-            pass
+        executor.add('volume', v['id'])
 
-    for v in vols:
-        try:
-            admin_manager.volumes_client.wait_for_resource_deletion(v['id'])
-        except Exception:
-            pass
+    return executor.run()
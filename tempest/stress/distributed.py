@@ -0,0 +1,257 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Distributed stress runs
+
+A coordinator splits the actions of a descriptor across several agents,
+each of them running the stress driver on its own host (or as another
+local process), and merges the metrics they stream back into one report.
+Coordinator and agents talk through multiprocessing connections
+authenticated with the stress.agent_authkey option.
+"""
+
+import copy
+import multiprocessing
+from multiprocessing import connection
+import Queue
+import threading
+import time
+
+from tempest import config
+from tempest import exceptions
+from tempest.openstack.common import log as logging
+from tempest.stress import metrics
+from tempest.stress import profiles
+from tempest.stress import results
+
+LOG = logging.getLogger(__name__)
+
+# thread counts of the load profiles, scaled to the share of every agent
+PROFILE_THREAD_KEYS = ('from', 'to', 'step', 'base', 'peak')
+
+_stop_lock = threading.Lock()
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def _get_authkey():
+    authkey = config.TempestConfig().stress.agent_authkey
+    if not authkey:
+        raise exceptions.InvalidConfiguration(
+            "stress.agent_authkey has to be set for distributed runs")
+    return authkey
+
+
+def _share(value, agent, agents):
+    """Returns the share of an integer value of the given agent."""
+    return value // agents + (1 if agent < value % agents else 0)
+
+
+def split_tests(tests, agents, default_threads, rate=None):
+    """
+    Returns one list of actions per agent. The threads and load profile of
+    every action are spread over the agents, and an agent without any
+    thread of an action does not run it. The rate of an action, ``rate``
+    by default, is split among the agents running it.
+    """
+    shares = [[] for _ in xrange(agents)]
+    for test in tests:
+        threads = test.get('threads', default_threads)
+        test_shares = []
+        for agent in xrange(agents):
+            share = copy.deepcopy(test)
+            if rate:
+                share.setdefault('rate', rate)
+            if 'profile' in test:
+                profile = share['profile']
+                for key in PROFILE_THREAD_KEYS:
+                    if key in profile:
+                        profile[key] = _share(int(profile[key]), agent,
+                                              agents)
+                if profile.get('step') == 0:
+                    # NOTE: a step profile needs a step of at least one
+                    profile['step'] = 1
+                if not profiles.max_threads(profile):
+                    continue
+            else:
+                share['threads'] = _share(threads, agent, agents)
+                if not share['threads']:
+                    continue
+            test_shares.append((agent, share))
+        for agent, share in test_shares:
+            if 'rate' in share:
+                share['rate'] = float(share['rate']) / len(test_shares)
+            shares[agent].append(share)
+    return shares
+
+
+def serve_agent(address):
+    """
+    Runs stress jobs on behalf of coordinators, one at a time, until
+    interrupted.
+    """
+    from tempest.stress import driver
+    listener = connection.Listener(parse_address(address),
+                                   authkey=_get_authkey())
+    LOG.info("Stress agent listening on %s" % address)
+    while True:
+        try:
+            conn = listener.accept()
+        except (multiprocessing.AuthenticationError, EOFError,
+                IOError) as exc:
+            LOG.warning("Rejected a connection: %s" % exc)
+            continue
+        try:
+            command, job = conn.recv()
+            if command != 'start':
+                continue
+            LOG.info("Starting stress job of %s" % (listener.last_accepted,))
+            driver.stop_event.clear()
+            # NOTE: the reader outlives its job, so it must not stop the
+            # job started after it
+            finished = threading.Event()
+
+            def _wait_for_stop(conn=conn, finished=finished):
+                try:
+                    conn.recv()
+                except (EOFError, IOError):
+                    pass
+                with _stop_lock:
+                    if not finished.is_set():
+                        driver.stop_event.set()
+
+            stop_reader = threading.Thread(target=_wait_for_stop)
+            stop_reader.daemon = True
+            stop_reader.start()
+            try:
+                result = driver.stress_openstack(
+                    job['tests'], job['duration'], job['max_runs'],
+                    job['stop_on_error'], rate=job['rate'],
+                    arrival=job['arrival'],
+                    processes_per_action=job['processes'],
+                    metrics_sink=lambda report: conn.send(('metrics',
+                                                           report)),
+                    cleanup_resources=False)
+            except Exception:
+                LOG.exception("Stress job failed")
+                result = 1
+            with _stop_lock:
+                finished.set()
+            conn.send(('done', result))
+        except (EOFError, IOError):
+            LOG.warning("Lost the connection to the coordinator")
+        finally:
+            conn.close()
+
+
+def _read_agent(address, conn, messages):
+    try:
+        while True:
+            message = conn.recv()
+            messages.put((address,) + tuple(message))
+            if message[0] == 'done':
+                return
+    except (EOFError, IOError):
+        messages.put((address, 'done', 1))
+
+
+def coordinate(agents, tests, duration, max_runs=None, stop_on_error=False,
+               metrics_file=None, rate=None, arrival='poisson',
+               processes_per_action=None):
+    """
+    Runs a stress job split across the given agent addresses, logs the
+    merged metrics like the driver does and returns the worst result code
+    of the agents.
+    """
+    conf = config.TempestConfig()
+    authkey = _get_authkey()
+    default_threads = int(conf.stress.default_thread_number_per_action)
+    shares = split_tests(tests, len(agents), default_threads, rate)
+    messages = Queue.Queue()
+    connections = {}
+    for address, share in zip(agents, shares):
+        if not share:
+            continue
+        conn = connection.Client(parse_address(address), authkey=authkey)
+        conn.send(('start', {'tests': share, 'duration': duration,
+                             'max_runs': max_runs,
+                             'stop_on_error': stop_on_error,
+                             'rate': None, 'arrival': arrival,
+                             'processes': processes_per_action}))
+        connections[address] = conn
+        reader = threading.Thread(target=_read_agent,
+                                  args=(address, conn, messages))
+        reader.daemon = True
+        reader.start()
+        LOG.info("Started %d action(s) on agent %s" % (len(share), address))
+
+    aggregator = metrics.Aggregator()
+    interval = conf.stress.metrics_interval
+    next_window = time.time() + interval
+    agent_results = {}
+    try:
+        while len(agent_results) < len(connections):
+            try:
+                message = messages.get(timeout=max(next_window - time.time(),
+                                                   0.1))
+            except Queue.Empty:
+                message = None
+            if message is not None:
+                address, kind, payload = message
+                if kind == 'metrics':
+                    aggregator.add(payload)
+                elif kind == 'done':
+                    LOG.info("Agent %s finished (result %s)" %
+                             (address, payload))
+                    agent_results[address] = payload
+            if time.time() >= next_window:
+                aggregator.close_window()
+                next_window += interval
+    except KeyboardInterrupt:
+        LOG.warning("Interrupted, stopping the agents")
+        for conn in connections.values():
+            try:
+                conn.send(('stop', None))
+            except IOError:
+                pass
+        raise
+    finally:
+        for conn in connections.values():
+            conn.close()
+    aggregator.close_window()
+
+    report = aggregator.report()
+    LOG.info("Summary of %d agents:" % len(connections))
+    for key in sorted(report['totals']):
+        LOG.info(" %s: %s" % (key,
+                              metrics.format_summary(report['totals'][key])))
+    if metrics_file:
+        aggregator.export(metrics_file)
+        LOG.info("Metrics written to %s" % metrics_file)
+    result = max(agent_results.values()) if agent_results else 0
+    if conf.stress.results_store:
+        results.store_run(conf.stress.results_store, tests, report, result,
+                          {'duration': duration, 'max_runs': max_runs,
+                           'rate': rate, 'arrival': arrival,
+                           'processes': processes_per_action,
+                           'agents': agents})
+    if not result:
+        from tempest.stress import cleanup
+        LOG.info("cleaning up")
+        cleanup.cleanup()
+    return result
@@ -12,22 +12,138 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import heapq
 import multiprocessing
+import random
 import signal
+import threading
 import time
 
 from tempest import clients
+from tempest.common import resource_journal
 from tempest.common import ssh
 from tempest.common.utils.data_utils import rand_name
 from tempest import exceptions
 from tempest.openstack.common import importutils
 from tempest.openstack.common import log as logging
 from tempest.stress import cleanup
+from tempest.stress import logscan
+from tempest.stress import metrics
+from tempest.stress import profiles
+from tempest.stress import results
+from tempest.stress import sampler
+from tempest.stress import sessions
+from tempest.stress import stressaction
 
 admin_manager = clients.AdminManager()
 
 LOG = logging.getLogger(__name__)
 processes = []
+metrics_queue = multiprocessing.Queue()
+aggregator = metrics.Aggregator()
+# set to end the running stress job early
+stop_event = threading.Event()
+journal = None
+
+
+class SharedStatistic(object):
+    """
+    Run and failure counters of a worker, stored in shared memory
+
+    The counters of all the workers live in a single lock-free array with
+    one slot per worker and counter. A worker only ever writes its own
+    slots, so the driver reads them without any proxy round trip.
+    """
+
+    FIELDS = ('runs', 'fails')
+
+    def __init__(self, counters, worker):
+        self.counters = counters
+        self.offset = worker * len(self.FIELDS)
+        # NOTE: serializes the virtual users of the worker
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create_counters(cls, workers):
+        return multiprocessing.Array('l', workers * len(cls.FIELDS),
+                                     lock=False)
+
+    def __getitem__(self, key):
+        return self.counters[self.offset + self.FIELDS.index(key)]
+
+    def __setitem__(self, key, value):
+        self.counters[self.offset + self.FIELDS.index(key)] = value
+
+    def increment(self, key):
+        with self.lock:
+            self[key] += 1
+
+
+class ArrivalScheduler(threading.Thread):
+    """
+    Open-loop load generator
+
+    Puts the scheduled start time of every run of the open-loop actions in
+    their arrival queues at the target rate, with exponential (poisson) or
+    constant inter-arrival times, whether the workers keep up or not. So
+    the offered load does not drop when the cloud slows down, and the time
+    a run waits for a free worker shows up as its queueing delay. A stream
+    ends after ``limit`` runs or at end_time, and then one None per worker
+    is queued to let its workers exit.
+    """
+
+    ARRIVALS = ('poisson', 'constant')
+
+    def __init__(self, end_time=None):
+        super(ArrivalScheduler, self).__init__()
+        self.daemon = True
+        self.end_time = end_time
+        self.streams = []
+        self._stop = threading.Event()
+
+    def add(self, queue, rate, arrival='poisson', limit=None, workers=1):
+        if arrival not in self.ARRIVALS:
+            raise ValueError("Unknown arrival distribution %s" % arrival)
+        self.streams.append({'queue': queue, 'rate': float(rate),
+                             'arrival': arrival, 'limit': limit,
+                             'workers': workers, 'sent': 0})
+
+    @staticmethod
+    def _interval(stream):
+        if stream['arrival'] == 'poisson':
+            return random.expovariate(stream['rate'])
+        return 1.0 / stream['rate']
+
+    def _finish(self, stream):
+        for _ in xrange(stream['workers']):
+            stream['queue'].put(None)
+
+    def run(self):
+        now = time.time()
+        heap = [(now + self._interval(stream), index)
+                for index, stream in enumerate(self.streams)]
+        heapq.heapify(heap)
+        while heap:
+            due, index = heapq.heappop(heap)
+            stream = self.streams[index]
+            if self.end_time is not None and due >= self.end_time:
+                self._finish(stream)
+                continue
+            delay = due - time.time()
+            if delay > 0:
+                self._stop.wait(delay)
+            if self._stop.is_set():
+                break
+            stream['queue'].put(due)
+            stream['sent'] += 1
+            if stream['limit'] is not None and (stream['sent'] >=
+                                                stream['limit']):
+                self._finish(stream)
+            else:
+                heapq.heappush(heap, (due + self._interval(stream), index))
+
+    def stop(self):
+        self._stop.set()
 
 
 def do_ssh(command, host):
@@ -35,11 +151,12 @@ def do_ssh(command, host):
     key_filename = admin_manager.config.stress.target_private_key_path
     if not (username and key_filename):
         return None
-    ssh_client = ssh.Client(host, username, key_filename=key_filename)
-    try:
-        return ssh_client.exec_command(command)
-    except exceptions.SSHExecCommandFailed:
+    result = ssh.Client(host, username, key_filename=key_filename).run(command)
+    if not result.succeeded:
+        LOG.warning("%s failed on %s: %s" %
+                    (command, host, result.error or result.stderr))
         return None
+    return result.stdout
 
 
 def _get_compute_nodes(controller):
@@ -61,19 +178,20 @@ def _get_compute_nodes(controller):
     return nodes
 
 
-def _error_in_logs(logfiles, nodes):
+def _get_target_nodes():
     """
-    Detect errors in the nova log files on the controller and compute nodes.
+    Returns the controller and the compute nodes, and the sessions to them,
+    or None if the driver has no SSH access to them.
     """
-    grep = 'egrep "ERROR|TRACE" %s' % logfiles
-    for node in nodes:
-        errors = do_ssh(grep, node)
-        if not errors:
-            return None
-        if len(errors) > 0:
-            LOG.error('%s: %s' % (node, errors))
-            return errors
-    return None
+    stress_conf = admin_manager.config.stress
+    if not (stress_conf.target_controller and stress_conf.target_ssh_user and
+            stress_conf.target_private_key_path):
+        return None, None
+    controller = stress_conf.target_controller
+    nodes = [controller] + [node for node in _get_compute_nodes(controller)
+                            if node != controller]
+    return nodes, sessions.NodeSessions(stress_conf.target_ssh_user,
+                                        stress_conf.target_private_key_path)
 
 
 def sigchld_handler(signal, frame):
@@ -93,28 +211,149 @@ def terminate_all_processes():
                 process['process'].terminate()
             except Exception:
                 pass
+    for process in processes:
+        # NOTE: a worker only exits once its last metrics are read
+        while process['process'].is_alive():
+            aggregator.drain(metrics_queue)
+            process['process'].join(0.1)
         process['process'].join()
+    aggregator.drain(metrics_queue)
+
+
+def _thread_count(test, default):
+    """
+    Returns the number of threads of an action, the highest number of
+    active threads of its load profile if it has one.
+    """
+    if 'profile' in test:
+        return profiles.max_threads(test['profile'])
+    return test.get('threads', default)
+
+
+def _stage_label(tests, active_threads):
+    return ', '.join('%s=%d' % (tests[index]['action'].split('.')[-1],
+                                active_threads[index])
+                     for index in sorted(active_threads))
 
 
-def stress_openstack(tests, duration, max_runs=None, stop_on_error=False):
+def _process_count(test, threads, processes):
+    """
+    Returns the number of worker processes hosting the threads of an action,
+    one per thread unless "processes" (0 for one per CPU) is given.
+    """
+    count = test.get('processes', processes)
+    if count is None:
+        return threads
+    if count == 0:
+        count = multiprocessing.cpu_count()
+    return max(1, min(count, threads))
+
+
+def stress_openstack(tests, duration, max_runs=None, stop_on_error=False,
+                     metrics_file=None, rate=None, arrival='poisson',
+                     processes_per_action=None, metrics_sink=None,
+                     cleanup_resources=True):
     """
     Workload driver. Executes an action function against a nova-cluster.
+    The latency and throughput metrics are logged periodically and written
+    to metrics_file (JSON, or CSV if its name ends with .csv) if given.
+
+    Actions with a "rate" (runs per second, rate by default) are run open
+    loop: their runs arrive at that rate with "arrival" inter-arrival times
+    and are picked up by the next free process of the action.
+
+    The threads of an action are spread over "processes" worker processes
+    (processes_per_action by default), each running its share of them as
+    virtual users in threads.
+
+    Actions with a load "profile" (see tempest.stress.profiles) start the
+    highest number of threads of the profile, and the threads not active
+    at a time are parked. The metrics are also reported for every stage
+    of the profiles, i.e. every period with constant numbers of threads.
+
+    Every metrics report of the workers is passed to metrics_sink if given,
+    and the leftover resources are only cleaned up if cleanup_resources is
+    set, as done by the agents of a distributed run. The run is stored in
+    the stress.results_store if set.
+
+    With a stress.resource_journal, the resources created by the run are
+    journaled and the cleanup only deletes those, along with the ones left
+    by a crashed run, which are deleted before the run starts.
     """
+    global aggregator, journal
+    # NOTE: the agents of a distributed run run several jobs in a process
+    del processes[:]
+    aggregator = metrics.Aggregator(metrics_sink)
     logfiles = admin_manager.config.stress.target_logfiles
     log_check_interval = int(admin_manager.config.stress.log_check_interval)
+    metrics_interval = admin_manager.config.stress.metrics_interval
     default_thread_num = int(admin_manager.config.stress.
                              default_thread_number_per_action)
-    if logfiles:
-        controller = admin_manager.config.stress.target_controller
-        computes = _get_compute_nodes(controller)
-        for node in computes:
-            do_ssh("rm -f %s" % logfiles, node)
-    for test in tests:
+    if max_runs and any('profile' in test for test in tests):
+        raise exceptions.InvalidConfiguration(
+            "Load profiles are time based, they can't be combined with a "
+            "number of runs")
+    journal_path = admin_manager.config.stress.resource_journal
+    if journal_path:
+        if resource_journal.ResourceJournal(journal_path).pending():
+            LOG.warning("Deleting the resources left by a previous run")
+            cleanup.cleanup_journal(journal_path, admin_manager)
+        if journal is None:
+            journal = resource_journal.ResourceJournal(journal_path)
+            journal.install()
+    nodes, node_sessions = None, None
+    if logfiles or admin_manager.config.stress.node_sample_interval:
+        nodes, node_sessions = _get_target_nodes()
+    scanner = None
+    if logfiles and nodes:
+        # NOTE: only the errors logged from now on are reported
+        scanner = logscan.LogScanner(nodes, logfiles, node_sessions)
+        scanner.skip_existing()
+        scanner.set_context(', '.join(test['action'].split('.')[-1]
+                                      for test in tests))
+    node_sampler = None
+    if admin_manager.config.stress.node_sample_interval and nodes:
+        node_sampler = sampler.NodeSampler(
+            nodes, node_sessions,
+            admin_manager.config.stress.node_sample_interval,
+            admin_manager.config.stress.sampled_services)
+        node_sampler.start()
+    thread_counts = [_thread_count(test, default_thread_num)
+                     for test in tests]
+    process_counts = [_process_count(test, threads, processes_per_action)
+                      for test, threads in zip(tests, thread_counts)]
+    if (sum(process_counts) < sum(thread_counts) and
+            not admin_manager.config.http.keep_alive):
+        LOG.warning("Virtual users share their clients, which is only "
+                    "thread safe with http.keep_alive enabled")
+    counters = SharedStatistic.create_counters(sum(process_counts))
+    worker = 0
+    scheduler = ArrivalScheduler(time.time() + duration
+                                 if max_runs is None else None)
+    profile_changes = []
+    active_threads = {}
+    for index, test in enumerate(tests):
         if test.get('use_admin', False):
             manager = admin_manager
         else:
             manager = clients.Manager()
-        for p_number in xrange(test.get('threads', default_thread_num)):
+        threads = thread_counts[index]
+        process_count = process_counts[index]
+        active_users = None
+        if 'profile' in test:
+            active_users = multiprocessing.Value('i', 0, lock=False)
+            active_threads[index] = active_users
+            profile_changes.extend((offset, index, users) for offset, users
+                                   in profiles.changes(test['profile']))
+        arrivals = None
+        if test.get('rate', rate):
+            arrivals = multiprocessing.Queue()
+            scheduler.add(arrivals, test.get('rate', rate),
+                          test.get('arrival', arrival),
+                          max_runs * threads if max_runs else None,
+                          threads)
+        users = [[] for _ in xrange(process_count)]
+        for thread in xrange(threads):
             if test.get('use_isolated_tenants', False):
                 username = rand_name("stress_user")
                 tenant_name = rand_name("stress_tenant")
@@ -134,37 +373,65 @@ def stress_openstack(tests, duration, max_runs=None, stop_on_error=False):
 
             kwargs = test.get('kwargs', {})
             test_run.setUp(**dict(kwargs.iteritems()))
+            test_run.user_index = thread
+            test_run.active_users = active_users
 
             LOG.debug("calling Target Object %s" %
                       test_run.__class__.__name__)
+            users[thread % process_count].append(test_run)
 
-            mp_manager = multiprocessing.Manager()
-            shared_statistic = mp_manager.dict()
-            shared_statistic['runs'] = 0
-            shared_statistic['fails'] = 0
+        for p_number, process_users in enumerate(users):
+            shared_statistic = SharedStatistic(counters, worker)
+            worker += 1
 
-            p = multiprocessing.Process(target=test_run.execute,
-                                        args=(shared_statistic,))
+            if len(process_users) == 1:
+                p = multiprocessing.Process(target=process_users[0].execute,
+                                            args=(shared_statistic,
+                                                  metrics_queue,
+                                                  arrivals))
+            else:
+                p = multiprocessing.Process(
+                    target=stressaction.execute_virtual_users,
+                    args=(process_users, shared_statistic, metrics_queue,
+                          arrivals))
 
             process = {'process': p,
                        'p_number': p_number,
-                       'action': test_run.action,
+                       'action': process_users[0].action,
+                       'users': len(process_users),
                        'statistic': shared_statistic}
 
             processes.append(process)
             p.start()
+    if scheduler.streams:
+        scheduler.start()
     if stop_on_error:
         # NOTE(mkoderer): only the parent should register the handler
         signal.signal(signal.SIGCHLD, sigchld_handler)
-    end_time = time.time() + duration
+    start_time = time.time()
+    end_time = start_time + duration
+    next_log_check = start_time + log_check_interval
+    next_window = start_time + metrics_interval
+    profile_changes = sorted((start_time + offset, index, users)
+                             for offset, index, users in profile_changes)
+    stage_threads = {}
     had_errors = False
-    while True:
+    while not stop_event.is_set():
+        if profile_changes and profile_changes[0][0] <= time.time():
+            aggregator.drain(metrics_queue)
+            while profile_changes and profile_changes[0][0] <= time.time():
+                _, index, users = profile_changes.pop(0)
+                active_threads[index].value = users
+                stage_threads[index] = users
+            aggregator.start_stage(_stage_label(tests, stage_threads))
+            if scanner is not None:
+                scanner.set_context(_stage_label(tests, stage_threads))
         if max_runs is None:
             remaining = end_time - time.time()
             if remaining <= 0:
                 break
         else:
-            remaining = log_check_interval
+            remaining = metrics_interval
             all_proc_term = True
             for process in processes:
                 if process['process'].is_alive():
@@ -173,20 +440,41 @@ def stress_openstack(tests, duration, max_runs=None, stop_on_error=False):
             if all_proc_term:
                 break
 
-        time.sleep(min(remaining, log_check_interval))
+        sleep = min(remaining, next_window - time.time())
+        if profile_changes:
+            sleep = min(sleep, profile_changes[0][0] - time.time())
+        time.sleep(max(sleep, 0))
+        aggregator.drain(metrics_queue)
+        if node_sampler is not None:
+            aggregator.add_node_samples(node_sampler.drain())
+        if time.time() >= next_window:
+            aggregator.close_window()
+            next_window += metrics_interval
         if stop_on_error:
             for process in processes:
                 if process['statistic']['fails'] > 0:
                     break
 
-        if not logfiles:
+        if scanner is None or time.time() < next_log_check:
             continue
-        errors = _error_in_logs(logfiles, computes)
+        next_log_check = time.time() + log_check_interval
+        errors = scanner.scan()
         if errors:
+            aggregator.add_log_errors(errors)
             had_errors = True
             break
 
+    scheduler.stop()
+    if node_sampler is not None:
+        node_sampler.stop()
+        aggregator.add_node_samples(node_sampler.drain())
+    if node_sessions is not None:
+        node_sessions.close()
     terminate_all_processes()
+    if stop_on_error:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    aggregator.close_window()
+    aggregator.start_stage(None)
 
     sum_fails = 0
     sum_runs = 0
@@ -197,16 +485,33 @@ def stress_openstack(tests, duration, max_runs=None, stop_on_error=False):
             had_errors = True
         sum_runs += process['statistic']['runs']
         sum_fails += process['statistic']['fails']
-        LOG.info(" Process %d (%s): Run %d actions (%d failed)" %
+        LOG.info(" Process %d (%s, %d users): Run %d actions (%d failed)" %
                  (process['p_number'],
                   process['action'],
+                  process['users'],
                   process['statistic']['runs'],
                      process['statistic']['fails']))
     LOG.info("Summary:")
     LOG.info("Run %d actions (%d failed)" %
              (sum_runs, sum_fails))
+    report = aggregator.report()
+    for key in sorted(report['totals']):
+        LOG.info(" %s: %s" % (key,
+                              metrics.format_summary(report['totals'][key])))
+    if metrics_file:
+        aggregator.export(metrics_file)
+        LOG.info("Metrics written to %s" % metrics_file)
+    results_store = admin_manager.config.stress.results_store
+    if results_store and metrics_sink is None:
+        # NOTE: the coordinator of a distributed run stores the whole run
+        results.store_run(results_store, tests, report, int(had_errors),
+                          {'duration': duration, 'max_runs': max_runs,
+                           'rate': rate, 'arrival': arrival,
+                           'processes': processes_per_action})
 
-    if not had_errors:
+    # NOTE: the agents of a distributed run only delete the resources they
+    # journaled, which can't collide with the ones of other agents
+    if not had_errors and (cleanup_resources or journal_path):
         LOG.info("cleaning up")
         cleanup.cleanup()
     if had_errors:
@@ -0,0 +1,170 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import pipes
+import re
+import time
+
+from tempest.common.utils import misc
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# maximum number of nodes scanned at the same time
+SCAN_WORKERS = 32
+
+MARKER = '==> tempest-log-scan'
+
+SCRIPT = """LC_ALL=C; export LC_ALL
+for f in %(logfiles)s; do
+    [ -f "$f" ] || continue
+    case "$f" in %(offsets)s *) offset=0;; esac
+    size=$(stat -c %%s "$f")
+    [ "$size" -lt "$offset" ] && offset=0
+    echo "%(marker)s $size $f"
+    %(scan)s
+done
+true
+"""
+
+GREP = ('tail -c +$((offset + 1)) "$f" | head -c $((size - offset)) | '
+        'egrep "ERROR|TRACE"')
+
+# e.g. 2013-10-11 12:34:56.789 12345 ERROR nova.compute.manager [req-...
+TIMESTAMP_RE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(\.\d+)?'
+                          r'(\s+\d+)?\s+')
+VARIABLE_RE = re.compile(r'req-[0-9a-f-]+|[0-9a-f]{8}-[0-9a-f-]{27}|'
+                         r'[0-9a-f]{32}|0x[0-9a-f]+|\d+')
+
+
+def fingerprint(message):
+    """Returns a log message with its ids and numbers masked."""
+    return VARIABLE_RE.sub('#', message)
+
+
+def parse_line(line):
+    """
+    Returns the time of a log line (None if it has no timestamp) and its
+    message without the timestamp and the process id.
+    """
+    match = TIMESTAMP_RE.match(line)
+    if not match:
+        return None, line
+    try:
+        when = time.mktime(time.strptime(match.group(1),
+                                         '%Y-%m-%d %H:%M:%S'))
+    except ValueError:
+        return None, line
+    return when + float(match.group(2) or 0), line[match.end():]
+
+
+class LogScanner(object):
+    """
+    Incremental error scanner of the log files of the target nodes
+
+    The byte offset up to which every log file of every node is scanned is
+    kept, so every scan only greps the content written since the previous
+    one, with one remote command per node over the NodeSessions of the
+    driver. The nodes are scanned in parallel. An error is only
+    reported the first time it shows up, later occurrences of the same
+    message (with ids and numbers masked) are counted. Every error is
+    attributed to the context, e.g. the load stage, active when it was
+    logged, see set_context().
+    """
+
+    def __init__(self, nodes, logfiles, sessions):
+        self.nodes = nodes
+        self.logfiles = logfiles
+        self.sessions = sessions
+        self.offsets = {}
+        self.errors = {}
+        self.contexts = []
+        self.last_scan = time.time()
+
+    def set_context(self, label, when=None):
+        when = time.time() if when is None else when
+        self.contexts.append((when, label))
+
+    def _context_at(self, when):
+        index = bisect.bisect_right([c[0] for c in self.contexts], when)
+        return self.contexts[index - 1][1] if index else None
+
+    def _script(self, node, grep=True):
+        offsets = ''.join('%s) offset=%d;; ' % (pipes.quote(name), offset)
+                          for (host, name), offset in
+                          self.offsets.iteritems() if host == node)
+        return SCRIPT % {'logfiles': self.logfiles, 'offsets': offsets,
+                         'marker': MARKER, 'scan': GREP if grep else ':'}
+
+    def _scan_node(self, node, grep=True):
+        """
+        Returns the new offsets of the log files of a node and the error
+        lines found, as (file, line) pairs.
+        """
+        offsets = {}
+        lines = []
+        name = None
+        try:
+            for line in self.sessions.exec_lines(node,
+                                                 self._script(node, grep)):
+                if line.startswith(MARKER + ' '):
+                    size, name = line[len(MARKER) + 1:].split(' ', 1)
+                    offsets[(node, name)] = int(size)
+                elif name is not None:
+                    lines.append((name, line))
+        except Exception:
+            LOG.exception("Failed to scan the logs of %s" % node)
+        return offsets, lines
+
+    def skip_existing(self):
+        """Moves the offsets to the end of the existing log content."""
+        for offsets, _ in misc.parallel_map(
+                lambda node: self._scan_node(node, grep=False),
+                self.nodes, SCAN_WORKERS):
+            self.offsets.update(offsets)
+        self.last_scan = time.time()
+
+    def scan(self):
+        """
+        Scans the content logged since the previous scan and returns the
+        errors seen for the first time, as dicts with the node, file,
+        time, context, message and count of every error.
+        """
+        now = time.time()
+        new_errors = []
+        results = misc.parallel_map(self._scan_node, self.nodes,
+                                    SCAN_WORKERS)
+        for node, (offsets, lines) in zip(self.nodes, results):
+            self.offsets.update(offsets)
+            for name, line in lines:
+                when, message = parse_line(line)
+                if when is None or not (self.last_scan - 60 <= when <=
+                                         now + 60):
+                    # NOTE: no timestamp, or the clock of the node is off
+                    when = self.last_scan
+                key = fingerprint(message)
+                error = self.errors.get(key)
+                if error is not None:
+                    error['count'] += 1
+                    continue
+                error = self.errors[key] = {
+                    'node': node, 'file': name, 'time': when,
+                    'context': self._context_at(when), 'message': message,
+                    'count': 1}
+                new_errors.append(error)
+                LOG.error("%s %s: %s (during %s)" % (node, name, message,
+                                                     error['context']))
+        self.last_scan = now
+        return new_errors
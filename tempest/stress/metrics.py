@@ -0,0 +1,367 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import csv
+import json
+import Queue
+import re
+import threading
+import time
+
+from tempest.common import rest_client
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# number of the busiest nodes logged with the statistics of every window
+BUSIEST_NODES = 3
+
+# Every power of two is split in 2 ** SUB_BUCKET_BITS buckets, which keeps
+# the relative error of the recorded latencies below 2 ** -SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+PERCENTILES = (50, 95, 99)
+
+ID_RE = re.compile(r'^([0-9a-fA-F-]{32,36}|\d+)$')
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = len(bin(value)) - 2 - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_range(index):
+    """Returns the lowest and highest value counted in a bucket."""
+    if index < SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    low = (SUB_BUCKETS + index % SUB_BUCKETS) << shift
+    return low, low + (1 << shift) - 1
+
+
+class Histogram(object):
+    """
+    Compact latency histogram with HDR-style log-linear buckets
+
+    Latencies are counted in microseconds in sparse buckets, so a
+    histogram stays small whatever the number of recorded values, and
+    histograms of several workers or time windows can simply be merged.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds, failed=False):
+        value = max(int(seconds * 1000000), 0)
+        index = _bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if failed:
+            self.errors += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.buckets.iteritems():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        if other.min is not None and (self.min is None or
+                                      other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or
+                                      other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percent):
+        """Returns the given percentile of the latencies in seconds."""
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                low, high = _bucket_range(index)
+                value = min(max((low + high) / 2.0, self.min), self.max)
+                return value / 1000000.0
+        return self.max / 1000000.0
+
+    def summary(self, duration=None):
+        """Returns the statistics of the histogram as a dict."""
+        summary = {'count': self.count,
+                   'errors': self.errors,
+                   'error_rate': (float(self.errors) / self.count
+                                  if self.count else 0.0)}
+        if duration:
+            summary['ops_per_sec'] = self.count / float(duration)
+        if self.count:
+            summary['min'] = self.min / 1000000.0
+            summary['mean'] = self.total / 1000000.0 / self.count
+            summary['max'] = self.max / 1000000.0
+            for percent in PERCENTILES:
+                summary['p%d' % percent] = self.percentile(percent)
+        return summary
+
+    def to_dict(self):
+        return {'buckets': self.buckets.items(), 'count': self.count,
+                'errors': self.errors, 'total': self.total,
+                'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = dict(data['buckets'])
+        for key in ('count', 'errors', 'total', 'min', 'max'):
+            setattr(histogram, key, data[key])
+        return histogram
+
+
+def api_call_key(service, method, url):
+    """Returns the metric name of an API call, with the ids masked."""
+    path = url.split('?', 1)[0]
+    parts = ['{id}' if ID_RE.match(part) else part
+             for part in path.split('/')]
+    return 'api:%s %s %s' % (service, method, '/'.join(parts))
+
+
+class Recorder(object):
+    """
+    Records the latencies of a worker process
+
+    The histograms recorded since the last report are sent to the driver
+    through a multiprocessing queue every ``interval`` seconds.
+    """
+
+    def __init__(self, queue, worker, interval):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval
+        self.histograms = {}
+        self._last_report = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, failed=False):
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(seconds, failed)
+
+    def observe_request(self, service, method, url, status, seconds):
+        self.record(api_call_key(service, method, url), seconds,
+                    status >= 400)
+
+    def install(self):
+        """Records the latency of every RestClient call of the process."""
+        rest_client.REQUEST_OBSERVERS.append(self.observe_request)
+
+    def report(self, force=False):
+        now = time.time()
+        if not force and now - self._last_report < self.interval:
+            return
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+            self._last_report = now
+        if histograms:
+            self.queue.put((self.worker, dict(
+                (key, histogram.to_dict())
+                for key, histogram in histograms.iteritems())))
+
+
+class Aggregator(object):
+    """
+    Merges the reports of the workers and keeps per-window statistics
+
+    Every call of close_window() logs and stores the statistics of the
+    latencies reported since the previous call, while the totals of the
+    whole run are kept for the final report. The statistics of the load
+    profile stages are kept separately, see start_stage(). Every report is
+    also passed to sink if given, e.g. to forward it to a coordinator.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.start = time.time()
+        self.window_start = self.start
+        self.totals = {}
+        self.window = {}
+        self.windows = []
+        self.stage = None
+        self.stage_start = None
+        self.stage_histograms = {}
+        self.stages = []
+        self.log_errors = []
+        self.node_samples = []
+        self.window_node_samples = {}
+
+    def add(self, report):
+        if self.sink is not None:
+            self.sink(report)
+        for key, data in report.iteritems():
+            histogram = Histogram.from_dict(data)
+            for histograms in (self.totals, self.window,
+                               self.stage_histograms):
+                if key not in histograms:
+                    histograms[key] = Histogram()
+                histograms[key].merge(histogram)
+
+    def drain(self, queue):
+        """Adds every report waiting in the queue."""
+        while True:
+            try:
+                worker, report = queue.get_nowait()
+            except Queue.Empty:
+                return
+            self.add(report)
+
+    def close_window(self):
+        now = time.time()
+        duration = now - self.window_start
+        stats = dict((key, histogram.summary(duration))
+                     for key, histogram in self.window.iteritems())
+        self.windows.append({'start': self.window_start - self.start,
+                             'end': now - self.start,
+                             'stats': stats})
+        for key in sorted(stats):
+            if not key.startswith('api:'):
+                LOG.info("%s: %s" % (key, format_summary(stats[key])))
+        busiest = sorted(self.window_node_samples.iteritems(),
+                         key=lambda item: -item[1].get('cpu_percent', 0))
+        for node, values in busiest[:BUSIEST_NODES]:
+            LOG.info("%s: %s" % (node, format_node_sample(values)))
+        self.window = {}
+        self.window_node_samples = {}
+        self.window_start = now
+
+    def add_log_errors(self, errors):
+        """
+        Keeps the errors found in the logs of the target nodes, with their
+        offset in the run and the metrics window they fall in.
+        """
+        # NOTE: the last start is the one of the window still open
+        starts = [w['start'] for w in self.windows]
+        starts.append(self.window_start - self.start)
+        for error in errors:
+            offset = error['time'] - self.start
+            window = max(bisect.bisect_right(starts, offset) - 1, 0)
+            self.log_errors.append(dict(error, offset=offset, window=window))
+
+    def add_node_samples(self, samples):
+        """
+        Keeps the (node, time, values) resource samples of the target
+        nodes on the timeline of the metrics, see add_log_errors().
+        """
+        for node, when, values in samples:
+            self.node_samples.append({
+                'node': node, 'offset': when - self.start,
+                'window': len(self.windows), 'values': values})
+            self.window_node_samples[node] = values
+
+    def start_stage(self, label):
+        """
+        Ends the current load profile stage, logging its statistics, and
+        starts a new one, unless label is None.
+        """
+        now = time.time()
+        if self.stage is not None:
+            duration = now - self.stage_start
+            stats = dict((key, histogram.summary(duration))
+                         for key, histogram in
+                         self.stage_histograms.iteritems())
+            self.stages.append({'label': self.stage,
+                                'start': self.stage_start - self.start,
+                                'end': now - self.start,
+                                'stats': stats})
+            LOG.info("Stage %s:" % self.stage)
+            for key in sorted(stats):
+                if not key.startswith('api:'):
+                    LOG.info(" %s: %s" % (key, format_summary(stats[key])))
+        self.stage = label
+        self.stage_start = now
+        self.stage_histograms = {}
+
+    def report(self):
+        duration = time.time() - self.start
+        return {'duration': duration,
+                'totals': dict((key, histogram.summary(duration))
+                               for key, histogram in
+                               self.totals.iteritems()),
+                'windows': self.windows,
+                'stages': self.stages,
+                'log_errors': self.log_errors,
+                'node_samples': self.node_samples}
+
+    def export(self, path):
+        """Writes the report to path, as CSV if it ends with .csv."""
+        report = self.report()
+        with open(path, 'w') as report_file:
+            if not path.endswith('.csv'):
+                json.dump(report, report_file, indent=2, sort_keys=True)
+                return
+            fields = ['stage', 'window_start', 'window_end', 'name', 'count',
+                      'errors', 'error_rate', 'ops_per_sec', 'min', 'mean',
+                      'p50', 'p95', 'p99', 'max']
+            writer = csv.DictWriter(report_file, fields)
+            writer.writerow(dict(zip(fields, fields)))
+            rows = [('', w['start'], w['end'], w['stats'])
+                    for w in report['windows']]
+            rows.extend((s['label'], s['start'], s['end'], s['stats'])
+                        for s in report['stages'])
+            rows.append(('', '', '', report['totals']))
+            for stage, start, end, stats in rows:
+                for key in sorted(stats):
+                    row = dict(stats[key], stage=stage, window_start=start,
+                               window_end=end, name=key)
+                    writer.writerow(row)
+
+
+def format_node_sample(values):
+    text = "load %.2f" % values['load1']
+    if 'cpu_percent' in values:
+        text += ", cpu %.0f%% (%.0f%% iowait), disk %.0f%% busy" % (
+            values['cpu_percent'], values['iowait_percent'],
+            values['disk_util_percent'])
+    text += ", mem %.0f%%" % values['mem_used_percent']
+    services = sorted((value, key.split(':', 1)[1])
+                      for key, value in values.iteritems()
+                      if key.startswith('rss_mb:'))
+    if services:
+        text += ", largest %s %.0f MB" % (services[-1][1], services[-1][0])
+    return text
+
+
+def format_summary(summary):
+    if not summary['count']:
+        return "no calls"
+    text = "%d calls" % summary['count']
+    if 'ops_per_sec' in summary:
+        text += ", %.2f ops/s" % summary['ops_per_sec']
+    text += ", %.1f%% errors" % (summary['error_rate'] * 100)
+    text += ", " + ", ".join("p%d %.3f s" % (p, summary['p%d' % p])
+                             for p in PERCENTILES)
+    return text
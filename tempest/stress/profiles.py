@@ -0,0 +1,79 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time-varying load profiles of the stress actions
+
+A profile is given as the "profile" of an action in the JSON descriptor
+and gives the number of active threads of the action over time:
+
+``{"type": "ramp", "from": 1, "to": 16, "duration": 300}``
+    adds threads linearly from ``from`` to ``to`` over ``duration`` seconds
+    and then holds ``to`` threads (a soak after the ramp-up)
+``{"type": "step", "from": 2, "to": 10, "step": 2, "hold": 60}``
+    adds ``step`` threads every ``hold`` seconds, from ``from`` to ``to``
+    (or removes them, when ``from`` is above ``to``)
+``{"type": "spike", "base": 2, "peak": 20, "at": 60, "length": 30}``
+    runs ``base`` threads, and ``peak`` threads for ``length`` seconds from
+    ``at`` seconds on
+"""
+
+
+def _ramp(profile):
+    start, end = int(profile['from']), int(profile['to'])
+    duration = float(profile['duration'])
+    if end == start:
+        return [(0, start)]
+    step = 1 if end > start else -1
+    return [(duration * (users - start) / (end - start), users)
+            for users in xrange(start, end + step, step)]
+
+
+def _step(profile):
+    start, end = int(profile['from']), int(profile['to'])
+    step = int(profile.get('step', 1))
+    hold = float(profile['hold'])
+    if step <= 0:
+        raise ValueError("The step of a step profile must be positive")
+    if end < start:
+        step = -step
+    changes = [(index * hold, users) for index, users in
+               enumerate(xrange(start, end + (1 if step > 0 else -1), step))]
+    if changes[-1][1] != end:
+        changes.append((len(changes) * hold, end))
+    return changes
+
+
+def _spike(profile):
+    base, peak = int(profile['base']), int(profile['peak'])
+    at = float(profile['at'])
+    return [(0, base), (at, peak), (at + float(profile['length']), base)]
+
+
+PROFILES = {'ramp': _ramp, 'step': _step, 'spike': _spike}
+
+
+def changes(profile):
+    """
+    Returns the (offset in seconds, active threads) pairs at which the
+    number of active threads of a profile changes, in time order.
+    """
+    if profile.get('type') not in PROFILES:
+        raise ValueError("Unknown load profile type %s, use one of %s" %
+                         (profile.get('type'), ', '.join(sorted(PROFILES))))
+    return PROFILES[profile['type']](profile)
+
+
+def max_threads(profile):
+    return max(users for _, users in changes(profile))
@@ -0,0 +1,295 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Results store of the stress runs and regression checks between runs
+
+Every run is stored in a SQLite database with its descriptor, a
+fingerprint of the tempest configuration, the statistics of every metrics
+window, stage and of the whole run, the errors found in the logs and the
+resource samples of the target nodes. Two
+runs of the same descriptor are compared window by window with a
+Mann-Whitney U test, which makes no assumption on the distribution of the
+per-window throughput and latency.
+"""
+
+import collections
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import time
+
+from oslo.config import cfg
+
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL,
+    duration REAL,
+    descriptor TEXT,
+    descriptor_hash TEXT,
+    config_fingerprint TEXT,
+    options TEXT,
+    result INTEGER
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER REFERENCES runs(id),
+    kind TEXT,
+    label TEXT,
+    start_time REAL,
+    end_time REAL,
+    name TEXT,
+    count INTEGER,
+    errors INTEGER,
+    error_rate REAL,
+    ops_per_sec REAL,
+    min REAL,
+    mean REAL,
+    p50 REAL,
+    p95 REAL,
+    p99 REAL,
+    max REAL
+);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id, kind, name);
+CREATE TABLE IF NOT EXISTS errors (
+    run_id INTEGER REFERENCES runs(id),
+    time_offset REAL,
+    window_index INTEGER,
+    node TEXT,
+    file TEXT,
+    context TEXT,
+    message TEXT,
+    count INTEGER
+);
+CREATE TABLE IF NOT EXISTS node_samples (
+    run_id INTEGER REFERENCES runs(id),
+    time_offset REAL,
+    window_index INTEGER,
+    node TEXT,
+    name TEXT,
+    value REAL
+);
+"""
+
+STATS = ('count', 'errors', 'error_rate', 'ops_per_sec', 'min', 'mean',
+         'p50', 'p95', 'p99', 'max')
+
+# the per-window statistics compared between runs, and whether a higher
+# value is better
+COMPARED = (('ops_per_sec', True), ('p50', False), ('p95', False))
+
+# configuration options left out of the fingerprint
+SECRET_RE = re.compile(r'password|secret|authkey|private_key')
+
+
+def config_fingerprint(conf=None):
+    """
+    Returns a hash of the tempest configuration, without the credentials,
+    which tells whether two runs were made with the same configuration.
+    """
+    conf = cfg.CONF if conf is None else conf
+    values = {}
+    for group in conf:
+        group_conf = conf[group]
+        if not isinstance(group_conf, collections.Mapping):
+            continue
+        for name in group_conf:
+            if SECRET_RE.search(name):
+                continue
+            try:
+                values['%s.%s' % (group, name)] = group_conf[name]
+            except cfg.Error:
+                # NOTE: e.g. an unset variable in the default of the option
+                continue
+    return hashlib.md5(json.dumps(values, sort_keys=True,
+                                  default=str)).hexdigest()
+
+
+def descriptor_hash(tests):
+    return hashlib.md5(json.dumps(tests, sort_keys=True)).hexdigest()
+
+
+class ResultsStore(object):
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def _add_samples(self, run_id, kind, label, start, end, stats):
+        self.conn.executemany(
+            "INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, %s)" %
+            ', '.join('?' * len(STATS)),
+            [(run_id, kind, label, start, end, name) +
+             tuple(stats[name].get(stat) for stat in STATS)
+             for name in sorted(stats)])
+
+    def record_run(self, tests, report, result, fingerprint=None,
+                   options=None):
+        """Stores a run from its metrics report and returns its id."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started, duration, descriptor, "
+                "descriptor_hash, config_fingerprint, options, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time() - report['duration'], report['duration'],
+                 json.dumps(tests, sort_keys=True), descriptor_hash(tests),
+                 fingerprint, json.dumps(options or {}, sort_keys=True),
+                 result))
+            run_id = cursor.lastrowid
+            for window in report['windows']:
+                self._add_samples(run_id, 'window', None, window['start'],
+                                  window['end'], window['stats'])
+            for stage in report.get('stages', []):
+                self._add_samples(run_id, 'stage', stage['label'],
+                                  stage['start'], stage['end'],
+                                  stage['stats'])
+            self._add_samples(run_id, 'total', None, 0, report['duration'],
+                              report['totals'])
+            self.conn.executemany(
+                "INSERT INTO errors VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, error['offset'], error['window'], error['node'],
+                  error['file'], error['context'], error['message'],
+                  error['count'])
+                 for error in report.get('log_errors', [])])
+            self.conn.executemany(
+                "INSERT INTO node_samples VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, sample['offset'], sample['window'],
+                  sample['node'], name, value)
+                 for sample in report.get('node_samples', [])
+                 for name, value in sorted(sample['values'].iteritems())])
+        return run_id
+
+    def get_run(self, run_id):
+        return self.conn.execute("SELECT * FROM runs WHERE id = ?",
+                                 (run_id,)).fetchone()
+
+    def runs(self, descriptor=None):
+        """Returns the runs, of a descriptor hash if given, latest last."""
+        if descriptor is None:
+            return self.conn.execute("SELECT * FROM runs ORDER BY "
+                                     "id").fetchall()
+        return self.conn.execute("SELECT * FROM runs WHERE "
+                                 "descriptor_hash = ? ORDER BY id",
+                                 (descriptor,)).fetchall()
+
+    def samples(self, run_id, kind='window'):
+        """Returns the samples of a run, grouped by metric name."""
+        samples = collections.defaultdict(list)
+        for row in self.conn.execute("SELECT * FROM samples WHERE "
+                                     "run_id = ? AND kind = ? ORDER BY "
+                                     "start_time", (run_id, kind)):
+            samples[row['name']].append(row)
+        return samples
+
+    def close(self):
+        self.conn.close()
+
+
+def store_run(path, tests, report, result, options=None):
+    """Stores a run in the results store at path and returns its id."""
+    store = ResultsStore(path)
+    try:
+        run_id = store.record_run(tests, report, result,
+                                  config_fingerprint(), options)
+    finally:
+        store.close()
+    LOG.info("Run %d stored in %s" % (run_id, path))
+    return run_id
+
+
+def _erfc(x):
+    # NOTE: Abramowitz and Stegun 7.1.26, math.erfc needs python 2.7
+    t = 1.0 / (1.0 + 0.3275911 * abs(x))
+    y = t * (0.254829592 + t * (-0.284496736 + t * (
+        1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    y *= math.exp(-x * x)
+    return y if x >= 0 else 2.0 - y
+
+
+def mann_whitney(xs, ys):
+    """
+    Returns the two-sided p-value of the Mann-Whitney U test of two
+    samples, with the normal approximation corrected for ties.
+    """
+    n1, n2 = len(xs), len(ys)
+    values = sorted([(value, 0) for value in xs] +
+                    [(value, 1) for value in ys])
+    n = n1 + n2
+    rank_sum = 0.0
+    ties = 0.0
+    index = 0
+    while index < n:
+        end = index
+        while end + 1 < n and values[end + 1][0] == values[index][0]:
+            end += 1
+        rank = (index + end) / 2.0 + 1
+        tied = end - index + 1
+        ties += tied ** 3 - tied
+        rank_sum += rank * sum(1 for _, group in values[index:end + 1]
+                               if group == 0)
+        index = end + 1
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = max(abs(u - mean) - 0.5, 0) / math.sqrt(variance)
+    return min(_erfc(z / math.sqrt(2)), 1.0)
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def compare(store, baseline, candidate, alpha=0.05, threshold=0.05,
+            min_samples=3):
+    """
+    Compares the per-window throughput and latencies of every metric of
+    two runs and returns one dict per compared statistic, with the median
+    of both runs, the relative change, the p-value and whether it is a
+    regression: a change for the worse of more than threshold which is
+    significant at the alpha level.
+    """
+    baseline_samples = store.samples(baseline)
+    candidate_samples = store.samples(candidate)
+    findings = []
+    for name in sorted(set(baseline_samples) & set(candidate_samples)):
+        for stat, higher_is_better in COMPARED:
+            xs = [row[stat] for row in baseline_samples[name]
+                  if row[stat] is not None]
+            ys = [row[stat] for row in candidate_samples[name]
+                  if row[stat] is not None]
+            if len(xs) < min_samples or len(ys) < min_samples:
+                continue
+            before, after = _median(xs), _median(ys)
+            change = (after - before) / before if before else 0.0
+            p_value = mann_whitney(xs, ys)
+            worse = change < -threshold if higher_is_better else \
+                change > threshold
+            findings.append({'name': name, 'stat': stat,
+                             'baseline': before, 'candidate': after,
+                             'change': change, 'p_value': p_value,
+                             'regression': worse and p_value < alpha})
+    return findings
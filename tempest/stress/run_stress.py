@@ -19,6 +19,7 @@
 import argparse
 import inspect
 import json
+import os
 import sys
 from testtools.testsuite import iterate_tests
 from unittest import loader
@@ -63,28 +64,110 @@ def discover_stress_tests(path="./", filter_attr=None, call_inherited=False):
 
 def main(ns):
     # NOTE(mkoderer): moved import to make "-h" possible without OpenStack
+    from tempest.stress import distributed
     from tempest.stress import driver
     result = 0
+    if ns.agent:
+        distributed.serve_agent(ns.agent)
+        return result
+    if not ns.all and not ns.tests:
+        parser.error("one of the arguments -a/--all -t/--tests is required")
     if not ns.all:
         tests = json.load(open(ns.tests, 'r'))
     else:
         tests = discover_stress_tests(filter_attr=ns.type,
                                       call_inherited=ns.call_inherited)
 
-    if ns.serial:
-        for test in tests:
+    if ns.agents:
+        result = distributed.coordinate(ns.agents.split(','), tests,
+                                        ns.duration, ns.number, ns.stop,
+                                        ns.metrics_file, ns.rate,
+                                        ns.arrival, ns.processes)
+    elif ns.serial:
+        for index, test in enumerate(tests):
+            metrics_file = ns.metrics_file
+            if metrics_file:
+                root, ext = os.path.splitext(metrics_file)
+                metrics_file = "%s-%d%s" % (root, index, ext)
             step_result = driver.stress_openstack([test],
                                                   ns.duration,
                                                   ns.number,
-                                                  ns.stop)
+                                                  ns.stop,
+                                                  metrics_file,
+                                                  ns.rate,
+                                                  ns.arrival,
+                                                  ns.processes)
             # NOTE(mkoderer): we just save the last result code
             if (step_result != 0):
                 result = step_result
     else:
-        driver.stress_openstack(tests, ns.duration, ns.number, ns.stop)
+        driver.stress_openstack(tests, ns.duration, ns.number, ns.stop,
+                                ns.metrics_file, ns.rate, ns.arrival,
+                                ns.processes)
     return result
 
 
+def compare(ns):
+    """
+    Compares two runs of the results store and returns 1 if the candidate
+    run regressed.
+    """
+    from tempest import config
+    from tempest.stress import results
+    path = ns.store or config.TempestConfig().stress.results_store
+    if not path:
+        compare_parser.error("no results store, use --store or set "
+                             "results_store in the [stress] section")
+    store = results.ResultsStore(path)
+    runs = store.runs()
+    if not runs:
+        compare_parser.error("no run in %s" % path)
+    candidate = store.get_run(ns.candidate or runs[-1]['id'])
+    if candidate is None:
+        compare_parser.error("no run %s in %s" % (ns.candidate, path))
+    if ns.baseline:
+        baseline = store.get_run(ns.baseline)
+    else:
+        earlier = [run for run in store.runs(candidate['descriptor_hash'])
+                   if run['id'] < candidate['id']]
+        baseline = earlier[-1] if earlier else None
+    if baseline is None:
+        compare_parser.error("no baseline run for run %d" % candidate['id'])
+    print("Run %d compared to run %d" % (candidate['id'], baseline['id']))
+    if baseline['descriptor_hash'] != candidate['descriptor_hash']:
+        print("Warning: the runs have different descriptors")
+    if baseline['config_fingerprint'] != candidate['config_fingerprint']:
+        print("Note: the runs have different tempest configurations")
+    findings = results.compare(store, baseline['id'], candidate['id'],
+                               ns.alpha, ns.threshold)
+    for finding in findings:
+        print("%-50s %-12s %10.3f %10.3f %+7.1f%% p=%.4f%s" % (
+            finding['name'], finding['stat'], finding['baseline'],
+            finding['candidate'], finding['change'] * 100,
+            finding['p_value'],
+            "  REGRESSION" if finding['regression'] else ""))
+    store.close()
+    return 1 if any(f['regression'] for f in findings) else 0
+
+
+compare_parser = argparse.ArgumentParser(
+    prog='run_stress.py compare',
+    description='Compare the throughput and latencies of two stress runs')
+compare_parser.add_argument('--store',
+                            help="Results store (stress.results_store by "
+                                 "default)")
+compare_parser.add_argument('-b', '--baseline', type=int,
+                            help="Id of the baseline run (by default the "
+                                 "previous run of the same descriptor)")
+compare_parser.add_argument('-c', '--candidate', type=int,
+                            help="Id of the candidate run (by default the "
+                                 "latest run)")
+compare_parser.add_argument('--alpha', type=float, default=0.05,
+                            help="Significance level of the changes")
+compare_parser.add_argument('--threshold', type=float, default=0.05,
+                            help="Smallest relative change reported as a "
+                                 "regression")
+
 parser = argparse.ArgumentParser(description='Run stress tests')
 parser.add_argument('-d', '--duration', default=300, type=int,
                     help="Duration of test in secs")
@@ -94,7 +177,27 @@ parser.add_argument('-S', '--stop', action='store_true',
                     default=False, help="Stop on first error")
 parser.add_argument('-n', '--number', type=int,
                     help="How often an action is executed for each process")
-group = parser.add_mutually_exclusive_group(required=True)
+parser.add_argument('-m', '--metrics-file',
+                    help="Write the latency and throughput metrics to this "
+                         "file (JSON, or CSV if it ends with .csv)")
+parser.add_argument('-r', '--rate', type=float,
+                    help="Run the actions open loop at this many runs per "
+                         "second per action, unless their descriptor sets "
+                         "a \"rate\"")
+parser.add_argument('--arrival', choices=['poisson', 'constant'],
+                    default='poisson',
+                    help="Inter-arrival times of the open loop runs")
+parser.add_argument('-p', '--processes', type=int,
+                    help="Run the threads of every action as virtual users "
+                         "in this many processes (0 for one per CPU) "
+                         "instead of one process per thread")
+parser.add_argument('--agents',
+                    help="Comma separated HOST:PORT addresses of stress "
+                         "agents to split the run across")
+parser.add_argument('--agent', metavar='HOST:PORT',
+                    help="Serve as a stress agent on this address, running "
+                         "the jobs of a coordinator started with --agents")
+group = parser.add_mutually_exclusive_group()
 group.add_argument('-a', '--all', action='store_true',
                    help="Execute all stress tests")
 parser.add_argument('-T', '--type',
@@ -106,4 +209,6 @@ group.add_argument('-t', "--tests", nargs='?',
                    help="Name of the file with test description")
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['compare']:
+        sys.exit(compare(compare_parser.parse_args(sys.argv[2:])))
     sys.exit(main(parser.parse_args()))
@@ -0,0 +1,185 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pipes
+import Queue
+import re
+import threading
+import time
+
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# maximum number of nodes sampled at the same time
+SAMPLE_WORKERS = 32
+
+# minimum time given to a node to answer a sampling, in seconds
+MIN_TIMEOUT = 10
+
+MARKER = '==> tempest-node-sample'
+
+SCRIPT = """cat /proc/loadavg
+echo '%(marker)s'
+head -1 /proc/stat
+echo '%(marker)s'
+cat /proc/meminfo
+echo '%(marker)s'
+cat /proc/diskstats
+echo '%(marker)s'
+%(ps)s
+true
+"""
+
+# whole disks of /proc/diskstats, their partitions are left out
+DISK_RE = re.compile(r'^([shv]d[a-z]+|xvd[a-z]+|nvme\d+n\d+|dm-\d+)$')
+
+SECTOR_SIZE = 512
+
+
+def _parse_meminfo(lines):
+    meminfo = {}
+    for line in lines:
+        name, value = line.split(':', 1)
+        meminfo[name] = int(value.split()[0])
+    available = meminfo.get('MemAvailable')
+    if available is None:
+        available = sum(meminfo.get(name, 0)
+                        for name in ('MemFree', 'Buffers', 'Cached'))
+    return 100.0 * (1 - float(available) / meminfo['MemTotal'])
+
+
+def _parse_diskstats(lines):
+    """Returns the sectors read, written and the ms spent doing I/O."""
+    disks = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 13 and DISK_RE.match(fields[2]):
+            disks[fields[2]] = (int(fields[5]), int(fields[9]),
+                                int(fields[12]))
+    return disks
+
+
+class NodeSampler(threading.Thread):
+    """
+    Periodic resource sampler of the target nodes
+
+    Every ``interval`` seconds the load average, CPU and memory usage, disk
+    throughput and utilization of every node and the resident memory of
+    its service processes are read with one remote command per node, on
+    all nodes in parallel over the NodeSessions of the driver. A node which
+    doesn't answer within the interval is left out of the round. The samples
+    are put in ``queue`` as (node, time, values) tuples, for the driver to
+    keep them on the timeline of the latency metrics.
+    """
+
+    def __init__(self, nodes, sessions, interval, services):
+        super(NodeSampler, self).__init__()
+        self.daemon = True
+        self.nodes = nodes
+        self.sessions = sessions
+        self.interval = interval
+        self.services = services
+        self.queue = Queue.Queue()
+        self._previous = {}
+        self._stop = threading.Event()
+
+    def _script(self):
+        ps = ':'
+        if self.services:
+            ps = 'ps -eo rss=,args= | egrep ' + ' '.join(
+                '-e %s' % pipes.quote(service) for service in self.services)
+        return SCRIPT % {'marker': MARKER, 'ps': ps}
+
+    def _parse(self, node, now, sections):
+        values = {}
+        load = sections[0][0].split()
+        values['load1'], values['load5'] = float(load[0]), float(load[1])
+        cpu = [int(field) for field in sections[1][0].split()[1:]]
+        # NOTE: a CPU is busy unless it is idle or waits for I/O
+        idle, iowait = cpu[3], cpu[4] if len(cpu) > 4 else 0
+        values['mem_used_percent'] = _parse_meminfo(sections[2])
+        disks = _parse_diskstats(sections[3])
+        for line in sections[4]:
+            rss, args = line.strip().split(None, 1)
+            if args.startswith('egrep '):
+                continue
+            for service in self.services:
+                if service in args:
+                    key = 'rss_mb:%s' % service
+                    values[key] = values.get(key, 0) + int(rss) / 1024.0
+        previous = self._previous.get(node)
+        self._previous[node] = (now, sum(cpu), idle + iowait, iowait, disks)
+        if previous is not None:
+            elapsed = now - previous[0]
+            total = float(sum(cpu) - previous[1]) or 1.0
+            values['cpu_percent'] = 100 * (
+                1 - (idle + iowait - previous[2]) / total)
+            values['iowait_percent'] = 100 * (iowait - previous[3]) / total
+            read = written = busy = 0
+            for disk, (sectors_read, sectors_written, io_ms) in \
+                    disks.iteritems():
+                before = previous[4].get(disk, (sectors_read,
+                                                sectors_written, io_ms))
+                read += sectors_read - before[0]
+                written += sectors_written - before[1]
+                busy = max(busy, io_ms - before[2])
+            values['disk_read_bps'] = read * SECTOR_SIZE / elapsed
+            values['disk_write_bps'] = written * SECTOR_SIZE / elapsed
+            values['disk_util_percent'] = min(busy / 10.0 / elapsed, 100.0)
+        return values
+
+    def sample_node(self, node, now, result):
+        """Returns the values sampled on a node, None if it failed."""
+        if not result.succeeded:
+            LOG.warning("Failed to sample %s: %s" %
+                        (node, result.error or result.stderr))
+            return None
+        sections = [[]]
+        for line in result.stdout.splitlines():
+            if line == MARKER:
+                sections.append([])
+            elif line:
+                sections[-1].append(line)
+        try:
+            return self._parse(node, now, sections)
+        except Exception:
+            LOG.exception("Failed to sample %s" % node)
+            return None
+
+    def run(self):
+        script = self._script()
+        # NOTE: the first round also opens the connections
+        timeout = max(self.interval, MIN_TIMEOUT)
+        while not self._stop.is_set():
+            start = time.time()
+            results = self.sessions.run(script, self.nodes, timeout,
+                                        SAMPLE_WORKERS)
+            for node, result in zip(self.nodes, results):
+                values = self.sample_node(node, start, result)
+                if values is not None:
+                    self.queue.put((node, start, values))
+            self._stop.wait(max(self.interval - (time.time() - start), 0))
+
+    def drain(self):
+        """Returns the samples taken since the previous call."""
+        samples = []
+        while True:
+            try:
+                samples.append(self.queue.get_nowait())
+            except Queue.Empty:
+                return samples
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,196 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import Queue
+import threading
+import time
+
+from tempest.common.utils.data_utils import rand_name
+from tempest.common import waiters
+from tempest import exceptions
+from tempest.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class ServerPool(object):
+    """
+    Pool of pre-booted ACTIVE servers leased by the runs of stress actions
+
+    A background thread boots servers until ``size`` of them exist and
+    waits for all of them at once with a waiters.BatchWaiter. A run leases
+    an ACTIVE server and releases it when done. A server is rebuilt in the
+    background after ``max_uses`` leases, and a server released as broken
+    is deleted and replaced, so the runs only wait for a boot when the
+    pool can't keep up. The thread is started by the first lease, so a
+    pool created before the worker processes fork works in every worker.
+    Closing the pool waits until its servers are gone, so the resources
+    they use, like their security groups, can be deleted right after.
+    """
+
+    def __init__(self, manager, image, flavor, size=2, max_uses=None,
+                 create_kwargs=None, lease_timeout=None):
+        self.manager = manager
+        self.image = image
+        self.flavor = flavor
+        self.size = size
+        self.max_uses = max_uses
+        self.create_kwargs = create_kwargs or {}
+        self.lease_timeout = (lease_timeout or
+                              manager.config.compute.build_timeout)
+        self.lister = waiters.ServerLister(manager.servers_client)
+        self.servers = {}
+        self.ready = Queue.Queue()
+        self._to_rebuild = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _boot(self):
+        name = rand_name("pool-server")
+        _, server = self.manager.servers_client.create_server(
+            name, self.image, self.flavor, **self.create_kwargs)
+        entry = {'id': server['id'], 'name': name, 'uses': 0}
+        with self._lock:
+            self.servers[server['id']] = entry
+        return entry
+
+    def _delete(self, entry):
+        with self._lock:
+            self.servers.pop(entry['id'], None)
+        try:
+            self.manager.servers_client.delete_server(entry['id'])
+        except exceptions.NotFound:
+            pass
+
+    def _fill(self):
+        """Boots and rebuilds servers and waits until they are ACTIVE."""
+        waiter = waiters.BatchWaiter()
+        pending = []
+        with self._lock:
+            to_rebuild, self._to_rebuild = self._to_rebuild, []
+            missing = self.size - len(self.servers)
+        for entry in to_rebuild:
+            try:
+                self.manager.servers_client.rebuild(entry['id'], self.image)
+                entry['uses'] = 0
+                pending.append(entry)
+            except Exception:
+                LOG.exception("Rebuild of server %s failed" % entry['id'])
+                self._delete(entry)
+                missing += 1
+        for _ in xrange(missing):
+            if self._stop.is_set():
+                break
+            try:
+                pending.append(self._boot())
+            except Exception:
+                LOG.exception("Boot of a pool server failed")
+        futures = [waiter.add(self.lister, entry['id'], 'ACTIVE')
+                   for entry in pending]
+        # NOTE: polled here rather than by waiter.wait(), which can't be
+        # interrupted by close()
+        while waiter.poll():
+            self._stop.wait(waiter.interval)
+            if self._stop.is_set():
+                break
+        if self._stop.is_set():
+            for entry in pending:
+                self._delete(entry)
+            return
+        for entry, future in zip(pending, futures):
+            if future.exception() is None:
+                self.ready.put(entry)
+            else:
+                LOG.warning("Pool server %s is not usable: %s" %
+                            (entry['id'], future.exception()))
+                self._delete(entry)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            with self._lock:
+                idle = not self._to_rebuild and len(self.servers) >= self.size
+            if idle:
+                self._wakeup.wait(1)
+                continue
+            try:
+                self._fill()
+            except Exception:
+                LOG.exception("Filling the server pool failed")
+                self._stop.wait(1)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def lease(self):
+        """Returns an ACTIVE server of the pool, waiting for one if none."""
+        self.start()
+        start = time.time()
+        try:
+            entry = self.ready.get(timeout=self.lease_timeout)
+        except Queue.Empty:
+            raise exceptions.TimeoutException(
+                "No server of the pool became ACTIVE in %s s" %
+                self.lease_timeout)
+        entry['uses'] += 1
+        LOG.debug("Leased server %s (use %d) after %.2f s" %
+                  (entry['id'], entry['uses'], time.time() - start))
+        return entry
+
+    def release(self, entry, healthy=True):
+        """
+        Returns a leased server to the pool. It is rebuilt after max_uses,
+        or deleted and replaced if not healthy.
+        """
+        if not healthy:
+            self._delete(entry)
+        elif self.max_uses and entry['uses'] >= self.max_uses:
+            with self._lock:
+                self._to_rebuild.append(entry)
+        else:
+            self.ready.put(entry)
+            return
+        self._wakeup.set()
+
+    def close(self):
+        """
+        Stops refilling the pool, deletes its servers and waits until they
+        are gone.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(self.lease_timeout)
+            if self._thread.is_alive():
+                LOG.warning("The server pool is still filling, its last "
+                            "servers may be left behind")
+        with self._lock:
+            entries = self.servers.values()
+        waiter = waiters.BatchWaiter(timeout=self.lease_timeout)
+        futures = []
+        for entry in entries:
+            self._delete(entry)
+            futures.append(waiter.add(self.lister, entry['id'],
+                                      waiters.DELETED))
+        waiter.wait()
+        for entry, future in zip(entries, futures):
+            if future.exception() is not None:
+                LOG.warning("Pool server %s was not deleted: %s" %
+                            (entry['id'], future.exception()))
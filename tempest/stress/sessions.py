@@ -0,0 +1,62 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from tempest.common import ssh
+
+
+class NodeSessions(object):
+    """
+    SSH clients of the target nodes
+
+    The clients keep their connection open between the commands, so the
+    log checks and samplings of the driver don't pay for a connection and
+    an authentication each time.
+    """
+
+    def __init__(self, username, key_filename, timeout=60):
+        self.username = username
+        self.key_filename = key_filename
+        self.timeout = timeout
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, node):
+        with self._lock:
+            client = self.clients.get(node)
+            if client is None:
+                client = ssh.Client(node, self.username,
+                                    key_filename=self.key_filename,
+                                    timeout=self.timeout)
+                self.clients[node] = client
+        return client
+
+    def exec_lines(self, node, command):
+        """Iterates over the output lines of a command run on the node."""
+        return self.client(node).iter_command(command, self.timeout)
+
+    def run(self, command, nodes, timeout=None, workers=ssh.FAN_OUT_WORKERS):
+        """
+        Runs a command on the nodes in parallel and returns their
+        ssh.CommandResults, in the order of the nodes.
+        """
+        return ssh.fan_out([self.client(node) for node in nodes], command,
+                           timeout or self.timeout, workers)
+
+    def close(self):
+        with self._lock:
+            clients, self.clients = self.clients, {}
+        for client in clients.values():
+            client.close()
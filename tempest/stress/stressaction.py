@@ -14,10 +14,91 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+import Queue
 import signal
 import sys
+import threading
+import time
 
+from tempest.common import resource_journal
 from tempest.openstack.common import log as logging
+from tempest.stress import metrics
+
+LOG = logging.getLogger(__name__)
+
+# seconds between the checks of a parked thread whether it is active again
+PARK_INTERVAL = 0.5
+
+# seconds the virtual users of a stopping process get to finish their run
+# before they are torn down
+STOP_TIMEOUT = 30
+
+
+def _create_recorder(manager, metrics_queue):
+    if metrics_queue is None:
+        return None
+    recorder = metrics.Recorder(metrics_queue, os.getpid(),
+                                manager.config.stress.metrics_interval)
+    recorder.install()
+    return recorder
+
+
+def execute_virtual_users(users, shared_statistic, metrics_queue=None,
+                          arrivals=None):
+    """
+    Runs several StressAction instances (virtual users) in threads of the
+    calling worker process. The users share the clients of their manager,
+    the counters and the metrics of the process, so the number of users is
+    not bound by the number of processes the load generator can run. The
+    process exits once every user is done, or when a user stops due to
+    stop_on_error. On shutdown the users finish their current run, for up
+    to STOP_TIMEOUT seconds, before they are torn down.
+    """
+    recorder = _create_recorder(users[0].manager, metrics_queue)
+    stopping = threading.Event()
+    threads = []
+
+    def _shutdown(code):
+        stopping.set()
+        deadline = time.time() + STOP_TIMEOUT
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+        running = len([thread for thread in threads if thread.is_alive()])
+        if running:
+            LOG.warn("Tearing down while %d virtual user(s) still run" %
+                     running)
+        for user in users:
+            user.tearDown()
+        if recorder is not None:
+            recorder.report(force=True)
+        sys.exit(code)
+
+    signal.signal(signal.SIGHUP, lambda signal, frame: _shutdown(0))
+    signal.signal(signal.SIGTERM, lambda signal, frame: _shutdown(0))
+    stopped = threading.Event()
+
+    def _run(user):
+        user.recorder = recorder
+        user.arrivals = arrivals
+        user.stopping = stopping
+        if not user.run_loop(shared_statistic):
+            stopped.set()
+
+    threads.extend(threading.Thread(target=_run, args=(user,))
+                   for user in users)
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        # NOTE: join with a timeout, so that signals are still handled
+        while thread.is_alive() and not stopped.is_set():
+            thread.join(1)
+    if stopped.is_set():
+        LOG.warn("Stop process due to \"stop-on-error\" argument")
+        _shutdown(1)
+    if recorder is not None:
+        recorder.report(force=True)
 
 
 class StressAction(object):
@@ -28,11 +109,35 @@ class StressAction(object):
         self.manager = manager
         self.max_runs = max_runs
         self.stop_on_error = stop_on_error
+        self.recorder = None
+        self.arrivals = None
+        self.runs = 0
+        # set when the process stops, the current run is the last one
+        self.stopping = threading.Event()
+        # set by the driver when the action follows a load profile
+        self.user_index = 0
+        self.active_users = None
 
     def _shutdown_handler(self, signal, frame):
         self.tearDown()
+        self._report_metrics(force=True)
         sys.exit(0)
 
+    def _record_run(self, scheduled, start, failed):
+        if self.recorder is not None:
+            end = time.time()
+            self.recorder.record('action:' + self.action, end - start, failed)
+            if self.arrivals is not None:
+                self.recorder.record('queue:' + self.action,
+                                     start - scheduled)
+                self.recorder.record('response:' + self.action,
+                                     end - scheduled, failed)
+            self._report_metrics()
+
+    def _report_metrics(self, force=False):
+        if self.recorder is not None:
+            self.recorder.report(force)
+
     @property
     def action(self):
         """This methods returns the action. Overload this if you
@@ -56,31 +161,78 @@ class StressAction(object):
         """
         self.logger.debug("tearDown")
 
-    def execute(self, shared_statistic):
+    def _next_run(self):
+        """Returns the scheduled start time of the next run,
+        or None when there is no more run to do. Parks
+        the thread while the load profile of the action
+        does not make it active.
+        """
+        if self.active_users is not None:
+            while self.user_index >= self.active_users.value:
+                if self.stopping.is_set():
+                    return None
+                time.sleep(PARK_INTERVAL)
+        if self.arrivals is not None:
+            while not self.stopping.is_set():
+                try:
+                    return self.arrivals.get(timeout=PARK_INTERVAL)
+                except Queue.Empty:
+                    pass
+            return None
+        if self.stopping.is_set():
+            return None
+        if self.max_runs is not None and self.runs >= self.max_runs:
+            return None
+        return time.time()
+
+    def run_loop(self, shared_statistic):
+        """Runs the action until there is no more run to do.
+        Returns False if it stopped due to stop_on_error.
+        """
+        resource_journal.set_test(self.action)
+        while True:
+            scheduled = self._next_run()
+            if scheduled is None:
+                return True
+            self.logger.debug("Trigger new run (run %d)" % self.runs)
+            start = time.time()
+            failed = False
+            try:
+                self.run()
+            except Exception:
+                failed = True
+                shared_statistic.increment('fails')
+                self.logger.exception("Failure in run")
+            self.runs += 1
+            shared_statistic.increment('runs')
+            self._record_run(scheduled, start, failed)
+            if self.stop_on_error and (shared_statistic['fails'] > 1):
+                self.logger.warn("Stop process due to"
+                                 "\"stop-on-error\" argument")
+                return False
+
+    def execute(self, shared_statistic, metrics_queue=None, arrivals=None):
         """This is the main execution entry point called
         by the driver.   We register a signal handler to
         allow us to tearDown gracefully, and then exit.
-        We also keep track of how many runs we do.
+        We also keep track of how many runs we do, and
+        if a metrics queue is given, report the latencies
+        of the runs and of the API calls through it.
+        With an arrivals queue the runs are started open
+        loop at the times the driver schedules, and the
+        time they wait for this process is recorded as
+        their queueing delay.
         """
         signal.signal(signal.SIGHUP, self._shutdown_handler)
         signal.signal(signal.SIGTERM, self._shutdown_handler)
+        self.recorder = _create_recorder(self.manager, metrics_queue)
+        self.arrivals = arrivals
 
-        while self.max_runs is None or (shared_statistic['runs'] <
-                                        self.max_runs):
-            self.logger.debug("Trigger new run (run %d)" %
-                              shared_statistic['runs'])
-            try:
-                self.run()
-            except Exception:
-                shared_statistic['fails'] += 1
-                self.logger.exception("Failure in run")
-            finally:
-                shared_statistic['runs'] += 1
-                if self.stop_on_error and (shared_statistic['fails'] > 1):
-                    self.logger.warn("Stop process due to"
-                                     "\"stop-on-error\" argument")
-                    self.tearDown()
-                    sys.exit(1)
+        if not self.run_loop(shared_statistic):
+            self.tearDown()
+            self._report_metrics(force=True)
+            sys.exit(1)
+        self._report_metrics(force=True)
 
     def run(self):
         """This method is where the stress test code runs."""
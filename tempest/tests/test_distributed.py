@@ -0,0 +1,91 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from tempest.stress import distributed
+
+
+class TestSplitTests(testtools.TestCase):
+
+    def test_threads_are_spread(self):
+        shares = distributed.split_tests([{'action': 'a', 'threads': 5}],
+                                         3, 1)
+        self.assertEqual([2, 2, 1],
+                         [share[0]['threads'] for share in shares])
+
+    def test_default_threads(self):
+        shares = distributed.split_tests([{'action': 'a'}], 2, 4)
+        self.assertEqual([2, 2], [share[0]['threads'] for share in shares])
+
+    def test_agents_without_threads_skip_the_action(self):
+        shares = distributed.split_tests([{'action': 'a', 'threads': 1}],
+                                         3, 1)
+        self.assertEqual([1, 0, 0], [len(share) for share in shares])
+
+    def test_rate_split_among_running_agents(self):
+        shares = distributed.split_tests(
+            [{'action': 'a', 'threads': 2, 'rate': 10}], 4, 1)
+        self.assertEqual([5.0, 5.0],
+                         [share[0]['rate'] for share in shares if share])
+
+    def test_profile_is_scaled(self):
+        profile = {'type': 'step', 'from': 4, 'to': 16, 'step': 4,
+                   'hold': 60}
+        shares = distributed.split_tests([{'action': 'a',
+                                           'profile': profile}], 4, 1)
+        for share in shares:
+            self.assertEqual({'type': 'step', 'from': 1, 'to': 4,
+                              'step': 1, 'hold': 60}, share[0]['profile'])
+        self.assertEqual(16, profile['to'])
+
+    def test_profile_keeps_zero(self):
+        profile = {'type': 'spike', 'base': 0, 'peak': 8, 'at': 10,
+                   'length': 5}
+        shares = distributed.split_tests([{'action': 'a', 'profile': profile,
+                                           'rate': 3}], 2, 1)
+        for share in shares:
+            self.assertEqual(0, share[0]['profile']['base'])
+            self.assertEqual(4, share[0]['profile']['peak'])
+            self.assertEqual(1.5, share[0]['rate'])
+
+    def test_profile_totals_are_kept(self):
+        profile = {'type': 'ramp', 'from': 1, 'to': 5, 'duration': 60}
+        shares = distributed.split_tests([{'action': 'a',
+                                           'profile': profile}], 4, 1)
+        self.assertEqual(5, sum(share[0]['profile']['to']
+                                for share in shares))
+        self.assertEqual(1, sum(share[0]['profile']['from']
+                                for share in shares))
+
+    def test_agents_without_profile_threads_skip_the_action(self):
+        profile = {'type': 'spike', 'base': 1, 'peak': 2, 'at': 10,
+                   'length': 5}
+        shares = distributed.split_tests([{'action': 'a',
+                                           'profile': profile}], 4, 1)
+        self.assertEqual([1, 1, 0, 0], [len(share) for share in shares])
+
+    def test_default_rate_is_split(self):
+        tests = [{'action': 'a', 'threads': 4},
+                 {'action': 'b', 'threads': 2, 'rate': 6}]
+        shares = distributed.split_tests(tests, 2, 1, rate=10)
+        self.assertEqual([[5.0, 3.0], [5.0, 3.0]],
+                         [[test['rate'] for test in share]
+                          for share in shares])
+        self.assertNotIn('rate', tests[0])
+
+    def test_no_default_rate(self):
+        shares = distributed.split_tests([{'action': 'a', 'threads': 2}],
+                                         2, 1)
+        self.assertNotIn('rate', shares[0][0])
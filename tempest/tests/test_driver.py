@@ -0,0 +1,59 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+import testtools
+
+from tempest.stress import driver
+from tempest.stress import stressaction
+
+
+class PassingAction(stressaction.StressAction):
+
+    def run(self):
+        pass
+
+
+class FailingAction(stressaction.StressAction):
+
+    def run(self):
+        raise RuntimeError("failed")
+
+
+class TestStressJobs(testtools.TestCase):
+
+    def setUp(self):
+        super(TestStressJobs, self).setUp()
+        # NOTE: no target nodes to sample or scan
+        self.addCleanup(setattr, driver, '_get_target_nodes',
+                        driver._get_target_nodes)
+        driver._get_target_nodes = lambda: (None, None)
+        cfg.CONF.set_override('metrics_interval', 1, 'stress')
+        self.addCleanup(cfg.CONF.clear_override, 'metrics_interval',
+                        'stress')
+
+    def _job(self, action):
+        tests = [{'action': '%s.%s' % (__name__, action), 'threads': 2,
+                  'use_admin': True}]
+        return driver.stress_openstack(tests, 60, max_runs=2,
+                                       cleanup_resources=False)
+
+    def test_jobs_of_one_process_are_independent(self):
+        self.assertEqual(1, self._job('FailingAction'))
+        self.assertEqual(0, self._job('PassingAction'))
+        self.assertEqual(2, len(driver.processes))
+        self.assertEqual([(2, 0), (2, 0)],
+                         [(process['statistic']['runs'],
+                           process['statistic']['fails'])
+                          for process in driver.processes])
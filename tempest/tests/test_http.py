@@ -0,0 +1,158 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import httplib
+import socket
+
+import testtools
+
+from tempest.common import http
+
+
+class FakeConnection(object):
+
+    def __init__(self, sock=None):
+        self.closed = False
+        self.sock = sock
+
+    def close(self):
+        self.closed = True
+
+
+def _connected_http():
+    http_obj = http.httplib2.Http()
+    conn = FakeConnection()
+    http_obj.connections['http:localhost'] = conn
+    return http_obj, conn
+
+
+class TestConnectionPool(testtools.TestCase):
+
+    def setUp(self):
+        super(TestConnectionPool, self).setUp()
+        self.pool = http.ConnectionPool(size=2, idle_timeout=60)
+
+    def test_idle_connection_is_reused(self):
+        http_obj, reused = self.pool.get()
+        self.assertFalse(reused)
+        self.pool.put(http_obj)
+        self.assertEqual((http_obj, True), self.pool.get())
+        self.assertFalse(self.pool.get()[1])
+
+    def test_at_most_size_idle_connections(self):
+        items = [_connected_http() for _ in range(3)]
+        for http_obj, _ in items:
+            self.pool.put(http_obj)
+        self.assertEqual([False, False, True],
+                         [conn.closed for _, conn in items])
+        self.assertEqual(2, len(self.pool._idle))
+
+    def test_expired_connections_are_closed(self):
+        http_obj, conn = _connected_http()
+        self.pool.put(http_obj)
+        self.pool.idle_timeout = -1
+        new_obj, reused = self.pool.get()
+        self.assertFalse(reused)
+        self.assertIsNot(http_obj, new_obj)
+        self.assertTrue(conn.closed)
+
+    def test_forked_process_starts_empty(self):
+        http_obj, conn = _connected_http()
+        self.pool.put(http_obj)
+        self.pool._pid = -1
+        self.assertFalse(self.pool.get()[1])
+        # NOTE: the socket still belongs to the parent
+        self.assertFalse(conn.closed)
+
+    def test_clear_closes_idle_connections(self):
+        http_obj, conn = _connected_http()
+        self.pool.put(http_obj)
+        self.pool.clear()
+        self.assertTrue(conn.closed)
+        self.assertFalse(self.pool.get()[1])
+
+    def test_one_pool_per_endpoint(self):
+        first = http.get_pool('http://Example.com:80/v2/servers', 2, 60)
+        self.assertIs(first, http.get_pool('http://example.com:80/v2', 2, 60))
+        self.assertIsNot(first, http.get_pool('https://example.com:80/v2',
+                                              2, 60))
+
+    def test_closed_idle_connection_is_not_reused(self):
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        http_obj = http.httplib2.Http()
+        conn = FakeConnection(client)
+        http_obj.connections['http:localhost'] = conn
+        self.pool.put(http_obj)
+        self.assertEqual((http_obj, True), self.pool.get())
+        self.pool.put(http_obj)
+        server.close()
+        self.assertFalse(self.pool.get()[1])
+        self.assertTrue(conn.closed)
+
+
+class FakeHttp(object):
+    """httplib2.Http failing with the queued errors, then answering."""
+
+    sent = []
+    errors = []
+
+    def __init__(self, **kwargs):
+        self.connections = {}
+
+    def request(self, uri, method='GET', body=None, headers=None):
+        self.sent.append(method)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'status': '200'}, ''
+
+
+class TestPooledHttp(testtools.TestCase):
+
+    uri = 'http://pooled.example.com/v2/servers'
+
+    def setUp(self):
+        super(TestPooledHttp, self).setUp()
+        self.patch(http.httplib2, 'Http', FakeHttp)
+        self.patch(FakeHttp, 'sent', [])
+        self.patch(FakeHttp, 'errors', [])
+        self.patch(http, '_pools', {})
+        self.client = http.PooledHttp()
+        # NOTE: a kept connection
+        http.get_pool(self.uri, 10, 60).put(FakeHttp())
+
+    def test_reset_get_is_replayed(self):
+        FakeHttp.errors.append(socket.error(104, 'Connection reset'))
+        self.assertEqual('200', self.client.request(self.uri)[0]['status'])
+        self.assertEqual(['GET', 'GET'], FakeHttp.sent)
+
+    def test_reset_post_is_not_replayed(self):
+        FakeHttp.errors.append(httplib.BadStatusLine(''))
+        self.assertRaises(httplib.BadStatusLine, self.client.request,
+                          self.uri, 'POST', body='{}')
+        self.assertEqual(['POST'], FakeHttp.sent)
+
+    def test_timed_out_request_is_not_replayed(self):
+        for method in ('POST', 'GET'):
+            FakeHttp.errors.append(socket.timeout('timed out'))
+            self.assertRaises(socket.timeout, self.client.request,
+                              self.uri, method, body='{}')
+            http.get_pool(self.uri, 10, 60).put(FakeHttp())
+        self.assertEqual(['POST', 'GET'], FakeHttp.sent)
+
+    def test_new_connection_is_not_replayed(self):
+        http.get_pool(self.uri, 10, 60).clear()
+        FakeHttp.errors.append(socket.error(104, 'Connection reset'))
+        self.assertRaises(socket.error, self.client.request, self.uri)
+        self.assertEqual(['GET'], FakeHttp.sent)
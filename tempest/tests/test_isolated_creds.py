@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import os
+import shutil
+import socket
+import tempfile
+
+import testtools
+
+from tempest.common import isolated_creds
+
+
+def _entry(name, admin=False):
+    return {'username': name, 'tenant_name': name, 'password': 'pass',
+            'user_id': name, 'tenant_id': name, 'admin': admin}
+
+
+class TestCredentialPool(testtools.TestCase):
+
+    def setUp(self):
+        super(TestCredentialPool, self).setUp()
+        directory = tempfile.mkdtemp(prefix='tempest-unit')
+        self.addCleanup(shutil.rmtree, directory)
+        self.pool = isolated_creds.CredentialPool(
+            os.path.join(directory, 'pool.json'))
+        self.pool.add([_entry('user1'), _entry('user2'),
+                       _entry('admin1', admin=True)])
+
+    def _set_lease(self, name, **lease):
+        entries = self.pool._load()
+        for entry in entries:
+            if entry['username'] == name:
+                entry['leased_by'] = lease
+        self.pool._save(entries)
+
+    def test_lease_and_release(self):
+        first = self.pool.lease('test')
+        second = self.pool.lease('test')
+        self.assertEqual(['user1', 'user2'],
+                         [first['username'], second['username']])
+        self.assertIsNone(self.pool.lease('test'))
+        self.assertEqual('admin1', self.pool.lease('test', True)['username'])
+        self.pool.release(first)
+        self.assertEqual('user1', self.pool.lease('test')['username'])
+
+    def test_leaking_entry_is_quarantined(self):
+        entry = self.pool.lease('test')
+        self.pool.release(entry, '1 server(s)')
+        self.assertEqual('user2', self.pool.lease('test')['username'])
+        self.assertIsNone(self.pool.lease('test'))
+
+    def test_lease_of_dead_process_is_taken_over(self):
+        self._set_lease('user1', pid=self._dead_pid(),
+                        host=socket.gethostname())
+        self.assertEqual('user1', self.pool.lease('test')['username'])
+
+    def test_lease_of_other_user_process_is_kept(self):
+        self._set_lease('user1', pid=1, host=socket.gethostname())
+        kill = os.kill
+
+        def fake_kill(pid, signal):
+            raise OSError(errno.EPERM, 'Operation not permitted')
+
+        os.kill = fake_kill
+        try:
+            self.assertEqual('user2', self.pool.lease('test')['username'])
+        finally:
+            os.kill = kill
+
+    def test_lease_of_other_host_is_kept(self):
+        self._set_lease('user1', pid=self._dead_pid(), host='elsewhere')
+        self.assertEqual('user2', self.pool.lease('test')['username'])
+
+    @staticmethod
+    def _dead_pid():
+        pid = os.fork()
+        if not pid:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        return pid
@@ -0,0 +1,117 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from tempest.stress import metrics
+
+
+class TestBuckets(testtools.TestCase):
+
+    def test_small_values_are_exact(self):
+        for value in xrange(metrics.SUB_BUCKETS):
+            index = metrics._bucket_index(value)
+            self.assertEqual((value, value), metrics._bucket_range(index))
+
+    def test_ranges_contain_their_values(self):
+        for value in range(0, 5000, 7) + [10 ** 6, 10 ** 9, 2 ** 40 - 1]:
+            low, high = metrics._bucket_range(metrics._bucket_index(value))
+            self.assertTrue(low <= value <= high, (value, low, high))
+
+    def test_ranges_are_contiguous(self):
+        previous = metrics._bucket_range(0)[1]
+        for index in xrange(1, 20 * metrics.SUB_BUCKETS):
+            low, high = metrics._bucket_range(index)
+            self.assertEqual(previous + 1, low)
+            previous = high
+
+    def test_relative_error(self):
+        for value in (100, 12345, 10 ** 6, 987654321):
+            low, high = metrics._bucket_range(metrics._bucket_index(value))
+            self.assertTrue(float(high - low) / low <
+                            1.0 / metrics.SUB_BUCKETS)
+
+
+class TestHistogram(testtools.TestCase):
+
+    def assertSameHistogram(self, expected, observed):
+        expected, observed = expected.to_dict(), observed.to_dict()
+        expected['buckets'] = dict(expected['buckets'])
+        observed['buckets'] = dict(observed['buckets'])
+        self.assertEqual(expected, observed)
+
+    def _histogram(self, values):
+        histogram = metrics.Histogram()
+        for value in values:
+            histogram.record(value)
+        return histogram
+
+    def test_empty(self):
+        histogram = metrics.Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        self.assertEqual({'count': 0, 'errors': 0, 'error_rate': 0.0,
+                          'ops_per_sec': 0.0},
+                         histogram.summary(10))
+
+    def test_percentiles(self):
+        histogram = self._histogram([i / 1000.0 for i in xrange(1, 1001)])
+        for percent, expected in ((50, 0.5), (95, 0.95), (99, 0.99)):
+            value = histogram.percentile(percent)
+            self.assertTrue(abs(value - expected) <
+                            expected / metrics.SUB_BUCKETS, (percent, value))
+        self.assertEqual(1.0, histogram.percentile(100))
+
+    def test_percentile_clamped_to_min_and_max(self):
+        histogram = self._histogram([0.123456])
+        self.assertEqual(0.123456, histogram.percentile(50))
+        self.assertEqual(0.123456, histogram.percentile(99))
+
+    def test_summary(self):
+        histogram = self._histogram([0.1, 0.2, 0.3])
+        histogram.record(0.4, failed=True)
+        summary = histogram.summary(2)
+        self.assertEqual(4, summary['count'])
+        self.assertEqual(1, summary['errors'])
+        self.assertEqual(0.25, summary['error_rate'])
+        self.assertEqual(2.0, summary['ops_per_sec'])
+        self.assertEqual(0.1, summary['min'])
+        self.assertEqual(0.4, summary['max'])
+        self.assertAlmostEqual(0.25, summary['mean'])
+
+    def test_merge_equals_recording_everything(self):
+        first = self._histogram([0.001, 0.5, 2.0])
+        second = self._histogram([0.0001, 0.7])
+        first.merge(second)
+        whole = self._histogram([0.001, 0.5, 2.0, 0.0001, 0.7])
+        self.assertSameHistogram(whole, first)
+
+    def test_merge_empty(self):
+        histogram = self._histogram([0.5])
+        histogram.merge(metrics.Histogram())
+        self.assertSameHistogram(self._histogram([0.5]), histogram)
+
+    def test_dict_round_trip(self):
+        histogram = self._histogram([0.01, 0.02, 3.0])
+        copy = metrics.Histogram.from_dict(histogram.to_dict())
+        self.assertEqual(histogram.summary(), copy.summary())
+
+
+class TestApiCallKey(testtools.TestCase):
+
+    def test_ids_are_masked(self):
+        url = 'servers/0f4bb3c6-4d05-4a2f-9c2e-7fb7b0b1f3c2/action?x=1'
+        self.assertEqual('api:compute POST servers/{id}/action',
+                         metrics.api_call_key('compute', 'POST', url))
+        self.assertEqual('api:compute GET flavors/{id}',
+                         metrics.api_call_key('compute', 'GET', 'flavors/42'))
@@ -0,0 +1,83 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import testtools
+
+from tempest.common.utils import misc
+
+
+class TestParallelMap(testtools.TestCase):
+
+    def test_results_in_item_order(self):
+        def func(item):
+            time.sleep(0.001 * (10 - item))
+            return item * 2
+        self.assertEqual([item * 2 for item in range(10)],
+                         misc.parallel_map(func, range(10), 4))
+
+    def test_no_items(self):
+        self.assertEqual([], misc.parallel_map(lambda item: item, [], 4))
+
+    def test_workers_bound_concurrency(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def func(item):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        misc.parallel_map(func, range(20), 3)
+        self.assertTrue(1 < peak[0] <= 3, peak[0])
+
+    def test_error_raised_after_all_items(self):
+        done = []
+
+        def func(item):
+            if item == 0:
+                raise ValueError(item)
+            done.append(item)
+
+        self.assertRaises(ValueError, misc.parallel_map, func, range(10), 2)
+        self.assertEqual(range(1, 10), sorted(done))
+
+    def test_backlog_pulls_items_lazily(self):
+        pulled = []
+        release = threading.Event()
+
+        def items():
+            for item in range(100):
+                pulled.append(item)
+                yield item
+
+        def func(item):
+            release.wait(10)
+            return item
+
+        thread = threading.Thread(target=misc.parallel_map,
+                                  args=(func, items(), 2, 3))
+        thread.start()
+        time.sleep(0.1)
+        # NOTE: 2 items in the workers, 3 in the queue, 1 waiting for room
+        self.assertTrue(len(pulled) <= 6, len(pulled))
+        release.set()
+        thread.join(10)
+        self.assertEqual(100, len(pulled))
@@ -0,0 +1,203 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import cStringIO
+import hashlib
+import json
+import threading
+import urlparse
+
+import testtools
+
+from tempest import exceptions
+from tempest.services.object_storage import object_client
+
+DATA = 'abcdefghij'
+
+
+class FakeSwiftClient(object_client.ObjectClient):
+    """ObjectClient storing the objects of a fake Swift in memory."""
+
+    # NOTE: listings are paged, like Swift does with 10000 names
+    page_size = 2
+
+    def __init__(self):
+        self.headers = {}
+        self.objects = {}
+        self.fail_puts = set()
+        self.gets = []
+        self._lock = threading.Lock()
+
+    def _object_data(self, path):
+        entry = self.objects[path]
+        if 'x-object-manifest' in entry['headers']:
+            container, prefix = entry['headers']['x-object-manifest'].split(
+                '/', 1)
+            names = sorted(name for name in self.objects
+                           if name.startswith('%s/%s' % (container, prefix)))
+            return ''.join(self.objects[name]['data'] for name in names)
+        if 'manifest' in entry:
+            return ''.join(self.objects[segment['path'][1:]]['data']
+                           for segment in entry['manifest'])
+        return entry['data']
+
+    def _etag(self, path):
+        entry = self.objects[path]
+        if 'x-object-manifest' in entry['headers'] or 'manifest' in entry:
+            hashes = [segment['hash'] for segment in
+                      self._listing(path)]
+            return hashlib.md5(''.join(hashes)).hexdigest()
+        return entry['hash']
+
+    def _listing(self, path):
+        entry = self.objects[path]
+        if 'manifest' in entry:
+            return [{'name': segment['path'], 'hash': segment['etag'],
+                     'bytes': segment['size_bytes']}
+                    for segment in entry['manifest']]
+        container, prefix = entry['headers']['x-object-manifest'].split(
+            '/', 1)
+        return [{'name': name.split('/', 1)[1],
+                 'hash': self.objects[name]['hash'],
+                 'bytes': len(self.objects[name]['data'])}
+                for name in sorted(self.objects)
+                if name.startswith('%s/%s' % (container, prefix))]
+
+    def put(self, url, body, headers):
+        path, _, query = url.partition('?')
+        if path in self.fail_puts:
+            raise exceptions.ComputeFault("failed to store %s" % path)
+        body = body or ''
+        md5 = hashlib.md5(body).hexdigest()
+        if 'Etag' in headers and headers['Etag'] != md5:
+            raise exceptions.BadRequest("ETag mismatch")
+        entry = {'data': body, 'hash': md5, 'headers': dict(
+            (key.lower(), value) for key, value in headers.items())}
+        if query == 'multipart-manifest=put':
+            entry['manifest'] = json.loads(body)
+        with self._lock:
+            self.objects[path] = entry
+        return {'status': '201'}, ''
+
+    def head(self, url):
+        entry = self.objects[url]
+        resp = {'etag': '"%s"' % self._etag(url),
+                'content-length': str(len(self._object_data(url)))}
+        if 'x-object-manifest' in entry['headers']:
+            resp['x-object-manifest'] = entry['headers']['x-object-manifest']
+        if 'manifest' in entry:
+            resp['x-static-large-object'] = 'True'
+        return resp, ''
+
+    def get(self, url, headers=None):
+        path, _, query = url.partition('?')
+        params = dict(urlparse.parse_qsl(query))
+        with self._lock:
+            self.gets.append(url)
+        if params.get('multipart-manifest') == 'get':
+            return {}, json.dumps(self._listing(path))
+        if params.get('format') == 'json':
+            prefix = '%s/%s' % (path, params.get('prefix', ''))
+            names = sorted(name.split('/', 1)[1] for name in self.objects
+                           if name.startswith(prefix))
+            page = [name for name in names
+                    if name > params.get('marker', '')][:self.page_size]
+            return {}, json.dumps([{'name': name,
+                                    'hash': self.objects[
+                                        path + '/' + name]['hash'],
+                                    'bytes': len(self.objects[
+                                        path + '/' + name]['data'])}
+                                   for name in page])
+        data = self._object_data(path)
+        if headers and 'Range' in headers:
+            start, end = headers['Range'][len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        return {}, data
+
+
+class TestLargeObjects(testtools.TestCase):
+
+    def setUp(self):
+        super(TestLargeObjects, self).setUp()
+        self.client = FakeSwiftClient()
+
+    def _download(self, object_name, range_size=3):
+        out = cStringIO.StringIO()
+        size = self.client.get_large_object('c', object_name, out,
+                                            range_size, concurrency=3)
+        self.assertEqual(len(out.getvalue()), size)
+        return out.getvalue()
+
+    def _segment_sizes(self, segments):
+        return [segment['size_bytes'] for segment in segments]
+
+    def test_string_dynamic_large_object(self):
+        _, segments = self.client.create_large_object('c', 'o', DATA, 4)
+        self.assertEqual([4, 4, 2], self._segment_sizes(segments))
+        self.assertEqual('/c/o/00000001', segments[1]['path'])
+        self.assertEqual('c/o/', self.client.objects['c/o']['headers'][
+            'x-object-manifest'])
+        self.assertEqual(DATA, self._download('o'))
+
+    def test_stream_input(self):
+        self.client.create_large_object('c', 'file', cStringIO.StringIO(DATA),
+                                        4)
+        chunks = iter(['abc', 'defg', 'h', 'ij'])
+        _, segments = self.client.create_large_object('c', 'iter', chunks, 4)
+        self.assertEqual([4, 4, 2], self._segment_sizes(segments))
+        self.assertEqual(DATA, self._download('file'))
+        self.assertEqual(DATA, self._download('iter'))
+
+    def test_segment_container(self):
+        self.client.create_large_object('c', 'o', DATA, 3,
+                                        segment_container='segments')
+        self.assertIn('segments/o/00000003', self.client.objects)
+        self.assertEqual(DATA, self._download('o'))
+
+    def test_static_large_object(self):
+        _, segments = self.client.create_large_object('c', 'o', DATA, 4,
+                                                      static=True)
+        self.assertEqual(segments, self.client.objects['c/o']['manifest'])
+        self.assertEqual(DATA, self._download('o'))
+        self.assertIn('c/o?multipart-manifest=get', self.client.gets)
+
+    def test_segment_upload_failure(self):
+        self.client.fail_puts.add('c/o/00000001')
+        self.assertRaises(exceptions.ComputeFault,
+                          self.client.create_large_object, 'c', 'o', DATA, 4)
+        self.assertNotIn('c/o', self.client.objects)
+
+    def test_plain_object_ranges(self):
+        self.client.put('c/plain', DATA, {})
+        self.assertEqual(DATA, self._download('plain', range_size=3))
+        ranged = [url for url in self.client.gets if url == 'c/plain']
+        self.assertEqual(4, len(ranged))
+
+    def test_corrupt_segment(self):
+        self.client.create_large_object('c', 'o', DATA, 4)
+        self.client.objects['c/o/00000001']['data'] = 'XXXX'
+        self.assertRaises(exceptions.ObjectChecksumMismatch, self._download,
+                          'o')
+
+    def test_corrupt_plain_object(self):
+        self.client.put('c/plain', DATA, {})
+        self.client.objects['c/plain']['data'] = DATA.upper()
+        self.assertRaises(exceptions.ObjectChecksumMismatch, self._download,
+                          'plain')
+
+    def test_listing_mismatching_manifest_etag(self):
+        self.client.create_large_object('c', 'o', DATA, 4)
+        self.client._etag = lambda path: 'other'
+        self.assertRaises(exceptions.ObjectChecksumMismatch, self._download,
+                          'o')
@@ -0,0 +1,108 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import struct
+
+import testtools
+
+from tempest.common import prober
+
+
+class FakeIcmpSocket(object):
+    """Datagram ICMP socket of a kernel, answering for some addresses."""
+
+    def __init__(self, answering):
+        self.answering = answering
+        self.sent = []
+        self._sock, self._peer = socket.socketpair(socket.AF_UNIX,
+                                                   socket.SOCK_DGRAM)
+        self._sock.setblocking(0)
+        self._addresses = []
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+        if addr[0] in self.answering:
+            _, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            self._addresses.append(addr)
+            self._peer.send(struct.pack('!BBHHH', prober.ICMP_ECHO_REPLY, 0,
+                                        0, ident, seq) + data[8:])
+
+    def recvfrom(self, size):
+        data = self._sock.recv(size)
+        return data, self._addresses.pop(0)
+
+    def close(self):
+        self._sock.close()
+        self._peer.close()
+
+
+class FakeIcmpProber(prober.Prober):
+
+    def __init__(self, answering, *args, **kwargs):
+        super(FakeIcmpProber, self).__init__(*args, **kwargs)
+        self.icmp_sock = FakeIcmpSocket(answering)
+
+    def _icmp_socket(self):
+        return self.icmp_sock, False
+
+
+class TestChecksum(testtools.TestCase):
+
+    def test_rfc1071_example(self):
+        data = '\x00\x01\xf2\x03\xf4\xf5\xf6\xf7'
+        self.assertEqual(0x220d, prober._checksum(data))
+
+    def test_odd_length_is_padded(self):
+        self.assertEqual(prober._checksum('abc\0'), prober._checksum('abc'))
+
+    def test_echo_request_verifies(self):
+        request = prober._echo_request(0x1234, 7)
+        self.assertEqual(0, prober._checksum(request))
+        self.assertEqual((prober.ICMP_ECHO_REQUEST, 0, 0x1234, 7),
+                         struct.unpack('!BBxxHH', request[:8]))
+
+
+class TestProbe(testtools.TestCase):
+
+    def test_tcp_listener(self):
+        listener = socket.socket()
+        self.addCleanup(listener.close)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        target = ('127.0.0.1', listener.getsockname()[1])
+        results = prober.probe([target], 5)
+        self.assertIsNotNone(results[target])
+        self.assertTrue(results[target] < 5)
+
+    def test_icmp_echo(self):
+        probe = FakeIcmpProber(['192.0.2.1'], 5)
+        target = ('192.0.2.1', prober.ICMP)
+        results = probe.probe([target])
+        self.assertIsNotNone(results[target])
+        self.assertEqual(1, len(probe.icmp_sock.sent))
+
+    def test_icmp_unreachable_is_retried(self):
+        probe = FakeIcmpProber(['192.0.2.1'], 1, interval=0.1,
+                               max_interval=0.1, attempt_timeout=0.1)
+        targets = [('192.0.2.1', prober.ICMP), ('192.0.2.2', prober.ICMP)]
+        results = probe.probe(targets)
+        self.assertIsNotNone(results[targets[0]])
+        self.assertIsNone(results[targets[1]])
+        unanswered = [addr for _, addr in probe.icmp_sock.sent
+                      if addr[0] == '192.0.2.2']
+        self.assertTrue(len(unanswered) > 2)
@@ -0,0 +1,64 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from tempest.stress import profiles
+
+
+class TestProfiles(testtools.TestCase):
+
+    def test_ramp(self):
+        profile = {'type': 'ramp', 'from': 1, 'to': 3, 'duration': 10}
+        self.assertEqual([(0, 1), (5, 2), (10, 3)],
+                         profiles.changes(profile))
+
+    def test_ramp_down(self):
+        profile = {'type': 'ramp', 'from': 3, 'to': 1, 'duration': 10}
+        self.assertEqual([(0, 3), (5, 2), (10, 1)],
+                         profiles.changes(profile))
+
+    def test_flat_ramp(self):
+        profile = {'type': 'ramp', 'from': 4, 'to': 4, 'duration': 10}
+        self.assertEqual([(0, 4)], profiles.changes(profile))
+
+    def test_step(self):
+        profile = {'type': 'step', 'from': 2, 'to': 6, 'step': 2, 'hold': 60}
+        self.assertEqual([(0, 2), (60, 4), (120, 6)],
+                         profiles.changes(profile))
+
+    def test_step_ends_at_to(self):
+        profile = {'type': 'step', 'from': 1, 'to': 6, 'step': 2, 'hold': 10}
+        self.assertEqual([(0, 1), (10, 3), (20, 5), (30, 6)],
+                         profiles.changes(profile))
+
+    def test_step_down(self):
+        profile = {'type': 'step', 'from': 6, 'to': 1, 'step': 2, 'hold': 10}
+        self.assertEqual([(0, 6), (10, 4), (20, 2), (30, 1)],
+                         profiles.changes(profile))
+        self.assertEqual(6, profiles.max_threads(profile))
+
+    def test_step_must_be_positive(self):
+        profile = {'type': 'step', 'from': 1, 'to': 6, 'step': 0, 'hold': 10}
+        self.assertRaises(ValueError, profiles.changes, profile)
+
+    def test_spike(self):
+        profile = {'type': 'spike', 'base': 2, 'peak': 20, 'at': 60,
+                   'length': 30}
+        self.assertEqual([(0, 2), (60, 20), (90, 2)],
+                         profiles.changes(profile))
+        self.assertEqual(20, profiles.max_threads(profile))
+
+    def test_unknown_type(self):
+        self.assertRaises(ValueError, profiles.changes, {'type': 'sine'})
@@ -0,0 +1,108 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import re
+
+import testtools
+
+from tempest.common.utils.linux import remote_client
+from tempest import exceptions
+
+PARTITIONS = """major minor  #blocks  name
+
+ 253        0   20971520 vda
+ 253        1   20970496 vda1
+"""
+
+
+class FakeSSHClient(object):
+    """Answers the fact scripts like a shell, from canned outputs."""
+
+    def __init__(self, outputs, statuses=None):
+        self.outputs = outputs
+        self.statuses = statuses or {}
+        self.scripts = []
+
+    def exec_command(self, script):
+        self.scripts.append(script)
+        output = ''
+        marker = remote_client.FACT_MARKER
+        for name in re.findall("echo '%s (\w+)'" % marker, script):
+            output += '%s %s\n%s\n%s %d\n' % (
+                marker, name, self.outputs[name], marker,
+                self.statuses.get(name, 0))
+        return output
+
+
+class FakeRemoteClient(remote_client.RemoteClient):
+
+    def __init__(self, ssh_client, facts_key):
+        self.ssh_client = ssh_client
+        self.facts_key = facts_key
+
+
+class TestGuestFacts(testtools.TestCase):
+
+    def setUp(self):
+        super(TestGuestFacts, self).setUp()
+        self.ssh_client = FakeSSHClient({
+            'hostname': 'guest-1\n',
+            'ram_mb': 'Mem:          2001       1500        501\n',
+            'vcpus': '4\n',
+            'partitions': PARTITIONS,
+            # NOTE: an output without a line end
+            'uptime': '1234.56',
+            'boot_time': '2013-10-01 12:30:00\n'})
+        self.client = FakeRemoteClient(self.ssh_client, 'server-1')
+        self.addCleanup(remote_client.invalidate_facts, 'server-1')
+
+    def test_all_facts_in_one_command(self):
+        facts = self.client.get_facts()
+        self.assertEqual(1, len(self.ssh_client.scripts))
+        self.assertEqual('guest-1', facts.hostname)
+        self.assertEqual(2001, facts.ram_mb)
+        self.assertEqual(4, facts.vcpus)
+        self.assertEqual(['vda', 'vda1'], facts.partitions)
+        self.assertEqual(1234.56, facts.uptime)
+        self.assertEqual(2013, facts.boot_time.tm_year)
+        self.assertEqual(PARTITIONS, facts.raw['partitions'])
+        self.assertEqual('1234.56', facts.raw['uptime'])
+
+    def test_facts_are_cached(self):
+        self.client.get_facts(['hostname'])
+        facts = self.client.get_facts(['hostname', 'vcpus'])
+        self.assertEqual(2, len(self.ssh_client.scripts))
+        self.assertNotIn('hostname', self.ssh_client.scripts[1])
+        self.assertEqual(('guest-1', 4), (facts.hostname, facts.vcpus))
+        other = FakeRemoteClient(self.ssh_client, 'server-1')
+        other.get_facts(['hostname', 'vcpus'])
+        self.assertEqual(2, len(self.ssh_client.scripts))
+
+    def test_refresh_and_invalidate(self):
+        self.client.get_facts(['vcpus'])
+        self.ssh_client.outputs['vcpus'] = '8\n'
+        self.assertEqual(4, self.client.get_facts(['vcpus']).vcpus)
+        self.assertEqual(8, self.client.get_number_of_vcpus())
+        self.ssh_client.outputs['vcpus'] = '2\n'
+        remote_client.invalidate_facts({'id': 'server-1'}, ['vcpus'])
+        self.assertEqual(2, self.client.get_facts(['vcpus']).vcpus)
+        self.ssh_client.outputs['vcpus'] = '1\n'
+        remote_client.invalidate_facts('server-1')
+        self.assertEqual(1, self.client.get_facts(['vcpus']).vcpus)
+
+    def test_failed_fact(self):
+        self.ssh_client.statuses['vcpus'] = 127
+        exc = self.assertRaises(exceptions.SSHExecCommandFailed,
+                                self.client.get_facts, ['hostname', 'vcpus'])
+        self.assertIn('127', str(exc))
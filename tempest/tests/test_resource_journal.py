@@ -0,0 +1,80 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from tempest.common import resource_journal
+
+
+class TestResourceJournal(testtools.TestCase):
+
+    def setUp(self):
+        super(TestResourceJournal, self).setUp()
+        directory = tempfile.mkdtemp(prefix='tempest-unit')
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'journal')
+        self.journal = resource_journal.ResourceJournal(self.path)
+        self.addCleanup(self.journal.close)
+        self.created = 0
+
+    def _create(self, journal, kind, resource_id):
+        self.created += 1
+        journal._write({'op': 'create', 'kind': kind, 'id': resource_id,
+                        'time': self.created})
+
+    def _pending(self):
+        return [(record['kind'], record['id'])
+                for record in self.journal.pending()]
+
+    def test_pending(self):
+        self._create(self.journal, 'server', 'a')
+        self._create(self.journal, 'volume', 'b')
+        self.journal.deleted('server', 'a')
+        self.assertEqual([('volume', 'b')], self._pending())
+
+    def test_partial_record_is_skipped(self):
+        with open(self.path, 'w') as journal:
+            journal.write('{"op": "create", "kind"')
+        self._create(self.journal, 'server', 'a')
+        self.assertEqual([('server', 'a')], self._pending())
+
+    def test_compact(self):
+        self._create(self.journal, 'server', 'a')
+        self._create(self.journal, 'server', 'b')
+        self.journal.deleted('server', 'a')
+        self.journal.compact()
+        with open(self.path) as journal:
+            self.assertEqual(1, len(journal.readlines()))
+        self.assertEqual([('server', 'b')], self._pending())
+
+    def test_write_after_compaction_removed_the_file(self):
+        self._create(self.journal, 'server', 'a')
+        self.journal.deleted('server', 'a')
+        resource_journal.ResourceJournal(self.path).compact()
+        self.assertFalse(os.path.exists(self.path))
+        self._create(self.journal, 'server', 'b')
+        self.assertEqual([('server', 'b')], self._pending())
+
+    def test_write_after_compaction_replaced_the_file(self):
+        self._create(self.journal, 'server', 'a')
+        self._create(self.journal, 'server', 'b')
+        self.journal.deleted('server', 'a')
+        resource_journal.ResourceJournal(self.path).compact()
+        self._create(self.journal, 'server', 'c')
+        self.assertEqual([('server', 'b'), ('server', 'c')],
+                         self._pending())
@@ -0,0 +1,71 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import httplib2
+import testtools
+
+from tempest.common import rest_client
+from tempest import config
+from tempest import exceptions
+
+
+class TestSharedTokenReplay(testtools.TestCase):
+
+    def setUp(self):
+        super(TestSharedTokenReplay, self).setUp()
+        conf = config.TempestConfig()
+        if not conf.identity.token_cache:
+            self.skipTest('The token cache is disabled')
+        self.client = rest_client.RestClient(conf, 'user', 'password',
+                                             'http://localhost:5000/v2.0')
+        self.client.token = 'shared'
+        self.client.base_url = 'http://localhost:8774/v2'
+        self.sent = []
+        self.statuses = []
+        self.client._request = self._request
+        self.invalidated = False
+        self.client._refresh_token = self._refresh_token
+        self.client._invalidate_token = self._invalidate_token
+
+    def _request(self, method, url, headers=None, body=None, stream=False):
+        self.sent.append(headers['X-Auth-Token'])
+        return (httplib2.Response({'status': self.statuses.pop(0),
+                                   'content-type': 'application/json'}),
+                '{}')
+
+    def _invalidate_token(self, token=None):
+        self.invalidated = True
+
+    def _refresh_token(self):
+        if self.invalidated:
+            self.client.token = 'fresh'
+
+    def test_revoked_shared_token_is_replaced(self):
+        self.statuses = ['401', '200']
+        resp, _ = self.client.get('servers')
+        self.assertEqual(200, resp.status)
+        self.assertEqual(['shared', 'fresh'], self.sent)
+
+    def test_second_unauthorized_is_raised(self):
+        self.statuses = ['401', '401']
+        self.assertRaises(exceptions.Unauthorized, self.client.get,
+                          'servers')
+        self.assertEqual(2, len(self.sent))
+
+    def test_own_revoked_token_is_not_replaced(self):
+        self.client.token_revoked('shared')
+        self.statuses = ['401']
+        self.assertRaises(exceptions.Unauthorized, self.client.get,
+                          'servers')
+        self.assertEqual(['shared'], self.sent)
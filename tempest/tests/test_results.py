@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from tempest.stress import results
+
+
+class TestMannWhitney(testtools.TestCase):
+
+    def test_separated_samples(self):
+        p_value = results.mann_whitney([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+        self.assertAlmostEqual(0.0122, p_value, places=4)
+
+    def test_symmetric(self):
+        xs, ys = [1.0, 2.5, 3.1, 7.2], [2.0, 4.4, 6.3, 8.1, 9.9]
+        self.assertAlmostEqual(results.mann_whitney(xs, ys),
+                               results.mann_whitney(ys, xs))
+
+    def test_same_samples(self):
+        self.assertAlmostEqual(1.0,
+                               results.mann_whitney([1, 2, 3], [1, 2, 3]))
+
+    def test_all_tied(self):
+        self.assertEqual(1.0, results.mann_whitney([4, 4, 4], [4, 4]))
+
+
+class TestMedian(testtools.TestCase):
+
+    def test_median(self):
+        self.assertEqual(2, results._median([3, 1, 2]))
+        self.assertEqual(2.5, results._median([4, 1, 3, 2]))
+
+
+class TestCompare(testtools.TestCase):
+
+    def setUp(self):
+        super(TestCompare, self).setUp()
+        self.store = results.ResultsStore(':memory:')
+        self.addCleanup(self.store.close)
+
+    def _record(self, throughputs, latency):
+        windows = []
+        for index, ops in enumerate(throughputs):
+            stats = {'count': int(ops * 10), 'errors': 0, 'error_rate': 0.0,
+                     'ops_per_sec': ops, 'p50': latency, 'p95': latency * 2}
+            windows.append({'start': index * 10, 'end': (index + 1) * 10,
+                            'stats': {'boot': stats}})
+        report = {'duration': len(windows) * 10, 'windows': windows,
+                  'totals': {}}
+        return self.store.record_run([{'action': 'boot'}], report, 0)
+
+    def test_regression(self):
+        baseline = self._record([10, 11, 12, 10, 11], 1.0)
+        candidate = self._record([5, 6, 5, 6, 5], 1.0)
+        findings = dict((finding['stat'], finding) for finding in
+                        results.compare(self.store, baseline, candidate))
+        self.assertTrue(findings['ops_per_sec']['regression'])
+        self.assertEqual(11, findings['ops_per_sec']['baseline'])
+        self.assertEqual(5, findings['ops_per_sec']['candidate'])
+        self.assertFalse(findings['p50']['regression'])
+
+    def test_improvement_is_no_regression(self):
+        baseline = self._record([5, 6, 5, 6, 5], 2.0)
+        candidate = self._record([10, 11, 12, 10, 11], 1.0)
+        findings = results.compare(self.store, baseline, candidate)
+        self.assertEqual(3, len(findings))
+        self.assertFalse(any(finding['regression'] for finding in findings))
+
+    def test_too_few_samples(self):
+        baseline = self._record([10, 11], 1.0)
+        candidate = self._record([5, 6], 1.0)
+        self.assertEqual([], results.compare(self.store, baseline,
+                                             candidate))
@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+import threading
+
+import testtools
+
+from tempest import exceptions
+from tempest.stress import server_pool
+
+
+class FakeServersClient(object):
+    """Servers which are ACTIVE as soon as they are created."""
+
+    def __init__(self):
+        self.servers = {}
+        self.created = 0
+        self.deleted = []
+        self.boot_gate = None
+        self.booting = threading.Event()
+        self._ids = itertools.count()
+
+    def create_server(self, name, image, flavor, **kwargs):
+        self.booting.set()
+        if self.boot_gate is not None:
+            self.boot_gate.wait(10)
+        server = {'id': 'server-%d' % next(self._ids), 'name': name,
+                  'status': 'ACTIVE', 'OS-EXT-STS:task_state': None}
+        self.servers[server['id']] = server
+        self.created += 1
+        return None, server
+
+    def delete_server(self, server_id):
+        if self.servers.pop(server_id, None) is None:
+            raise exceptions.NotFound(server_id)
+        self.deleted.append(server_id)
+        return None, None
+
+    def rebuild(self, server_id, image):
+        return None, self.servers[server_id]
+
+    def list_servers_with_detail(self, params=None):
+        return None, {'servers': self.servers.values()}
+
+    def get_server(self, server_id):
+        if server_id not in self.servers:
+            raise exceptions.NotFound(server_id)
+        return None, self.servers[server_id]
+
+
+class FakeManager(object):
+
+    class config(object):
+        class compute(object):
+            build_timeout = 10
+
+    def __init__(self):
+        self.servers_client = FakeServersClient()
+
+
+class TestServerPool(testtools.TestCase):
+
+    def setUp(self):
+        super(TestServerPool, self).setUp()
+        self.manager = FakeManager()
+        self.client = self.manager.servers_client
+
+    def _pool(self, **kwargs):
+        pool = server_pool.ServerPool(self.manager, 'image', 'flavor',
+                                      **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_lease_and_close(self):
+        pool = self._pool(size=2)
+        first, second = pool.lease(), pool.lease()
+        self.assertNotEqual(first['id'], second['id'])
+        pool.release(first)
+        pool.release(second)
+        pool.close()
+        self.assertEqual({}, self.client.servers)
+        self.assertEqual(2, len(self.client.deleted))
+
+    def test_broken_server_is_replaced(self):
+        pool = self._pool(size=1)
+        entry = pool.lease()
+        pool.release(entry, healthy=False)
+        self.assertNotEqual(entry['id'], pool.lease()['id'])
+        self.assertEqual([entry['id']], self.client.deleted)
+
+    def test_worn_server_is_rebuilt(self):
+        pool = self._pool(size=1, max_uses=2)
+        entry = pool.lease()
+        pool.release(entry)
+        self.assertEqual(2, pool.lease()['uses'])
+        pool.release(entry)
+        self.assertEqual(1, pool.lease()['uses'])
+        self.assertEqual(1, self.client.created)
+
+    def test_close_deletes_server_booted_while_closing(self):
+        self.client.boot_gate = threading.Event()
+        pool = self._pool(size=1)
+        pool.start()
+        self.client.booting.wait(10)
+        closer = threading.Thread(target=pool.close)
+        closer.start()
+        self.client.boot_gate.set()
+        closer.join(10)
+        self.assertFalse(closer.is_alive())
+        self.assertEqual(1, self.client.created)
+        self.assertEqual({}, self.client.servers)
+        self.assertTrue(pool.ready.empty())
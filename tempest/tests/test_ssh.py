@@ -0,0 +1,127 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import threading
+import time
+
+import paramiko
+import testtools
+
+from tempest.common import ssh
+
+
+class SilentTransport(object):
+    """Transport of a host which stopped answering without a reset."""
+
+    def __init__(self):
+        self.timeouts = []
+        self._closed = threading.Event()
+
+    def is_active(self):
+        return not self._closed.is_set()
+
+    def set_keepalive(self, interval):
+        pass
+
+    def open_session(self, timeout=None):
+        self.timeouts.append(timeout)
+        # NOTE: paramiko waits for an hour without a timeout
+        self._closed.wait(3600 if timeout is None else timeout)
+        raise paramiko.SSHException('Timeout opening channel.')
+
+
+class BrokenTransport(SilentTransport):
+    """Transport whose connection was reset."""
+
+    def open_session(self, timeout=None):
+        raise EOFError()
+
+
+class FakeSSHClient(object):
+
+    def __init__(self):
+        self.transport = SilentTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.transport._closed.set()
+
+
+class SilentHostClient(ssh.Client):
+    """Client which keeps connecting to a silent host."""
+
+    def _get_ssh_connection(self, sleep=1.5, backoff=1.01, timeout=None):
+        self.connections = getattr(self, 'connections', 0) + 1
+        self.last_connection = FakeSSHClient()
+        return self.last_connection
+
+
+class TestSilentHost(testtools.TestCase):
+
+    def setUp(self):
+        super(TestSilentHost, self).setUp()
+        self.addCleanup(ssh.close_all)
+
+    def _client(self, host='silent'):
+        client = SilentHostClient(host, 'user', password='pass', timeout=60)
+        # NOTE: a connection kept from before the host went silent
+        dead = FakeSSHClient()
+        ssh._connections[client._key] = (os.getpid(), dead)
+        return client, dead
+
+    def test_open_session_times_out(self):
+        client, dead = self._client()
+        start = time.time()
+        self.assertRaises(paramiko.SSHException, client.open_session, 0.5)
+        self.assertTrue(time.time() - start < 5)
+        self.assertTrue(0 < dead.transport.timeouts[0] <= 0.5)
+        self.assertNotIn(client._key, ssh._connections)
+
+    def test_run_returns_within_timeout(self):
+        client, dead = self._client()
+        start = time.time()
+        result = client.run('true', timeout=0.5)
+        self.assertTrue(time.time() - start < 5)
+        self.assertFalse(result.succeeded)
+        self.assertIsNone(result.exit_status)
+        self.assertIn('Timeout opening channel', result.error)
+
+    def test_fan_out_returns_within_timeout(self):
+        clients = [self._client('silent-%d' % index)[0]
+                   for index in xrange(3)]
+        start = time.time()
+        results = ssh.fan_out(clients, 'true', timeout=0.5)
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(['silent-0', 'silent-1', 'silent-2'],
+                         [result.host for result in results])
+        self.assertFalse(any(result.succeeded for result in results))
+
+    def test_no_reconnect_once_timeout_spent(self):
+        client, dead = self._client()
+        self.assertRaises(paramiko.SSHException, client.open_session, 0.5)
+        self.assertEqual(1, len(dead.transport.timeouts))
+        self.assertIsNone(getattr(client, 'connections', None))
+
+    def test_broken_connection_is_replaced(self):
+        client, dead = self._client()
+        dead.transport = BrokenTransport()
+        self.assertRaises(paramiko.SSHException, client.open_session, 0.5)
+        self.assertEqual(1, client.connections)
+        # NOTE: the new connection got the rest of the time
+        new = client.last_connection
+        self.assertTrue(0 < new.transport.timeouts[0] <= 0.5)
+        self.assertNotIn(client._key, ssh._connections)
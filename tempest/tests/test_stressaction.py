@@ -0,0 +1,70 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+import threading
+import time
+
+import testtools
+
+from tempest.stress import stressaction
+
+
+class FakeStatistic(dict):
+
+    def increment(self, key):
+        self[key] = self.get(key, 0) + 1
+
+
+class CountingAction(stressaction.StressAction):
+
+    def run(self):
+        time.sleep(0.01)
+
+
+class TestStressAction(testtools.TestCase):
+
+    def setUp(self):
+        super(TestStressAction, self).setUp()
+        self.action = CountingAction(None)
+        self.statistic = FakeStatistic()
+
+    def test_max_runs(self):
+        self.action.max_runs = 3
+        self.assertTrue(self.action.run_loop(self.statistic))
+        self.assertEqual(3, self.statistic['runs'])
+
+    def _stop_running_loop(self):
+        thread = threading.Thread(target=self.action.run_loop,
+                                  args=(self.statistic,))
+        thread.start()
+        time.sleep(0.1)
+        self.action.stopping.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_stopping_ends_the_loop(self):
+        self._stop_running_loop()
+        self.assertTrue(self.statistic['runs'] > 0)
+
+    def test_stopping_wakes_parked_user(self):
+        self.action.user_index = 1
+        self.action.active_users = multiprocessing.Value('i', 1)
+        self._stop_running_loop()
+        self.assertNotIn('runs', self.statistic)
+
+    def test_stopping_wakes_user_waiting_for_arrivals(self):
+        self.action.arrivals = multiprocessing.Queue()
+        self._stop_running_loop()
+        self.assertNotIn('runs', self.statistic)
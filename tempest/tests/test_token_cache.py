@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import testtools
+
+from tempest.common import token_cache
+
+
+class FakeAuth(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, user, expires=None):
+        self.calls += 1
+        return {'token': '%s-%d' % (user, self.calls), 'expires': expires,
+                'catalog': []}
+
+
+class TestTokenCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTokenCache, self).setUp()
+        self.cache = token_cache.TokenCache()
+        saved = (self.cache.cache_file, self.cache._entries,
+                 self.cache._file_stat)
+        self.addCleanup(self._restore, saved)
+        self.cache._entries = {}
+        self.cache._file_stat = None
+        self.cache.cache_file = None
+        self.auth = FakeAuth()
+
+    def _restore(self, saved):
+        (self.cache.cache_file, self.cache._entries,
+         self.cache._file_stat) = saved
+
+    def _use_file(self):
+        directory = tempfile.mkdtemp(prefix='tempest-unit')
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache.cache_file = os.path.join(directory, 'tokens')
+
+    def test_cache_key_hides_credentials(self):
+        key = token_cache.cache_key('v2', 'user', 'secret', 'url', 'tenant')
+        self.assertNotIn('secret', key)
+        self.assertNotEqual(key, token_cache.cache_key('v2', 'user', 'other',
+                                                       'url', 'tenant'))
+
+    def test_get_authenticates_once(self):
+        first = self.cache.get('key', self.auth, 'user')
+        second = self.cache.get('key', self.auth, 'user')
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.auth.calls)
+
+    def test_expiring_token_is_refreshed(self):
+        soon = time.time() + token_cache.REFRESH_MARGIN - 1
+        self.cache.get('key', self.auth, 'user', soon)
+        self.assertEqual('user-2',
+                         self.cache.get('key', self.auth, 'user')['token'])
+
+    def test_invalidate_keeps_refreshed_token(self):
+        self.cache.get('key', self.auth, 'user')
+        self.cache.invalidate('key', 'user-0')
+        self.assertEqual('user-1',
+                         self.cache.get('key', self.auth, 'user')['token'])
+        self.cache.invalidate('key', 'user-1')
+        self.assertEqual('user-2',
+                         self.cache.get('key', self.auth, 'user')['token'])
+
+    def test_auth_of_other_keys_runs_in_parallel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_auth(user):
+            started.set()
+            release.wait(10)
+            return self.auth(user)
+
+        thread = threading.Thread(target=self.cache.get,
+                                  args=('slow', slow_auth, 'slow'))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        started.wait(10)
+        entry = self.cache.get('fast', self.auth, 'fast')
+        self.assertFalse(release.is_set())
+        self.assertEqual('fast-1', entry['token'])
+
+    def test_file_shared_between_processes(self):
+        self._use_file()
+        self.cache.get('key', self.auth, 'user')
+        # NOTE: another process revokes the token and stores a new one
+        self.cache._save({'key': {'token': 'other', 'expires': None,
+                                  'catalog': []}})
+        self.assertEqual('other',
+                         self.cache.get('key', self.auth, 'user')['token'])
+        self.cache._save({})
+        self.assertEqual('user-2',
+                         self.cache.get('key', self.auth, 'user')['token'])
+        self.assertEqual(2, self.auth.calls)
+
+    def test_file_invalidate(self):
+        self._use_file()
+        self.cache.get('key', self.auth, 'user')
+        self.cache.invalidate('key', 'user-1')
+        self.assertEqual({}, self.cache._load())
+        self.assertEqual('user-2',
+                         self.cache.get('key', self.auth, 'user')['token'])
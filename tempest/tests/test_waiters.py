@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import testtools
+
+from tempest.common import waiters
+from tempest import exceptions
+
+
+class FakeSnapshotsClient(object):
+    """Has the list call of the XML client only."""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def list_snapshots_with_detail(self, params=None):
+        return None, self.snapshots
+
+    def get_snapshot(self, snapshot_id):
+        raise exceptions.NotFound(snapshot_id)
+
+
+class FakeImagesClient(object):
+
+    def __init__(self, images):
+        self.images = images
+
+    def list_images_with_detail(self, params=None):
+        return None, self.images
+
+
+class TestBatchWaiter(testtools.TestCase):
+
+    def setUp(self):
+        super(TestBatchWaiter, self).setUp()
+        self.waiter = waiters.BatchWaiter(interval=0.01, timeout=5)
+
+    def test_snapshots(self):
+        lister = waiters.SnapshotLister(FakeSnapshotsClient([
+            {'id': 'a', 'status': 'available'},
+            {'id': 'b', 'status': 'error'}]))
+        available = self.waiter.add(lister, 'a', 'available')
+        failed = self.waiter.add(lister, 'b', 'available')
+        gone = self.waiter.add(lister, 'c', waiters.DELETED)
+        self.waiter.wait()
+        self.assertEqual('available', available.result()['status'])
+        self.assertRaises(exceptions.SnapshotBuildErrorException,
+                          failed.result)
+        self.assertIsNone(gone.result())
+
+    def test_image_error_names_the_status(self):
+        lister = waiters.ImageLister(FakeImagesClient([
+            {'id': 'a', 'status': 'ERROR'}]))
+        future = self.waiter.add(lister, 'a', 'ACTIVE')
+        self.waiter.wait()
+        exc = self.assertRaises(exceptions.ImageErrorException,
+                                future.result)
+        self.assertIn('ERROR status', str(exc))
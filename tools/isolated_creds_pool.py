@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Manages the pool of pre-provisioned isolated credentials used when
+compute.isolated_creds_pool_file is set.
+"""
+
+import argparse
+import sys
+
+from tempest.common import isolated_creds
+from tempest import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--count', type=int, default=0,
+                        help="Number of tenant/user pairs to add.")
+    parser.add_argument('-a', '--admin-count', type=int, default=0,
+                        help="Number of tenant/admin user pairs to add.")
+    parser.add_argument('--purge', action='store_true',
+                        help="Delete every pooled tenant and user.")
+    parser.add_argument('--password', default='pass',
+                        help="Password of the created users.")
+    ns = parser.parse_args()
+
+    if not config.TempestConfig().compute.isolated_creds_pool_file:
+        print("compute.isolated_creds_pool_file is not set")
+        return 1
+    creds = isolated_creds.IsolatedCreds('pool', password=ns.password)
+    if ns.purge:
+        creds.purge_pool()
+    entries = creds.provision_pool(ns.count, ns.admin_count)
+    print("Added %d credentials to %s" % (len(entries),
+                                          creds.pool.pool_file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())